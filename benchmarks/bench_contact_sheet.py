@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Contact Sheet Benchmark
+=======================
+
+Compares per-frame analysis with contact-sheet tiling on the same synthetic
+frame folder, running the full pipeline against the local mock Llama API
+server. Reports analysis requests, images uploaded, upload size, estimated
+image tokens and wall time for each mode.
+
+Image tokens are estimated from the uploaded pixel size: the image is split
+into --tile-px square tiles of --tokens-per-tile tokens each, plus one
+thumbnail tile (the defaults follow Llama 4's 336px / 144 token tiles).
+The mock server answers every request with the same latency regardless of
+its size, so the wall times show the saving in round trips only.
+
+Usage: python benchmarks/bench_contact_sheet.py [--frames 900] [--grids 2x2,3x3] [--latency-ms 800]
+"""
+
+import argparse
+import base64
+import contextlib
+import math
+import os
+import statistics
+import tempfile
+import threading
+import time
+from io import BytesIO
+
+from bench_throughput import make_folder, make_frame_pool, percentile, start_mock_server
+
+import image_batch_processor as ibp  # Importable once bench_throughput has put the repo on sys.path
+
+
+def image_tokens(url: str, tile_px: int, tokens_per_tile: int) -> int:
+    """Estimated prompt tokens of one base64 data URL image"""
+    from PIL import Image
+
+    with Image.open(BytesIO(base64.b64decode(url.split(",", 1)[1]))) as img:
+        width, height = img.size
+    return (math.ceil(width / tile_px) * math.ceil(height / tile_px) + 1) * tokens_per_tile
+
+
+def run_case(folder: str, output_dir: str, base_url: str, args: argparse.Namespace, grid: tuple = None) -> dict:
+    """Runs process_folder once, per frame (grid None) or tiled into (cols, rows) sheets"""
+    from llama_api_client import LlamaAPIClient
+
+    client = LlamaAPIClient(api_key="benchmark", base_url=base_url, max_retries=0)
+    completions = client.chat.completions
+    create = completions.create
+    requests = []
+    lock = threading.Lock()
+
+    def measured_create(**kwargs):
+        start = time.perf_counter()
+        try:
+            return create(**kwargs)
+        finally:
+            if kwargs.get("model") == ibp.ANALYSIS_MODEL:
+                urls = [part["image_url"]["url"] for message in kwargs["messages"]
+                        for part in message["content"] if part["type"] == "image_url"]
+                with lock:
+                    requests.append({
+                        "latency": time.perf_counter() - start,
+                        "images": len(urls),
+                        "bytes": sum(len(url) for url in urls),
+                        "tokens": sum(image_tokens(url, args.tile_px, args.tokens_per_tile) for url in urls),
+                    })
+
+    completions.create = measured_create
+
+    contact_sheet = ibp.ContactSheetBuilder(*grid, args.tile_width) if grid else None
+    chunk_size = args.sheets_per_request if grid else args.chunk_size
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        ibp.process_folder(
+            folder, chunk_size, 1, args.concurrency, ibp.RateLimiter(0), None,
+            os.path.join(output_dir, ibp.DEFAULT_CHECKPOINT_FILE),
+            client=client, output_dir=output_dir, contact_sheet=contact_sheet,
+        )
+        elapsed = time.perf_counter() - start
+
+    return {
+        "requests": len(requests),
+        "images": sum(r["images"] for r in requests),
+        "uploaded_mb": sum(r["bytes"] for r in requests) / 1024 / 1024,
+        "tokens": sum(r["tokens"] for r in requests),
+        "p50_ms": percentile([r["latency"] for r in requests], 0.50) * 1000,
+        "elapsed": elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-frame analysis with contact-sheet tiling")
+    parser.add_argument("--frames", type=int, default=900, help="Frames in the synthetic folder (default 900)")
+    parser.add_argument("--grids", default="2x2,3x3", help="Comma separated COLSxROWS sheet layouts (default 2x2,3x3)")
+    parser.add_argument("--tile-width", type=int, default=480, help="Contact sheet tile width (default 480)")
+    parser.add_argument("--chunk-size", type=int, default=3, help="Frames per request in per-frame mode (default 3)")
+    parser.add_argument("--sheets-per-request", type=int, default=1, help="Sheets per request when tiling (default 1)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Chunk requests in flight (default 8)")
+    parser.add_argument("--latency-ms", type=float, default=800, help="Mock median latency (default 800)")
+    parser.add_argument("--tile-px", type=int, default=336, help="Model image tile size in pixels (default 336)")
+    parser.add_argument("--tokens-per-tile", type=int, default=144, help="Prompt tokens per image tile (default 144)")
+    args = parser.parse_args()
+    args.latency_sigma = 0.2
+    args.error_rate = 0.0
+    args.rate_limit_rate = 0.0
+
+    modes = [("per frame", None)] + [(f"sheet {grid}", ibp.parse_grid(grid))
+                                     for grid in args.grids.split(",") if grid.strip()]
+    process, base_url = start_mock_server(args)
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            pool_dir = os.path.join(workdir, "pool")
+            os.makedirs(pool_dir)
+            pool = make_frame_pool(pool_dir)
+            folder = os.path.join(workdir, "frames")
+            make_folder(folder, args.frames, pool)
+            frame_kb = statistics.mean(os.path.getsize(path) for path in pool) / 1024
+
+            print(f"🧪 Mock Llama API at {base_url} (median {args.latency_ms:g} ms), "
+                  f"{args.frames} frames of 640x360 (~{frame_kb:.0f} KB)")
+            print(f"\n{'Mode':<14}{'Requests':>10}{'Images':>8}{'Uploaded MB':>13}{'Img tokens':>12}"
+                  f"{'Tokens/frame':>14}{'p50 ms':>8}{'Seconds':>9}{'vs frames':>11}")
+            print("-" * 99)
+            baseline = None
+            for label, grid in modes:
+                output_dir = os.path.join(workdir, f"out_{label.replace(' ', '_')}")
+                os.makedirs(output_dir)
+                result = run_case(folder, output_dir, base_url, args, grid)
+                baseline = baseline or result["tokens"]
+                print(f"{label:<14}{result['requests']:>10}{result['images']:>8}{result['uploaded_mb']:>13.1f}"
+                      f"{result['tokens']:>12,}{result['tokens'] / args.frames:>14.0f}{result['p50_ms']:>8.0f}"
+                      f"{result['elapsed']:>9.1f}{result['tokens'] / baseline:>10.0%}")
+
+            print(f"\nImage tokens estimated at {args.tokens_per_tile} per {args.tile_px}px tile plus one thumbnail "
+                  f"tile per image; wall time includes the critique.")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+if __name__ == "__main__":
+    main()
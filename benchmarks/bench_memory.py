@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Memory Benchmark
+================
+
+Checks that peak memory stays flat as the folder grows: runs the full
+pipeline (analysis, results JSON, map-reduce critique) against the local mock
+Llama API server for increasing folder sizes, each in a fresh process, and
+reports the RSS before the run, the peak RSS during it and how much the peak
+grows per 1,000 frames. RSS also includes allocator fragmentation from the
+worker threads; --heap adds the tracemalloc peak of Python objects, which
+isolates what the pipeline itself keeps alive (slower).
+
+Usage: python benchmarks/bench_memory.py [--sizes 1000,5000,20000,50000] [--concurrency 16] [--heap]
+"""
+
+import argparse
+import os
+import resource
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from bench_throughput import make_folder, make_frame_pool, server_stats, start_mock_server
+
+
+def current_rss_mb() -> float:
+    """Resident set size of this process in MB (Linux /proc, falls back to the peak)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_case(folder: str, output_dir: str, base_url: str, chunk_size: int, concurrency: int,
+             trace_heap: bool = False) -> dict:
+    """Runs process_folder in a fresh process while sampling its RSS"""
+    import contextlib
+    import tracemalloc
+
+    from llama_api_client import LlamaAPIClient
+
+    import image_batch_processor as ibp
+
+    client = LlamaAPIClient(api_key="benchmark", base_url=base_url, max_retries=0)
+    baseline = current_rss_mb()
+    samples = []
+    done = threading.Event()
+
+    def sample():
+        while not done.wait(0.05):
+            samples.append(current_rss_mb())
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    if trace_heap:
+        tracemalloc.start()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        ibp.process_folder(
+            folder, chunk_size, 1, concurrency, ibp.RateLimiter(0), None,
+            os.path.join(output_dir, ibp.DEFAULT_CHECKPOINT_FILE),
+            client=client, output_dir=output_dir,
+        )
+        elapsed = time.perf_counter() - start
+    heap_peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024 if trace_heap else None
+    done.set()
+    sampler.join()
+
+    return {
+        "baseline_mb": baseline,
+        "peak_mb": max([resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024] + samples),
+        "end_mb": current_rss_mb(),
+        "heap_mb": heap_peak,
+        "elapsed": elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that peak memory does not grow with folder size")
+    parser.add_argument("--sizes", default="1000,5000,20000",
+                        help="Comma separated folder sizes in frames (default 1000,5000,20000)")
+    parser.add_argument("--chunk-size", type=int, default=3, help="Images per request (default 3)")
+    parser.add_argument("--concurrency", type=int, default=16, help="Chunk requests in flight (default 16)")
+    parser.add_argument("--latency-ms", type=float, default=5, help="Mock median latency (default 5)")
+    parser.add_argument("--heap", action="store_true", help="Also trace the Python heap peak with tracemalloc")
+    args = parser.parse_args()
+    args.latency_sigma = 0.2
+    args.error_rate = 0.0
+    args.rate_limit_rate = 0.0
+
+    sizes = sorted(int(size) for size in args.sizes.split(",") if size.strip())
+    process, base_url = start_mock_server(args)
+    rows = []
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            pool_dir = os.path.join(workdir, "pool")
+            os.makedirs(pool_dir)
+            pool = make_frame_pool(pool_dir)
+
+            print(f"🧪 Mock Llama API at {base_url}")
+            print(f"\n{'Frames':>8}{'Requests':>10}{'Seconds':>9}{'Start MB':>10}{'Peak MB':>9}{'End MB':>8}"
+                  + (f"{'Heap MB':>9}" if args.heap else ""))
+            print("-" * (63 if args.heap else 54))
+            for size in sizes:
+                folder = os.path.join(workdir, f"frames_{size}")
+                output_dir = os.path.join(workdir, f"out_{size}")
+                os.makedirs(output_dir)
+                make_folder(folder, size, pool)
+
+                before = server_stats(base_url)
+                with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+                    result = executor.submit(run_case, folder, output_dir, base_url,
+                                             args.chunk_size, args.concurrency, args.heap).result()
+                requests = server_stats(base_url)["requests"] - before["requests"]
+                rows.append((size, result))
+                print(f"{size:>8}{requests:>10}{result['elapsed']:>9.1f}{result['baseline_mb']:>10.1f}"
+                      f"{result['peak_mb']:>9.1f}{result['end_mb']:>8.1f}"
+                      + (f"{result['heap_mb']:>9.1f}" if args.heap else ""))
+    finally:
+        process.terminate()
+        process.wait()
+
+    if len(rows) > 1:
+        (small, first), (large, last) = rows[0], rows[-1]
+        growth = last["peak_mb"] - first["peak_mb"]
+        print(f"\nPeak RSS grew {growth:+.1f} MB from {small:,} to {large:,} frames "
+              f"({growth * 1024 / ((large - small) / 1000):+.0f} KB per 1,000 frames).")
+        if args.heap:
+            print(f"Python heap peak: {first['heap_mb']:.1f} MB -> {last['heap_mb']:.1f} MB.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Frame Preprocessing Benchmark
+=============================
+
+Generates a synthetic set of 4K frames and compares upload payload size and
+end-to-end latency (local encode time + modeled upload time) for different
+FramePreprocessor settings.
+
+Usage: python benchmarks/bench_preprocess.py [--frames 20] [--uplink-mbps 20]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+from PIL import Image
+
+from image_batch_processor import FramePreprocessor, image_to_base64
+
+# (label, max_edge, image_format, quality); max_edge 0 + "original" is the raw upload
+SETTINGS = [
+    ("raw PNG", 0, "original", 0),
+    ("3840 JPEG q90", 3840, "jpeg", 90),
+    ("1920 JPEG q85", 1920, "jpeg", 85),
+    ("1280 JPEG q80", 1280, "jpeg", 80),
+    ("1280 WebP q80", 1280, "webp", 80),
+    ("1024 JPEG q75", 1024, "jpeg", 75),
+    ("768 WebP q70", 768, "webp", 70),
+]
+
+
+def make_frames(folder: str, count: int, width: int = 3840, height: int = 2160) -> list:
+    """Writes `count` synthetic PNG frames that look vaguely like footage"""
+    rng = np.random.default_rng(42)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    files = []
+    for i in range(count):
+        base = np.stack([
+            128 + 100 * np.sin(x / (300 + 20 * i) + i),
+            128 + 100 * np.cos(y / (250 + 10 * i)),
+            128 + 80 * np.sin((x + y) / 500 - i),
+        ], axis=-1)
+        noise = rng.normal(0, 12, size=base.shape)
+        frame = np.clip(base + noise, 0, 255).astype(np.uint8)
+        path = os.path.join(folder, f"{i + 1:04d}.png")
+        Image.fromarray(frame).save(path)
+        files.append(path)
+    return files
+
+
+def bench_setting(files: list, max_edge: int, image_format: str, quality: int, uplink_mbps: float) -> dict:
+    """Encodes every frame with one setting and returns size/latency statistics"""
+    preprocessor = FramePreprocessor(max_edge, image_format, quality)
+    payload_sizes = []
+    encode_times = []
+    for path in files:
+        start = time.perf_counter()
+        if preprocessor.enabled:
+            payload, _ = preprocessor.encode(path)
+        else:
+            payload = image_to_base64(path)
+        encode_times.append(time.perf_counter() - start)
+        payload_sizes.append(len(payload))
+
+    upload_times = [size * 8 / (uplink_mbps * 1_000_000) for size in payload_sizes]
+    end_to_end = [e + u for e, u in zip(encode_times, upload_times)]
+    return {
+        "payload_kb": statistics.mean(payload_sizes) / 1024,
+        "encode_ms": statistics.mean(encode_times) * 1000,
+        "upload_ms": statistics.mean(upload_times) * 1000,
+        "total_ms": statistics.mean(end_to_end) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark frame preprocessing settings")
+    parser.add_argument("--frames", type=int, default=20, help="Number of synthetic 4K frames (default 20)")
+    parser.add_argument("--uplink-mbps", type=float, default=20.0,
+                        help="Upload bandwidth used to model transfer time (default 20 Mbit/s)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        print(f"🧪 Generating {args.frames} synthetic 3840x2160 PNG frames...")
+        files = make_frames(folder, args.frames)
+
+        print(f"\n{'Setting':<16}{'Payload KB':>12}{'Encode ms':>12}{'Upload ms':>12}{'Total ms':>12}{'vs raw':>9}")
+        print("-" * 73)
+        baseline = None
+        for label, max_edge, image_format, quality in SETTINGS:
+            stats = bench_setting(files, max_edge, image_format, quality, args.uplink_mbps)
+            baseline = baseline or stats["total_ms"]
+            print(f"{label:<16}{stats['payload_kb']:>12.0f}{stats['encode_ms']:>12.1f}"
+                  f"{stats['upload_ms']:>12.1f}{stats['total_ms']:>12.1f}{baseline / stats['total_ms']:>8.1f}x")
+
+        print(f"\nUpload time modeled at {args.uplink_mbps:g} Mbit/s; encode time measured locally.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Startup Benchmark
+=================
+
+Measures how long the processor takes to start in a fresh interpreter, the
+cost every short job launched from a scheduler pays before doing any work.
+Times `import image_batch_processor` and `image_batch_processor.py --help`
+(median of --runs fresh processes, with a bare `python -c pass` as the
+baseline) and lists the slowest imports from `python -X importtime`.
+
+Exits with status 1 when the --help median exceeds --target-ms, so it can
+guard CLI startup in CI.
+
+Usage: python benchmarks/bench_startup.py [--runs 20] [--target-ms 150] [--top 10]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+SCRIPT = REPO_DIR / "image_batch_processor.py"
+
+
+def time_command(command: list, runs: int) -> list:
+    """Wall time in ms of `runs` fresh runs of command"""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=REPO_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def slowest_imports(top: int) -> list:
+    """(cumulative ms, module) of the slowest top-level imports below image_batch_processor"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import image_batch_processor"],
+                            cwd=REPO_DIR, capture_output=True, text=True, check=True)
+    # Nested imports are listed before their parent, indented two more spaces per level
+    imports = []
+    children = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth == 0:
+            if name.strip() == "image_batch_processor":
+                imports = children
+            children = []
+        elif depth == 1:
+            children.append((int(cumulative) / 1000, name.strip()))
+    return sorted(imports, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the processor's cold start time")
+    parser.add_argument("--runs", type=int, default=20, help="Fresh processes per command (default 20)")
+    parser.add_argument("--target-ms", type=float, default=150,
+                        help="Fail if the --help median is above this many ms (default 150)")
+    parser.add_argument("--top", type=int, default=10, help="Slowest imports to list (default 10)")
+    args = parser.parse_args()
+
+    # One untimed run so the bytecode cache is written and the timings exclude compiling
+    subprocess.run([sys.executable, "-c", "import image_batch_processor"], cwd=REPO_DIR, check=True)
+
+    cases = [
+        ("python -c pass", [sys.executable, "-c", "pass"]),
+        ("import", [sys.executable, "-c", "import image_batch_processor"]),
+        ("--help", [sys.executable, str(SCRIPT), "--help"]),
+    ]
+    print(f"🧪 {args.runs} fresh processes per command ({Path(sys.executable).name} {sys.version.split()[0]}"
+          + (", PYTHONDONTWRITEBYTECODE set: timings include compiling" if os.environ.get("PYTHONDONTWRITEBYTECODE")
+             else "") + ")")
+    print(f"\n{'Command':<18}{'Median ms':>11}{'Min ms':>9}{'Max ms':>9}")
+    print("-" * 47)
+    medians = {}
+    for label, command in cases:
+        timings = time_command(command, args.runs)
+        medians[label] = statistics.median(timings)
+        print(f"{label:<18}{medians[label]:>11.1f}{min(timings):>9.1f}{max(timings):>9.1f}")
+
+    print("\nSlowest imports of the module (cumulative ms):")
+    for ms, name in slowest_imports(args.top):
+        print(f"   {ms:>8.1f}  {name}")
+
+    overhead = medians["--help"] - medians["python -c pass"]
+    ok = medians["--help"] <= args.target_ms
+    print(f"\n{'✅' if ok else '❌'} --help median {medians['--help']:.1f} ms ({overhead:+.1f} ms over a bare "
+          f"interpreter), target {args.target_ms:g} ms")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
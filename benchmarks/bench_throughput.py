@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Throughput Benchmark
+====================
+
+Runs the full pipeline (process_folder, including analyze_json_and_transcript)
+against the local mock Llama API server on synthetic frame folders, so
+throughput regressions show up without spending API quota.
+
+Each folder size runs in a fresh process and reports frames/second,
+client-side p50/p95 request latency, peak RSS, bytes uploaded and how many
+requests reused an open connection of the shared pool.
+
+Usage: python benchmarks/bench_throughput.py [--sizes 100,1000,10000] [--concurrency 8]
+       [--prefetch 2] [--latency-ms 200] [--error-rate 0.01] [--rate-limit-rate 0.02]
+       [--capacity 6 --max-concurrency 32]
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+
+DISTINCT_FRAMES = 100  # Unique JPEGs; larger folders link to these
+
+
+def make_frame_pool(folder: str, count: int = DISTINCT_FRAMES, width: int = 640, height: int = 360) -> list:
+    """Writes `count` distinct small JPEG frames and returns their paths"""
+    import numpy as np
+    from PIL import Image
+
+    rng = np.random.default_rng(7)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    paths = []
+    for i in range(count):
+        base = np.stack([
+            128 + 100 * np.sin(x / (40 + i) + i),
+            128 + 100 * np.cos(y / (30 + i % 17)),
+            np.full_like(x, (i * 37) % 256),
+        ], axis=-1)
+        frame = np.clip(base + rng.normal(0, 8, size=base.shape), 0, 255).astype(np.uint8)
+        path = os.path.join(folder, f"pool_{i:03d}.jpg")
+        Image.fromarray(frame).save(path, quality=85)
+        paths.append(path)
+    return paths
+
+
+def make_folder(folder: str, size: int, pool: list) -> None:
+    """Fills `folder` with `size` frames, hard-linking the pool where possible"""
+    os.makedirs(folder, exist_ok=True)
+    for i in range(size):
+        target = os.path.join(folder, f"{i + 1:05d}.jpg")
+        source = pool[i % len(pool)]
+        try:
+            os.link(source, target)
+        except OSError:
+            shutil.copyfile(source, target)
+
+
+def start_mock_server(args: argparse.Namespace) -> tuple:
+    """Launches mock_llama_server.py on a free port, returning (process, base_url)"""
+    command = [
+        sys.executable, str(Path(__file__).with_name("mock_llama_server.py")),
+        "--port", "0",
+        "--latency-ms", str(args.latency_ms),
+        "--latency-sigma", str(args.latency_sigma),
+        "--error-rate", str(args.error_rate),
+        "--rate-limit-rate", str(args.rate_limit_rate),
+        "--capacity", str(getattr(args, "capacity", 0)),
+        "--retry-after", "0.2",
+        "--seed", "1",
+    ]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    base_url = process.stdout.readline().strip()
+    if not base_url.startswith("http"):
+        process.kill()
+        raise RuntimeError("mock server did not start")
+    return process, base_url
+
+
+def server_stats(base_url: str) -> dict:
+    with urllib.request.urlopen(base_url.rsplit("/v1", 1)[0] + "/stats") as response:
+        return json.load(response)
+
+
+def run_case(folder: str, output_dir: str, base_url: str, chunk_size: int, concurrency: int,
+             prefetch: int, max_concurrency: int = 0) -> dict:
+    """Runs process_folder once (in a fresh process) and returns client-side measurements"""
+    import image_batch_processor as ibp
+
+    os.environ["LLAMA_API_KEY"] = "benchmark"
+    os.environ["LLAMA_API_CLIENT_BASE_URL"] = base_url
+    session = ibp.ApiSession.shared(max(concurrency, max_concurrency) + 1)
+    client = session.client
+    completions = client.chat.completions
+    create = completions.create
+    latencies = []
+    lock = threading.Lock()
+
+    def timed_create(**kwargs):
+        start = time.perf_counter()
+        try:
+            return create(**kwargs)
+        finally:
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    completions.create = timed_create
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        ok = ibp.process_folder(
+            folder, chunk_size, 1, concurrency, ibp.RateLimiter(0), None,
+            os.path.join(output_dir, ibp.DEFAULT_CHECKPOINT_FILE),
+            client=client, output_dir=output_dir, prefetch=prefetch, max_concurrency=max_concurrency,
+        )
+        elapsed = time.perf_counter() - start
+
+    store = ibp.ResultStore(os.path.join(output_dir, ibp.DEFAULT_CHECKPOINT_FILE))
+    run_id = store.db.execute("SELECT MAX(id) FROM runs").fetchone()[0]
+    failed = sum(1 for result in store.iter_results(run_id) if "error" in result)
+    store.close()
+
+    return {
+        "ok": ok,
+        "elapsed": elapsed,
+        "latencies": latencies,
+        "failed_entries": failed,
+        "connection_reuse": session.reuse_rate(),
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def percentile(values: list, fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the processor against a local mock Llama API")
+    parser.add_argument("--sizes", default="100,1000,10000",
+                        help="Comma separated folder sizes in frames (default 100,1000,10000; up to 50000 works)")
+    parser.add_argument("--chunk-size", type=int, default=3, help="Images per request (default 3)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Chunk requests in flight (default 8)")
+    parser.add_argument("--max-concurrency", type=int, default=0,
+                        help="Adapt the requests in flight up to N, starting at --concurrency (default 0, fixed)")
+    parser.add_argument("--prefetch", type=int, default=2, help="Chunks encoded ahead of the requests (default 2)")
+    parser.add_argument("--latency-ms", type=float, default=200, help="Mock median latency (default 200)")
+    parser.add_argument("--latency-sigma", type=float, default=0.4, help="Mock latency spread (default 0.4)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of 500 responses (default 0)")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of 429 responses (default 0)")
+    parser.add_argument("--capacity", type=int, default=0,
+                        help="Mock requests served at once, the rest get 429 (default 0, unlimited)")
+    parser.add_argument("--json", metavar="FILE", help="Also write the results to FILE for comparing runs")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    process, base_url = start_mock_server(args)
+    rows = []
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            print(f"🧪 Mock Llama API at {base_url} (median {args.latency_ms:g} ms, "
+                  f"{args.error_rate:.0%} errors, {args.rate_limit_rate:.0%} 429s)")
+            pool_dir = os.path.join(workdir, "pool")
+            os.makedirs(pool_dir)
+            pool = make_frame_pool(pool_dir)
+            frame_bytes = statistics.mean(os.path.getsize(path) for path in pool)
+
+            print(f"\n{'Frames':>8}{'Requests':>10}{'Frames/s':>10}{'p50 ms':>9}{'p95 ms':>9}"
+                  f"{'Peak RSS MB':>13}{'Uploaded MB':>13}{'Failed':>8}{'Conns':>7}{'Reused':>8}")
+            print("-" * 95)
+            for size in sizes:
+                folder = os.path.join(workdir, f"frames_{size}")
+                output_dir = os.path.join(workdir, f"out_{size}")
+                os.makedirs(output_dir)
+                make_folder(folder, size, pool)
+
+                before = server_stats(base_url)
+                with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+                    result = executor.submit(run_case, folder, output_dir, base_url,
+                                             args.chunk_size, args.concurrency, args.prefetch,
+                                             args.max_concurrency).result()
+                after = server_stats(base_url)
+
+                row = {
+                    "frames": size,
+                    "requests": after["requests"] - before["requests"],
+                    "frames_per_second": size / result["elapsed"],
+                    "p50_ms": percentile(result["latencies"], 0.50) * 1000,
+                    "p95_ms": percentile(result["latencies"], 0.95) * 1000,
+                    "peak_rss_mb": result["peak_rss_mb"],
+                    "uploaded_mb": (after["bytes_received"] - before["bytes_received"]) / 1024 / 1024,
+                    "failed_entries": result["failed_entries"],
+                    "connections": after["connections"] - before["connections"],
+                    "connection_reuse": result["connection_reuse"],
+                    "elapsed": result["elapsed"],
+                }
+                rows.append(row)
+                print(f"{size:>8}{row['requests']:>10}{row['frames_per_second']:>10.1f}{row['p50_ms']:>9.0f}"
+                      f"{row['p95_ms']:>9.0f}{row['peak_rss_mb']:>13.1f}{row['uploaded_mb']:>13.1f}"
+                      f"{row['failed_entries']:>8}{row['connections']:>7}{row['connection_reuse']:>8.0%}")
+                shutil.rmtree(folder, ignore_errors=True)
+
+            print(f"\nSource frames average {frame_bytes / 1024:.0f} KB; requests include retries, "
+                  f"summaries and the critique.")
+    finally:
+        process.terminate()
+        process.wait()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+        print(f"💾 Results saved to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Mock Llama API Server
+=====================
+
+Local stand-in for the Llama API `chat/completions` endpoint so the
+processor can be benchmarked without spending API quota. Point the client
+at it with `LLAMA_API_CLIENT_BASE_URL=http://127.0.0.1:PORT/v1` (any
+LLAMA_API_KEY value is accepted).
+
+Latency is drawn from a log-normal distribution around --latency-ms; a
+fraction of requests can fail with HTTP 500 (--error-rate) or be rate
+limited with HTTP 429 (--rate-limit-rate). With --capacity N, requests
+arriving while N others are in flight are also answered with 429, like a
+throttled account. GET /stats returns request counts, bytes received,
+TCP connections accepted and the peak number of requests in flight as JSON.
+
+Usage: python benchmarks/mock_llama_server.py [--port 8765] [--latency-ms 800] [--error-rate 0.01]
+"""
+
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LOREM = ("the frame shows a wide shot of a person standing near a window with warm light falling across "
+         "the desk while a text overlay reads the title in bold white letters and the camera holds steady").split()
+
+
+class MockStats:
+    """Thread-safe counters for everything the server has seen"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+        self.completions = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        self.images_received = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {key: value for key, value in vars(self).items() if key != "lock"}
+
+
+class MockLlamaHandler(BaseHTTPRequestHandler):
+    """Answers chat completion requests with canned text after a simulated delay"""
+
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the real API
+
+    def log_message(self, format, *args):
+        pass  # Silence per-request logging
+
+    def setup(self):
+        super().setup()
+        # One handler per TCP connection; keep-alive requests reuse it
+        with self.server.stats.lock:
+            self.server.stats.connections += 1
+
+    def send_json(self, status: int, payload: dict, headers: dict = None) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        with self.server.stats.lock:
+            self.server.stats.bytes_sent += len(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/stats":
+            self.send_json(200, self.server.stats.snapshot())
+        else:
+            self.send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        stats = self.server.stats
+        with stats.lock:
+            stats.requests += 1
+            stats.bytes_received += length
+
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_json(404, {"error": "not found"})
+            return
+
+        try:
+            request = json.loads(body)
+        except ValueError:
+            self.send_json(400, {"error": "invalid JSON"})
+            return
+
+        settings = self.server.settings
+        with stats.lock:
+            over_capacity = 0 < settings.capacity <= stats.in_flight
+            if not over_capacity:
+                stats.in_flight += 1
+                stats.peak_in_flight = max(stats.peak_in_flight, stats.in_flight)
+        roll = random.random()
+        if over_capacity or roll < settings.rate_limit_rate:
+            with stats.lock:
+                stats.rate_limited += 1
+                if not over_capacity:
+                    stats.in_flight -= 1
+            self.send_json(429, {"error": "rate limited"}, {"Retry-After": f"{settings.retry_after:g}"})
+            return
+
+        try:
+            self.complete(request, roll, length)
+        finally:
+            with stats.lock:
+                stats.in_flight -= 1
+
+    def complete(self, request: dict, roll: float, length: int) -> None:
+        """Answers an admitted chat completion request after the simulated latency"""
+        settings = self.server.settings
+        stats = self.server.stats
+        time.sleep(self.server.draw_latency())
+
+        if roll < settings.rate_limit_rate + settings.error_rate:
+            with stats.lock:
+                stats.errors += 1
+            self.send_json(500, {"error": "simulated server error"})
+            return
+
+        messages = request.get("messages", [])
+        images = sum(
+            1 for message in messages if isinstance(message.get("content"), list)
+            for item in message["content"] if item.get("type") == "image_url"
+        )
+        words = max(1, int(random.gauss(settings.response_words, settings.response_words * 0.2)))
+        text = " ".join(LOREM[i % len(LOREM)] for i in range(words))
+        with stats.lock:
+            stats.completions += 1
+            stats.images_received += images
+
+        self.send_json(200, {
+            "id": f"mock-{stats.requests}",
+            "completion_message": {
+                "role": "assistant",
+                "content": {"type": "text", "text": text},
+                "stop_reason": "stop",
+            },
+            "metrics": [
+                {"metric": "num_prompt_tokens", "value": length // 4, "unit": "tokens"},
+                {"metric": "num_completion_tokens", "value": words * 4 // 3, "unit": "tokens"},
+                {"metric": "num_total_tokens", "value": length // 4 + words * 4 // 3, "unit": "tokens"},
+            ],
+        })
+
+
+class MockLlamaServer(ThreadingHTTPServer):
+    """Threaded HTTP server holding the mock settings and statistics"""
+
+    daemon_threads = True
+
+    def __init__(self, address: tuple, settings: argparse.Namespace):
+        super().__init__(address, MockLlamaHandler)
+        self.settings = settings
+        self.stats = MockStats()
+
+    def draw_latency(self) -> float:
+        """Log-normal latency in seconds with the configured median and spread"""
+        median = self.settings.latency_ms / 1000
+        if median <= 0:
+            return 0.0
+        return median * math.exp(random.gauss(0, self.settings.latency_sigma))
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Local mock of the Llama API chat completions endpoint")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on, 0 picks a free one (default 8765)")
+    parser.add_argument("--latency-ms", type=float, default=800, help="Median response latency (default 800)")
+    parser.add_argument("--latency-sigma", type=float, default=0.4,
+                        help="Log-normal spread of the latency; 0 for a fixed delay (default 0.4)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--capacity", type=int, default=0,
+                        help="Requests served at once; more in flight are answered with 429 (default 0, unlimited)")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429s (default 1)")
+    parser.add_argument("--response-words", type=int, default=120, help="Mean words per completion (default 120)")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for reproducible runs")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    settings = parse_args(argv)
+    if settings.seed is not None:
+        random.seed(settings.seed)
+    server = MockLlamaServer((settings.host, settings.port), settings)
+    # First line is machine readable so callers can start the server with --port 0
+    print(server.base_url, flush=True)
+    print(f"🧪 Mock Llama API listening (median latency {settings.latency_ms:g} ms, "
+          f"{settings.error_rate:.0%} errors, {settings.rate_limit_rate:.0%} rate limited"
+          + (f", capacity {settings.capacity}" if settings.capacity else "") + ")", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -9,231 +9,3192 @@ It can analyze images in batches and generate comprehensive reports.
 Usage: python image_batch_processor.py
 """
 
+import argparse
 import base64
+import hashlib
 import os
 import json
+import mimetypes
+import random
+import sqlite3
+import subprocess
+import threading
 import time
 import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, deque
+from itertools import chain, islice
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from functools import partial
+from io import BytesIO
 from pathlib import Path
 
 # Add parent directory to path to import llama client
 sys.path.append(str(Path(__file__).parent))
 
-try:
-    from llama_api_client import LlamaAPIClient
-except ImportError:
-    print("❌ llama-api-client not found. Please install it first:")
-    print("   pip install llama-api-client")
-    sys.exit(1)
+# llama_api_client (with httpx and pydantic) and asyncio are imported by the
+# stages that use them, so --help and runs that never reach the API start fast
+
+
+# Default request pacing; 30 requests per minute matches the old fixed 2-second pause
+DEFAULT_REQUESTS_PER_MINUTE = 30
+
+# Rough token cost of one image part whose size can't be read, used for tokens-per-minute accounting
+IMAGE_TOKEN_ESTIMATE = 1000
+# Llama 4 splits images into square tiles of this many pixels, each costing this many tokens,
+# plus one downscaled thumbnail tile
+IMAGE_TILE_PX = 336
+IMAGE_TILE_TOKENS = 144
+# Base64 characters decoded to read an image's size from its header (64 KB of image data)
+IMAGE_HEADER_CHARS = 87384
+
+# Per-request token budget (prompt plus max completion tokens); bigger chunks are split,
+# transcripts trimmed and critiques summarized to stay under it. 0 disables the budget.
+DEFAULT_REQUEST_TOKEN_BUDGET = 128000
+# Estimated and actual token usage of every API call, written next to the analysis results
+TOKEN_USAGE_FILE = "token_usage.jsonl"
+
+# Dry runs: the plan is written next to the (would-be) results; wall time is projected with
+# this round trip per analysis request unless --plan-latency says otherwise
+PLAN_FILE = "run_plan.json"
+PLAN_REQUEST_SECONDS = 10.0
+
+# Per-frame analysis request settings (also part of the cache key)
+ANALYSIS_MODEL = "Llama-4-Maverick-17B-128E-Instruct-FP8"
+ANALYSIS_MAX_TOKENS = 2048
+ANALYSIS_TEMPERATURE = 0.7
+
+# On-disk cache of frame analyses
+DEFAULT_CACHE_DIR = ".frame_cache"
+DEFAULT_CACHE_MAX_MB = 1024
+# Once over the limit, evict down to this fraction of it so the next puts don't evict again
+CACHE_EVICT_TARGET = 0.9
+
+# Frame preprocessing before upload (0 / "original" leave frames untouched)
+DEFAULT_MAX_EDGE = 0
+DEFAULT_IMAGE_FORMAT = "original"
+DEFAULT_IMAGE_QUALITY = 85
+
+# Near-duplicate frame collapsing: max Hamming distance (of 64 hash bits) within a run
+DEFAULT_DEDUPE_THRESHOLD = 5
+
+# Scene-change keyframe selection: total frames sent across the whole run
+DEFAULT_KEYFRAME_BUDGET = 100
+
+# Contact-sheet tiling: grid (columns x rows) and width of each tile in pixels
+DEFAULT_SHEET_GRID = "3x3"
+DEFAULT_SHEET_TILE_WIDTH = 480
+
+# Spielberg critique request settings
+CRITIQUE_MODEL = "Llama-4-Scout-17B-16E-Instruct-FP8"
+CRITIQUE_MAX_TOKENS = 4000
+CRITIQUE_TEMPERATURE = 0.9
+
+# Hierarchical (map-reduce) critique for long reels
+SUMMARY_MAX_TOKENS = 600
+SUMMARY_TEMPERATURE = 0.3
+SUMMARY_FAN_IN = 8  # Summaries merged per request when the summaries themselves are too long
+DEFAULT_SUMMARY_WINDOW = 40  # Result entries per window when map-reduce kicks in automatically
+MAX_CRITIQUE_INPUT_CHARS = 120000  # Above this, the critique switches to map-reduce
+
+# Timed transcripts: their cues are lined up with the analyzed frames instead of pasted whole.
+# Frames are numbered from 1 like `ffmpeg -i input.mp4 %04d.jpg`, so frame n starts at (n - 1) / fps.
+TIMED_TRANSCRIPT_EXTENSIONS = ('.srt', '.vtt')
+DEFAULT_FPS = 30.0
+
+# Common video extensions; any file given instead of a folder is streamed through ffmpeg,
+# these just skip the notice that ffmpeg will have to figure the format out
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.mkv', '.avi', '.webm', '.m4v', '.mpg', '.mpeg')
+
+# SQLite result store of every run in the output directory, used to resume interrupted runs.
+# Finished chunks are committed as they come in; more chunks per transaction trades crash safety for fewer commits
+DEFAULT_CHECKPOINT_FILE = "results.db"
+STORE_BATCH_CHUNKS = 1
+
+# Each run writes to a subdirectory of this, named after its input
+DEFAULT_OUTPUT_DIR = "reviews"
+
+# Results export and critique of a run, written to its output directory
+RESULTS_FILE = "analysis_results.json"
+CRITIQUE_FILE = "spielberg_postproduction_critique.md"
+RESULT_STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    analysis_model TEXT,
+    critique_model TEXT,
+    status TEXT NOT NULL,
+    started REAL NOT NULL,
+    finished REAL,
+    pid INTEGER
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    chunk INTEGER NOT NULL,
+    images TEXT NOT NULL,
+    finished REAL NOT NULL,
+    PRIMARY KEY (run_id, chunk)
+);
+CREATE TABLE IF NOT EXISTS frames (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    image TEXT NOT NULL,
+    chunk INTEGER NOT NULL,
+    run TEXT,
+    PRIMARY KEY (run_id, image)
+);
+CREATE TABLE IF NOT EXISTS analyses (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    chunk INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    image TEXT,
+    result TEXT NOT NULL,
+    PRIMARY KEY (run_id, chunk, seq)
+);
+CREATE TABLE IF NOT EXISTS errors (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    chunk INTEGER NOT NULL,
+    image TEXT NOT NULL,
+    error TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS errors_by_run ON errors (run_id, chunk);
+CREATE TABLE IF NOT EXISTS critiques (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    model TEXT,
+    created REAL NOT NULL,
+    output_file TEXT,
+    content TEXT NOT NULL
+);
+"""
+
+# Chunks read and encoded ahead of the ones in flight
+DEFAULT_PREFETCH = 2
+
+# Adaptive concurrency: a request slower than this multiple of the recent average counts as a spike
+LATENCY_SPIKE_FACTOR = 2.5
+
+# Retries of transient API errors: exponential backoff with full jitter, capped
+DEFAULT_MAX_RETRIES = 3
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 30.0
+# Words in a 400 error that mean the request was too big, so the chunk is split instead
+PAYLOAD_ERROR_HINTS = ("too large", "too long", "too many", "exceed", "context length", "maximum")
+
+# Shared HTTP connection pool: connections kept open (when --pool-size is not given) and how
+# many seconds an idle keep-alive connection is kept
+DEFAULT_POOL_SIZE = 8
+KEEPALIVE_EXPIRY = 30.0
+
+# Run profile written next to the analysis results
+PROFILE_FILE = "run_profile.json"
+
+# Manifest keys that may override the command line options for one batch job
+BATCH_JOB_OPTIONS = ("chunk_size", "skip_frames", "concurrency", "output_dir", "critique_window",
+                     "analysis_model", "critique_model", "resume", "prefetch", "packed", "contact_sheet",
+                     "max_concurrency", "max_retries", "fps", "max_request_tokens", "export_json")
+
+
+class TokenBucket:
+    """Thread-safe token bucket that refills continuously at a per-minute rate"""
+
+    def __init__(self, rate_per_minute: float, capacity: float):
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate_per_second)
+        self.updated = now
+
+    def acquire(self, amount: float = 1.0) -> float:
+        """Blocks until `amount` tokens are available and takes them
+
+        Args:
+            amount: Number of tokens to take. Requests larger than the bucket
+                capacity are clamped so they can still go through.
+
+        Returns:
+            Number of seconds spent waiting
+        """
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return waited
+                wait = (amount - self.tokens) / self.rate_per_second
+            time.sleep(wait)
+            waited += wait
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limiter shared by every API call
+
+    Args:
+        requests_per_minute: Request quota, 0 disables request limiting
+        tokens_per_minute: Token quota, 0 disables token limiting
+        burst: Number of requests that may be sent back to back before pacing kicks in
+    """
+
+    def __init__(self, requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: float = 0, burst: int = 1):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.request_bucket = TokenBucket(requests_per_minute, burst) if requests_per_minute > 0 else None
+        self.token_bucket = TokenBucket(tokens_per_minute, tokens_per_minute) if tokens_per_minute > 0 else None
+
+    def acquire(self, tokens: int = 0) -> float:
+        """Waits until one request costing `tokens` tokens fits in both quotas
+
+        Returns:
+            Number of seconds spent waiting
+        """
+        waited = 0.0
+        if self.request_bucket:
+            waited += self.request_bucket.acquire(1)
+        if self.token_bucket and tokens:
+            waited += self.token_bucket.acquire(tokens)
+        return waited
+
+    def describe(self) -> str:
+        """Human readable summary of the configured limits"""
+        rpm = f"{self.requests_per_minute:g} req/min" if self.request_bucket else "unlimited req/min"
+        tpm = f"{self.tokens_per_minute:g} tokens/min" if self.token_bucket else "unlimited tokens/min"
+        return f"{rpm}, {tpm}"
+
+
+def is_overload_error(error: Exception) -> bool:
+    """True for errors that mean the API is overloaded: 429, 5xx, timeouts and dropped connections"""
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    # The client's APITimeoutError / APIConnectionError carry no status code
+    name = type(error).__name__
+    return isinstance(error, (TimeoutError, ConnectionError)) or "Timeout" in name or "Connection" in name
+
+
+def is_timeout_error(error: Exception) -> bool:
+    return isinstance(error, TimeoutError) or "Timeout" in type(error).__name__
+
+
+def is_payload_error(error: Exception) -> bool:
+    """True for errors saying the request was too big: 413, or a 400 about size or context length"""
+    status = getattr(error, "status_code", None)
+    if status == 413:
+        return True
+    return status == 400 and any(hint in str(error).lower() for hint in PAYLOAD_ERROR_HINTS)
+
+
+def describe_error(error: Exception) -> str:
+    status = getattr(error, "status_code", None)
+    return f"HTTP {status}" if status else type(error).__name__
+
+
+def retry_delay(error: Exception, attempt: int) -> float:
+    """Seconds to wait before retry number `attempt` (0-based)
+
+    Full jitter: a uniform draw from [0, RETRY_BASE_DELAY * 2**attempt],
+    capped at RETRY_MAX_DELAY, so workers that failed together don't retry
+    together. A longer Retry-After sent by the server wins.
+    """
+    delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    try:
+        retry_after = float(headers.get("retry-after")) if headers is not None else 0.0
+    except (TypeError, ValueError):
+        retry_after = 0.0
+    return max(delay, min(retry_after, RETRY_MAX_DELAY))
+
+
+def call_with_retries(request, description: str, max_retries: int = DEFAULT_MAX_RETRIES,
+                      retry_timeouts: bool = True):
+    """Calls request() and retries transient API errors with exponential backoff and jitter
+
+    429s, 5xx responses and dropped connections (and timeouts, unless
+    retry_timeouts is False) are retried up to max_retries times; any other
+    error, or the last failure, is raised.
+
+    Args:
+        request: Function sending the request (including its rate limit wait)
+        description: What is being sent, for the retry messages
+        max_retries: Retries after the first attempt
+        retry_timeouts: Whether timeouts count as transient
+
+    Returns:
+        Whatever request() returns
+    """
+    attempt = 0
+    while True:
+        try:
+            return request()
+        except Exception as e:
+            transient = is_overload_error(e) and (retry_timeouts or not is_timeout_error(e))
+            if not transient or attempt >= max_retries:
+                raise
+            delay = retry_delay(e, attempt)
+            attempt += 1
+            print(f"   🔁 {description}: {describe_error(e)}, retry {attempt}/{max_retries} in {delay:.1f}s")
+            time.sleep(delay)
+
+
+class AdaptiveConcurrency:
+    """AIMD controller for the number of chunk requests in flight
+
+    Additive increase: once a full window of requests (as many as the
+    current limit) completes without trouble, one more slot opens.
+    Multiplicative decrease: a 429, a 5xx, a timeout or a request slower than
+    LATENCY_SPIKE_FACTOR times the recent average latency halves the limit.
+    Only requests started after the last decrease can trigger the next one,
+    so a burst of failures from the same window backs off once.
+
+    Every change is printed with its reason and recorded as a "concurrency"
+    event in the run profile.
+
+    Args:
+        initial: Starting number of requests in flight
+        maximum: Upper bound for the limit
+        minimum: Lower bound for the limit
+        profiler: Optional RunProfiler the changes are recorded in
+    """
+
+    def __init__(self, initial: int, maximum: int, minimum: int = 1, profiler=None):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = min(self.maximum, max(self.minimum, initial))
+        self.profiler = profiler
+        self.average_latency = None  # Moving average of the requests that went fine
+        self.samples = 0
+        self.successes = 0
+        self.changed_at = time.perf_counter()
+        self.decreased_at = 0.0
+        self.low = self.high = self.limit
+        self.changes = 0
+        self.lock = threading.Lock()
+
+    def _change(self, limit: int, reason: str) -> None:
+        previous, self.limit = self.limit, limit
+        self.successes = 0
+        self.changes += 1
+        self.changed_at = time.perf_counter()
+        self.low, self.high = min(self.low, limit), max(self.high, limit)
+        print(f"   🎚️ Concurrency {previous} -> {limit}: {reason}")
+        if self.profiler is not None:
+            self.profiler.event("concurrency", limit=limit, previous=previous, reason=reason)
+
+    def record(self, started: float, latency: float, error: Exception = None) -> None:
+        """Feeds one finished request (perf_counter start, seconds taken, error if it failed)"""
+        with self.lock:
+            if error is not None and not is_overload_error(error):
+                return  # Bad requests say nothing about the API's load
+            average = self.average_latency
+            spike = error is None and self.samples >= 3 and latency > LATENCY_SPIKE_FACTOR * average
+            if error is None:
+                # Spikes count too, so a lasting slowdown becomes the new normal
+                self.samples += 1
+                self.average_latency = latency if self.average_latency is None else (
+                    0.8 * self.average_latency + 0.2 * latency)
+            if error is not None or spike:
+                if started < self.decreased_at:
+                    return  # Already backed off for this window
+                self.decreased_at = time.perf_counter()
+                if spike:
+                    reason = f"latency spike {latency:.1f}s vs {average:.1f}s average"
+                else:
+                    reason = describe_error(error)
+                if self.limit > self.minimum:
+                    self._change(max(self.minimum, self.limit // 2), reason)
+                return
+
+            if started < self.changed_at:
+                return  # Sent under the previous limit
+            self.successes += 1
+            if self.successes >= self.limit and self.limit < self.maximum:
+                self._change(self.limit + 1, f"{self.successes} requests ok at {self.average_latency:.1f}s average")
+
+    @contextmanager
+    def observe(self):
+        """Times the enclosed API call and records its outcome"""
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self.record(start, time.perf_counter() - start, e)
+            raise
+        self.record(start, time.perf_counter() - start)
+
+    def describe(self) -> str:
+        return f"adaptive between {self.minimum} and {self.maximum}, starting at {self.limit}"
+
+
+def estimate_image_tokens(url: str) -> int:
+    """Estimates the prompt tokens of one base64 data URL image from its pixel size
+
+    Only the header is decoded (Pillow reads the size without the pixel
+    data). The image costs IMAGE_TILE_TOKENS per IMAGE_TILE_PX tile plus one
+    thumbnail tile; IMAGE_TOKEN_ESTIMATE if the size can't be read.
+    """
+    try:
+        from PIL import Image
+
+        head = url.split(",", 1)[1][:IMAGE_HEADER_CHARS]
+        with Image.open(BytesIO(base64.b64decode(head[:len(head) // 4 * 4]))) as img:
+            width, height = img.size
+    except Exception:
+        return IMAGE_TOKEN_ESTIMATE
+    return (-(-width // IMAGE_TILE_PX) * -(-height // IMAGE_TILE_PX) + 1) * IMAGE_TILE_TOKENS
+
+
+def estimate_prompt_tokens(messages: list) -> int:
+    """Roughly estimates the prompt tokens of chat messages
+
+    Text is counted at ~4 characters per token and images by their size
+    (estimate_image_tokens).
+    """
+    tokens = 0
+    for message in messages:
+        content = message.get("content", "")
+        if isinstance(content, str):
+            tokens += len(content) // 4
+            continue
+        for part in content:
+            if part.get("type") == "text":
+                tokens += len(part.get("text", "")) // 4
+            elif part.get("type") == "image_url":
+                tokens += estimate_image_tokens(part["image_url"]["url"])
+    return tokens
+
+
+def estimate_request_tokens(messages: list, max_completion_tokens: int) -> int:
+    """Roughly estimates the tokens a chat completion request will consume
+
+    The completion budget is included because quotas count output tokens too.
+    """
+    return estimate_prompt_tokens(messages) + max_completion_tokens
+
+
+def estimate_request_bytes(messages: list) -> int:
+    """Approximate request body size: the text and data URL characters of every part"""
+    size = 0
+    for message in messages:
+        content = message.get("content", "")
+        if isinstance(content, str):
+            size += len(content.encode("utf-8"))
+            continue
+        for part in content:
+            if part.get("type") == "text":
+                size += len(part.get("text", "").encode("utf-8"))
+            elif part.get("type") == "image_url":
+                size += len(part["image_url"]["url"])
+    return size
+
+
+def response_usage(response) -> dict:
+    """Prompt and completion token counts reported with a chat completion, {} if none"""
+    usage = {}
+    for metric in getattr(response, "metrics", None) or []:
+        name = getattr(metric, "metric", None)
+        if name == "num_prompt_tokens":
+            usage["prompt_tokens"] = int(metric.value)
+        elif name == "num_completion_tokens":
+            usage["completion_tokens"] = int(metric.value)
+    return usage
+
+
+class TokenBudget:
+    """Per-request token budget plus a log of estimated vs actual usage
+
+    Requests are estimated before they are sent (estimate_prompt_tokens plus
+    the completion budget). Callers use fits() to split or trim requests that
+    would exceed max_tokens. Every answered call is recorded with its
+    estimate and the usage the API reports. The records go to a JSONL log
+    (one line per call) and are summed up per kind, so the estimator can be
+    calibrated.
+
+    Args:
+        max_tokens: Budget per request, prompt plus completion (0 = no limit)
+        log_file: Optional JSONL file the per-call records are appended to
+    """
+
+    def __init__(self, max_tokens: int = DEFAULT_REQUEST_TOKEN_BUDGET, log_file: str = None):
+        self.max_tokens = max_tokens
+        self.lock = threading.Lock()
+        self.totals = {}  # kind -> [calls, estimated prompt tokens, actual prompt tokens, completion tokens]
+        self.log = None
+        if log_file:
+            try:
+                self.log = open(log_file, "a", encoding="utf-8")
+            except OSError as e:
+                print(f"⚠️ Could not open token usage log {log_file}: {e}")
+
+    def fits(self, tokens: int) -> bool:
+        return self.max_tokens <= 0 or tokens <= self.max_tokens
+
+    def trim_text(self, text: str, tokens: int) -> str:
+        """Cuts text so the request stays within the budget, given the request's current estimate"""
+        if self.fits(tokens):
+            return text
+        keep = max(0, len(text) - (tokens - self.max_tokens) * 4)
+        return text[:keep] + "\n[... trimmed to fit the request token budget ...]"
+
+    def record(self, kind: str, estimated_prompt: int, response, **fields) -> None:
+        """Records one answered call: its estimate and the usage the API reported"""
+        usage = response_usage(response)
+        with self.lock:
+            totals = self.totals.setdefault(kind, [0, 0, 0, 0])
+            totals[0] += 1
+            if "prompt_tokens" in usage:
+                totals[1] += estimated_prompt
+                totals[2] += usage["prompt_tokens"]
+            totals[3] += usage.get("completion_tokens", 0)
+            if self.log is not None:
+                self.log.write(json.dumps({
+                    "time": round(time.time(), 3),
+                    "kind": kind,
+                    **fields,
+                    "estimated_prompt_tokens": estimated_prompt,
+                    **usage,
+                }) + "\n")
+
+    def describe(self) -> str:
+        """One line per call kind: estimated vs actual prompt tokens"""
+        lines = []
+        with self.lock:
+            for kind, (calls, estimated, actual, completion) in self.totals.items():
+                ratio = f", actual/estimated {actual / estimated:.2f}" if estimated else ""
+                lines.append(f"{kind}: {calls} calls, prompt tokens estimated {estimated:,} vs actual {actual:,}"
+                             f"{ratio}, {completion:,} completion tokens")
+        return "\n".join(lines)
+
+    def close(self) -> None:
+        if self.log is not None:
+            self.log.close()
+            self.log = None
+
+
+def wait_for_rate_limit(rate_limiter, messages: list, max_completion_tokens: int, tokens: int = None) -> None:
+    """Blocks until the rate limiter allows the given request
+
+    Args:
+        tokens: The request's estimate, if already known (saves estimating again)
+    """
+    if rate_limiter is None:
+        return
+    if tokens is None:
+        tokens = estimate_request_tokens(messages, max_completion_tokens)
+    waited = rate_limiter.acquire(tokens)
+    if waited >= 0.5:
+        print(f"   ⏳ Rate limit: waited {waited:.1f} seconds")
+
+
+def file_sha256(file_path: str) -> str:
+    """Returns the SHA-256 hex digest of a file's content, or "" if it can't be read"""
+    digest = hashlib.sha256()
+    try:
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+    except OSError:
+        return ""
+    return digest.hexdigest()
+
+
+class FrameAnalysisCache:
+    """Content-addressed on-disk cache of frame analyses with size-based LRU eviction
+
+    Entries are small JSON files named after a key derived from the image
+    content hash, model, prompt text and sampling parameters, so renaming a
+    folder or re-running with a different critique prompt still hits the
+    cache. Entries are kept in least recently used order (seeded from the
+    file modification times); when the cache grows past max_bytes the least
+    recently used ones are deleted until it is back under CACHE_EVICT_TARGET
+    of the limit.
+
+    Args:
+        cache_dir: Directory holding the cache entries
+        max_bytes: Size limit for all entries together
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_CACHE_MAX_MB * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.evictions = 0
+        self.entries = OrderedDict()  # key -> size, least recently used first
+
+        os.makedirs(cache_dir, exist_ok=True)
+        found = []
+        for root, _, files in os.walk(cache_dir):
+            for name in files:
+                if name.endswith(".json"):
+                    stat = os.stat(os.path.join(root, name))
+                    found.append((stat.st_mtime, name[:-5], stat.st_size))
+        for _, key, size in sorted(found):
+            self.entries[key] = size
+        self.total_bytes = sum(self.entries.values())
+        self._evict()
+
+    @staticmethod
+    def make_key(image_hashes: list, model: str, prompts: list, params: dict) -> str:
+        """Builds a cache key from image content hashes, model, prompt texts and sampling parameters"""
+        material = json.dumps([image_hashes, model, prompts, params], sort_keys=True)
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, key: str, count: bool = True):
+        """Returns the cached entry for `key` or None
+
+        Args:
+            key: Cache key from make_key
+            count: Update the hit/miss statistics. Probes whose outcome depends
+                on later lookups pass False and report the frames with record().
+        """
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            if count:
+                self.record(misses=1)
+            return None
+
+        now = time.time()
+        try:
+            os.utime(path, (now, now))
+        except OSError:
+            pass
+        if count:
+            self.record(hits=1, bytes_saved=entry.get("payload_bytes", 0))
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+        return entry
+
+    def record(self, hits: int = 0, misses: int = 0, bytes_saved: int = 0) -> None:
+        """Adds to the hit/miss statistics"""
+        with self.lock:
+            self.hits += hits
+            self.misses += misses
+            self.bytes_saved += bytes_saved
+
+    def put(self, key: str, entry: dict) -> None:
+        """Stores an entry and evicts least recently used entries if over the size limit"""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = json.dumps(entry, ensure_ascii=False).encode("utf-8")
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self.lock:
+            old_size = self.entries.pop(key, 0)
+            self.entries[key] = len(data)
+            self.total_bytes += len(data) - old_size
+            self._evict()
+
+    def _evict(self) -> None:
+        if self.total_bytes <= self.max_bytes:
+            return
+        target = self.max_bytes * CACHE_EVICT_TARGET
+        while self.entries and self.total_bytes > target:
+            key, size = self.entries.popitem(last=False)
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+            self.total_bytes -= size
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        """Returns hit/miss statistics and the current cache size"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "bytes_saved": self.bytes_saved,
+                "evictions": self.evictions,
+                "entries": len(self.entries),
+                "size_bytes": self.total_bytes,
+            }
+
+    def print_stats(self) -> None:
+        """Prints the cache statistics"""
+        stats = self.stats()
+        print(f"🗄️ Cache: {stats['hits']} hits, {stats['misses']} misses "
+              f"({stats['hit_rate']:.0%} hit rate), {stats['bytes_saved'] / 1024 / 1024:.1f} MB upload saved, "
+              f"{stats['entries']} entries / {stats['size_bytes'] / 1024 / 1024:.1f} MB on disk")
 
 
 def image_to_base64(image_path: str) -> str:
     """Converts an image to base64 string
     
     Args:
-        image_path: Path to the image file
-        
+        image_path: Path to the image file
+        
+    Returns:
+        Base64 encoded string of the image
+    """
+    try:
+        with open(image_path, "rb") as img:
+            return base64.b64encode(img.read()).decode('utf-8')
+    except Exception as e:
+        print(f"❌ Error converting {image_path} to base64: {e}")
+        return ""
+
+
+def frame_prompt(image_file: str) -> str:
+    """Returns the analysis instruction sent with one image"""
+    return f"Analyze this image '{image_file}' and describe what you see. Include details about objects, people, scenes, colors, composition, and any notable features."
+
+
+def packed_prompt(image_files: list) -> str:
+    """Returns the single instruction sent with a packed chunk of images
+
+    The model is asked for a JSON array keyed by file name, so every frame
+    gets its own analysis no matter how the answer is laid out.
+    """
+    names = ", ".join(f"'{image_file}'" for image_file in image_files)
+    return (
+        f"The following {len(image_files)} images are frames of the same video, each preceded by its file name: "
+        f"{names}. For every image, describe what you see. Include details about objects, people, scenes, "
+        "colors, composition, and any notable features.\n\n"
+        "Respond with ONLY a JSON array holding one object per image, in the order given: "
+        '[{"image": "<file name>", "analysis": "<description>"}]'
+    )
+
+
+def image_mime_type(image_path: str) -> str:
+    """Guesses the MIME type of an image file from its extension"""
+    mime_type, _ = mimetypes.guess_type(image_path)
+    return mime_type if mime_type and mime_type.startswith("image/") else "image/jpeg"
+
+
+class FramePreprocessor:
+    """Downscales and re-encodes frames before they are base64 encoded
+
+    4K PNG exports turn into multi-megabyte payloads; shrinking them to a
+    sensible max edge and re-encoding as JPEG/WebP cuts upload size and
+    request latency by an order of magnitude. Requires Pillow.
+
+    Args:
+        max_edge: Longest allowed image edge in pixels, 0 keeps the original size
+        image_format: "jpeg", "webp" or "original" (keep the file's format when not resizing)
+        quality: Encoder quality for JPEG/WebP (1-100)
+    """
+
+    FORMATS = {"jpeg": ("JPEG", "image/jpeg"), "webp": ("WEBP", "image/webp")}
+
+    def __init__(self, max_edge: int = DEFAULT_MAX_EDGE, image_format: str = DEFAULT_IMAGE_FORMAT,
+                 quality: int = DEFAULT_IMAGE_QUALITY):
+        try:
+            from PIL import Image
+        except ImportError:
+            print("❌ Pillow not found. Frame preprocessing needs it:")
+            print("   pip install Pillow")
+            sys.exit(1)
+        self.Image = Image
+        self.max_edge = max_edge
+        self.image_format = image_format.lower()
+        self.quality = quality
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_edge > 0 or self.image_format != "original"
+
+    def cache_params(self) -> dict:
+        """Settings that change the uploaded image and therefore the cache key"""
+        return {"max_edge": self.max_edge, "image_format": self.image_format, "quality": self.quality}
+
+    def describe(self) -> str:
+        size = f"max edge {self.max_edge}px" if self.max_edge > 0 else "original size"
+        if self.image_format == "original":
+            return size
+        return f"{size}, {self.image_format.upper()} quality {self.quality}"
+
+    def encode_bytes(self, data: bytes, image_path: str = "") -> tuple:
+        """Resizes and re-encodes raw image bytes
+
+        Returns:
+            Tuple of (encoded bytes, MIME type)
+        """
+        with self.Image.open(BytesIO(data)) as img:
+            resized = self.max_edge > 0 and max(img.size) > self.max_edge
+            if not resized and self.image_format == "original":
+                return data, image_mime_type(image_path)
+
+            if resized:
+                img.thumbnail((self.max_edge, self.max_edge), self.Image.LANCZOS)
+
+            image_format = self.image_format if self.image_format != "original" else "jpeg"
+            pil_format, mime_type = self.FORMATS[image_format]
+            if img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+
+            buffer = BytesIO()
+            img.save(buffer, format=pil_format, quality=self.quality)
+            return buffer.getvalue(), mime_type
+
+    def encode(self, image_path: str) -> tuple:
+        """Reads, resizes and re-encodes an image, returning (base64 string, MIME type)
+
+        Returns ("", "") if the image can't be read or decoded.
+        """
+        try:
+            with open(image_path, "rb") as img:
+                data, mime_type = self.encode_bytes(img.read(), image_path)
+            return base64.b64encode(data).decode('utf-8'), mime_type
+        except Exception as e:
+            print(f"❌ Error preprocessing {image_path}: {e}")
+            return "", ""
+
+
+class FrameDeduplicator:
+    """Collapses runs of near-identical frames using a perceptual hash
+
+    Static shots exported by ffmpeg produce hundreds of visually identical
+    frames. Each candidate frame gets a 64-bit aHash or dHash (computed with
+    NumPy on a tiny grayscale thumbnail); consecutive frames whose Hamming
+    distance to the first frame of the current run stays within the
+    threshold are folded into that run, and only the first frame of each run
+    is sent to the API. Requires Pillow and NumPy.
+
+    Args:
+        threshold: Maximum Hamming distance to the run's first frame
+        method: "dhash" (gradient based, robust to exposure changes) or "ahash"
+        hash_size: Hash grid size; 8 gives 64-bit hashes
+    """
+
+    def __init__(self, threshold: int = DEFAULT_DEDUPE_THRESHOLD, method: str = "dhash", hash_size: int = 8):
+        try:
+            import numpy as np
+            from PIL import Image
+        except ImportError:
+            print("❌ NumPy and Pillow are needed for frame deduplication:")
+            print("   pip install numpy Pillow")
+            sys.exit(1)
+        self.np = np
+        self.Image = Image
+        self.threshold = threshold
+        self.method = method
+        self.hash_size = hash_size
+
+    def hash_bits(self, image):
+        """Returns the perceptual hash of one image (path or file object) as a flat boolean array"""
+        np = self.np
+        width = self.hash_size + 1 if self.method == "dhash" else self.hash_size
+        with self.Image.open(image) as img:
+            img.draft("L", (width * 8, self.hash_size * 8))  # Fast JPEG downscaled decode
+            thumb = img.convert("L").resize((width, self.hash_size), self.Image.BILINEAR)
+            pixels = np.asarray(thumb, dtype=np.int16)
+        if self.method == "dhash":
+            return (pixels[:, 1:] > pixels[:, :-1]).ravel()
+        return (pixels > pixels.mean()).ravel()
+
+    def hash_frames(self, folder_path: str, image_files: list):
+        """Hashes all frames in parallel and returns an (N, bits) boolean matrix"""
+        paths = [os.path.join(folder_path, image_file) for image_file in image_files]
+        with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) + 4)) as executor:
+            return self.np.array(list(executor.map(self.hash_bits, paths)))
+
+    def group_stream(self, frames, runs: dict):
+        """Streaming variant of group() for frames that never touch disk
+
+        Args:
+            frames: Iterator of (frame_name, source_frame_index, image_bytes)
+            runs: Dictionary filled with {"first", "last", "frames"} per
+                representative; runs are extended as later frames join them
+
+        Yields:
+            The (frame_name, source_frame_index, image_bytes) tuple of the
+            first frame of every run, as soon as the run starts
+        """
+        run_hash = None
+        run = None
+        run_start = 0
+        for name, source_index, data in frames:
+            bits = self.hash_bits(BytesIO(data))
+            if run_hash is not None and int(self.np.count_nonzero(bits != run_hash)) <= self.threshold:
+                run["last"] = name
+                run["frames"] = source_index - run_start + 1
+                continue
+            if run is not None:
+                # The previous run lasts until just before this frame, skipped source frames included
+                run["frames"] = source_index - run_start
+            run_hash = bits
+            run_start = source_index
+            run = runs[name] = {"first": name, "last": name, "frames": 1}
+            yield name, source_index, data
+
+    def group(self, folder_path: str, candidates: list, all_files: list) -> tuple:
+        """Groups candidate frames into runs of near-identical images
+
+        Args:
+            folder_path: Path to folder containing images
+            candidates: Frames to consider, in order (after skip_frames filtering)
+            all_files: Every frame in the folder, used to count how many source
+                frames each run spans
+
+        Returns:
+            Tuple of (representatives, runs) where runs maps each representative
+            to {"first", "last", "frames"} describing the shot it stands for
+        """
+        if not candidates:
+            return [], {}
+
+        hashes = self.hash_frames(folder_path, candidates)
+        positions = {image_file: i for i, image_file in enumerate(all_files)}
+
+        run_starts = [0]
+        for i in range(1, len(candidates)):
+            distance = int(self.np.count_nonzero(hashes[i] != hashes[run_starts[-1]]))
+            if distance > self.threshold:
+                run_starts.append(i)
+
+        # A run lasts until just before the next run's first candidate (or the end of
+        # the folder), so the source frames skipped after its last candidate count too
+        representatives = []
+        runs = {}
+        run_ends = [positions[candidates[start]] for start in run_starts[1:]] + [len(all_files)]
+        for start, end in zip(run_starts, run_ends):
+            first = candidates[start]
+            representatives.append(first)
+            runs[first] = {
+                "first": first,
+                "last": all_files[end - 1],
+                "frames": end - positions[first],
+            }
+        return representatives, runs
+
+
+class KeyframeSelector:
+    """Picks representative keyframes per shot within a total frame budget
+
+    Instead of taking every Nth file, every frame gets a cheap feature vector
+    from a small thumbnail (per-channel color histogram, or raw grayscale
+    pixels). Consecutive-frame distances are computed in one vectorized
+    NumPy step; distances above the threshold are shot boundaries. The budget
+    is then split across shots in proportion to their length (at least one
+    frame per shot), and each shot's share is taken from the middle of equal
+    sub-ranges. When there are more shots than budget, only the strongest
+    cuts are kept. Requires Pillow and NumPy.
+
+    Args:
+        budget: Total number of frames to send for the whole folder
+        method: "histogram" (color histogram distance) or "pixel" (mean pixel difference)
+        threshold: Boundary score threshold in [0, 1]; defaults per method. The
+            histogram score is the fraction of the color histogram that moves
+            between frames (1.0 for a black to white cut), the pixel score the
+            mean absolute pixel difference.
+    """
+
+    DEFAULT_THRESHOLDS = {"histogram": 0.2, "pixel": 0.1}
+    THUMB_SIZE = (32, 18)
+    HIST_BINS = 16
+
+    def __init__(self, budget: int = DEFAULT_KEYFRAME_BUDGET, method: str = "histogram", threshold: float = None):
+        try:
+            import numpy as np
+            from PIL import Image
+        except ImportError:
+            print("❌ NumPy and Pillow are needed for keyframe selection:")
+            print("   pip install numpy Pillow")
+            sys.exit(1)
+        self.np = np
+        self.Image = Image
+        self.budget = max(1, budget)
+        self.method = method
+        self.threshold = threshold if threshold is not None else self.DEFAULT_THRESHOLDS[method]
+
+    def frame_features(self, image_path: str):
+        """Returns the feature vector of one frame"""
+        np = self.np
+        mode = "RGB" if self.method == "histogram" else "L"
+        with self.Image.open(image_path) as img:
+            img.draft(mode, (self.THUMB_SIZE[0] * 8, self.THUMB_SIZE[1] * 8))  # Fast JPEG downscaled decode
+            thumb = np.asarray(img.convert(mode).resize(self.THUMB_SIZE, self.Image.BILINEAR))
+        if self.method == "pixel":
+            return thumb.astype(np.float32).ravel() / 255.0
+        # Per-channel histograms, concatenated and normalized to sum to 1
+        bins = (thumb.reshape(-1, 3) // (256 // self.HIST_BINS)) + np.arange(3) * self.HIST_BINS
+        hist = np.bincount(bins.ravel(), minlength=3 * self.HIST_BINS).astype(np.float32)
+        return hist / hist.sum()
+
+    def scores(self, folder_path: str, image_files: list):
+        """Returns the change score between each pair of consecutive frames"""
+        np = self.np
+        paths = [os.path.join(folder_path, image_file) for image_file in image_files]
+        with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) + 4)) as executor:
+            features = np.array(list(executor.map(self.frame_features, paths)))
+        diffs = np.abs(features[1:] - features[:-1])
+        if self.method == "histogram":
+            return diffs.sum(axis=1) / 2.0  # Features sum to 1 overall, so their L1 distance is at most 2
+        return diffs.mean(axis=1)
+
+    def allocate(self, shot_lengths: list, budget: int) -> list:
+        """Splits the budget across shots proportionally to length, at least one frame each"""
+        total = sum(shot_lengths)
+        ideal = [length * budget / total for length in shot_lengths]
+        allocation = [min(length, max(1, int(share))) for length, share in zip(shot_lengths, ideal)]
+
+        while sum(allocation) > budget:
+            i = max((i for i in range(len(allocation)) if allocation[i] > 1),
+                    key=lambda i: allocation[i] - ideal[i])
+            allocation[i] -= 1
+        while sum(allocation) < budget:
+            candidates = [i for i in range(len(allocation)) if allocation[i] < shot_lengths[i]]
+            if not candidates:
+                break
+            i = max(candidates, key=lambda i: ideal[i] - allocation[i])
+            allocation[i] += 1
+        return allocation
+
+    def select(self, folder_path: str, image_files: list) -> tuple:
+        """Detects shot boundaries and picks keyframes within the budget
+
+        Returns:
+            Tuple of (keyframes, runs) where runs maps each keyframe to the
+            {"first", "last", "frames"} range of source frames it stands for
+        """
+        if not image_files:
+            return [], {}
+
+        scores = self.scores(folder_path, image_files) if len(image_files) > 1 else self.np.zeros(0)
+        boundaries = [int(i) + 1 for i in self.np.flatnonzero(scores > self.threshold)]
+        budget = min(self.budget, len(image_files))
+        if len(boundaries) + 1 > budget:
+            # More shots than budget: keep only the strongest cuts
+            strongest = sorted(boundaries, key=lambda b: scores[b - 1], reverse=True)[:budget - 1]
+            boundaries = sorted(strongest)
+        self.shot_count = len(boundaries) + 1
+
+        starts = [0] + boundaries
+        ends = boundaries + [len(image_files)]
+        allocation = self.allocate([end - start for start, end in zip(starts, ends)], budget)
+
+        keyframes = []
+        runs = {}
+        for start, end, picks in zip(starts, ends, allocation):
+            edges = [start + (end - start) * k // picks for k in range(picks + 1)]
+            for seg_start, seg_end in zip(edges, edges[1:]):
+                keyframe = image_files[(seg_start + seg_end - 1) // 2]
+                keyframes.append(keyframe)
+                runs[keyframe] = {
+                    "first": image_files[seg_start],
+                    "last": image_files[seg_end - 1],
+                    "frames": seg_end - seg_start,
+                }
+        return keyframes, runs
+
+
+class ContactSheetBuilder:
+    """Composites groups of consecutive frames into labelled contact sheets
+
+    For storyboard-level critique one image per frame is more than needed:
+    a 3x3 sheet of consecutive frames shows the same pacing for a ninth of
+    the images. Tiles are laid out left to right, top to bottom, each with
+    its frame number burned into the corner, and the sheet is sent as one
+    JPEG image. Requires Pillow.
+
+    Args:
+        cols: Tiles per row
+        rows: Tiles per column
+        tile_width: Width of each tile in pixels; the height follows the
+            aspect ratio of the sheet's first frame
+        quality: JPEG quality of the composited sheet
+    """
+
+    GUTTER = 4  # Pixels of white between tiles so frame edges stay visible
+
+    def __init__(self, cols: int = 3, rows: int = 3, tile_width: int = DEFAULT_SHEET_TILE_WIDTH,
+                 quality: int = DEFAULT_IMAGE_QUALITY):
+        try:
+            from PIL import Image, ImageDraw, ImageFont
+        except ImportError:
+            print("❌ Pillow not found. Contact sheets need it:")
+            print("   pip install Pillow")
+            sys.exit(1)
+        self.Image = Image
+        self.ImageDraw = ImageDraw
+        self.cols = max(1, cols)
+        self.rows = max(1, rows)
+        self.tile_width = max(32, tile_width)
+        self.quality = quality
+        try:
+            self.font = ImageFont.load_default(size=max(12, self.tile_width // 16))
+        except TypeError:  # Pillow < 10.1 only has the small bitmap font
+            self.font = ImageFont.load_default()
+
+    @property
+    def frames_per_sheet(self) -> int:
+        return self.cols * self.rows
+
+    def describe(self) -> str:
+        return f"{self.cols}x{self.rows} grid, {self.tile_width}px tiles"
+
+    def sheet_name(self, tiles: list) -> str:
+        """Name of the virtual image holding the given frames"""
+        return f"sheet_{Path(tiles[0]).stem}-{Path(tiles[-1]).stem}.jpg"
+
+    def prompt(self, sheet_name: str) -> str:
+        """Returns the analysis instruction sent with one contact sheet"""
+        return (f"This image '{sheet_name}' is a contact sheet of consecutive video frames, read left to right "
+                "and top to bottom, each labelled with its frame number. Describe the sequence as a whole: "
+                "what changes from frame to frame, shot changes and camera movement, and the objects, people, "
+                "scenes, colors, composition and any notable features.")
+
+    def group(self, frames: list, runs: dict, all_files: list) -> tuple:
+        """Splits the frames into sheets and works out which source frames each sheet covers
+
+        Args:
+            frames: Frames to tile, in order (after filtering)
+            runs: Runs the frames already stand for (dedupe/keyframes), may be empty
+            all_files: Every frame in the folder, sorted, used to count the
+                source frames a sheet spans
+
+        Returns:
+            Tuple of (sheets, sheet_runs) where sheets is a list of
+            (sheet_name, tiles) and sheet_runs maps each sheet name to
+            {"first", "last", "frames", "tiles"}
+        """
+        sheets = []
+        sheet_runs = {}
+        for i in range(0, len(frames), self.frames_per_sheet):
+            tiles = frames[i:i + self.frames_per_sheet]
+            first = runs[tiles[0]]["first"] if tiles[0] in runs else tiles[0]
+            last = runs[tiles[-1]]["last"] if tiles[-1] in runs else tiles[-1]
+            name = self.sheet_name(tiles)
+            sheets.append((name, tiles))
+            sheet_runs[name] = {
+                "first": first,
+                "last": last,
+                "frames": max(len(tiles), bisect_right(all_files, last) - bisect_left(all_files, first)),
+                "tiles": tiles,
+            }
+        return sheets, sheet_runs
+
+    def compose(self, folder_path: str, tiles: list) -> bytes:
+        """Composites one sheet and returns it JPEG encoded, or None if no frame could be read"""
+        Image = self.Image
+        sheet = draw = None
+        tile_height = 0
+        for i, image_file in enumerate(tiles):
+            try:
+                with Image.open(os.path.join(folder_path, image_file)) as img:
+                    if sheet is None:
+                        tile_height = max(1, round(self.tile_width * img.height / img.width))
+                        rows = (len(tiles) + self.cols - 1) // self.cols
+                        sheet = Image.new("RGB", (self.tile_width * self.cols + self.GUTTER * (self.cols - 1),
+                                                  tile_height * rows + self.GUTTER * (rows - 1)), "white")
+                        draw = self.ImageDraw.Draw(sheet)
+                    img.draft("RGB", (self.tile_width, tile_height))  # Fast JPEG downscaled decode
+                    tile = img.convert("RGB")
+                    tile.thumbnail((self.tile_width, tile_height), Image.BILINEAR)
+            except Exception as e:
+                print(f"❌ Error reading {image_file} for its contact sheet: {e}")
+                continue
+
+            x = (i % self.cols) * (self.tile_width + self.GUTTER)
+            y = (i // self.cols) * (tile_height + self.GUTTER)
+            draw.rectangle((x, y, x + self.tile_width - 1, y + tile_height - 1), fill="black")
+            sheet.paste(tile, (x + (self.tile_width - tile.width) // 2, y + (tile_height - tile.height) // 2))
+            label = Path(image_file).stem
+            left, top, right, bottom = draw.textbbox((x + 6, y + 6), label, font=self.font)
+            draw.rectangle((left - 4, top - 4, right + 4, bottom + 4), fill="black")
+            draw.text((x + 6, y + 6), label, fill="white", font=self.font)
+
+        if sheet is None:
+            return None
+        buffer = BytesIO()
+        sheet.save(buffer, format="JPEG", quality=self.quality)
+        return buffer.getvalue()
+
+    def iter_sheets(self, folder_path: str, sheets: list):
+        """Composites the sheets in a thread pool, a few ahead of the consumer
+
+        Yields:
+            Tuples of (sheet_name, sheet_index, jpeg_bytes), in order
+        """
+        workers = min(8, os.cpu_count() or 1)
+        queue = deque()
+        source = iter(enumerate(sheets))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sheets") as executor:
+            while True:
+                while len(queue) < 2 * workers:
+                    item = next(source, None)
+                    if item is None:
+                        break
+                    index, (name, tiles) = item
+                    queue.append((name, index, executor.submit(self.compose, folder_path, tiles)))
+                if not queue:
+                    break
+                name, index, future = queue.popleft()
+                data = future.result()
+                if data is not None:
+                    yield name, index, data
+
+
+def describe_run(run: dict) -> str:
+    """Short text describing how long a collapsed run of frames lasts"""
+    if run["frames"] <= 1:
+        return ""
+    return f" [covers {run['frames']} frames: {run['first']} - {run['last']}]"
+
+
+def annotate_runs(analysis_results: list, runs: dict) -> None:
+    """Adds the collapsed frame runs to result entries so the critique knows shot lengths"""
+    for result in analysis_results:
+        if "image" in result and result["image"] in runs:
+            result["run"] = runs[result["image"]]
+        elif "images" in result:
+            covered = {f: runs[f] for f in result["images"] if f in runs}
+            if covered:
+                result["runs"] = covered
+
+
+class RunProfiler:
+    """Records timed spans of one run and writes them as a JSON run profile
+
+    Every span has a stage name and, for work done on behalf of a chunk, the
+    chunk number. Chunk workers run in threads, so recording is thread-safe.
+    Stage totals of concurrent work can add up to more than the wall time.
+    Spans are kept in flat arrays (about 26 bytes each) so profiling a
+    50k-frame run stays cheap. Rare point-in-time events (like concurrency
+    changes) are kept as a list of dicts.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.started_at = time.strftime("%Y-%m-%d %H:%M:%S")
+        self.stages = []  # Stage names by index
+        self.stage_index = {}
+        self.span_stages = array("H")
+        self.span_starts = array("d")
+        self.span_durations = array("d")
+        self.span_chunks = array("q")  # -1 for run-level spans
+        self.events = []
+        self.lock = threading.Lock()
+
+    def add(self, stage: str, start: float, end: float, chunk: int = None) -> None:
+        """Records a span from perf_counter timestamps"""
+        with self.lock:
+            index = self.stage_index.get(stage)
+            if index is None:
+                index = self.stage_index[stage] = len(self.stages)
+                self.stages.append(stage)
+            self.span_stages.append(index)
+            self.span_starts.append(start - self.start)
+            self.span_durations.append(end - start)
+            self.span_chunks.append(-1 if chunk is None else chunk)
+
+    def event(self, kind: str, **fields) -> None:
+        """Records a point-in-time event with arbitrary JSON-serializable fields"""
+        with self.lock:
+            self.events.append({"event": kind, "time": round(time.perf_counter() - self.start, 6), **fields})
+
+    def span_count(self) -> int:
+        """Number of spans recorded so far; indices below it are safe to read"""
+        with self.lock:
+            return len(self.span_stages)
+
+    def spans_by_chunk(self):
+        """Yields (chunk, span indices in start order), run-level spans (chunk -1) first
+
+        Buckets the span indices by chunk in one flat array instead of
+        sorting per-span tuples, so writing the profile needs little memory.
+        """
+        count = self.span_count()
+        chunks = self.span_chunks
+        sizes = {}
+        for i in range(count):
+            sizes[chunks[i]] = sizes.get(chunks[i], 0) + 1
+        offsets = {}
+        position = 0
+        for chunk in sorted(sizes):
+            offsets[chunk] = position
+            position += sizes[chunk]
+        ends = dict(offsets)
+        order = array("q", bytes(8 * count))
+        for i in range(count):
+            order[ends[chunks[i]]] = i
+            ends[chunks[i]] += 1
+        for chunk in sorted(sizes):
+            yield chunk, sorted(order[offsets[chunk]:ends[chunk]], key=self.span_starts.__getitem__)
+
+    @contextmanager
+    def span(self, stage: str, chunk: int = None):
+        """Times the enclosed block as one span of `stage`"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, start, time.perf_counter(), chunk)
+
+    def summary(self) -> dict:
+        """Per-stage count, total, mean and max seconds, in order of first appearance"""
+        stages = {}
+        for i in range(self.span_count()):
+            duration = self.span_durations[i]
+            entry = stages.setdefault(self.stages[self.span_stages[i]], {"count": 0, "total": 0.0, "max": 0.0})
+            entry["count"] += 1
+            entry["total"] += duration
+            entry["max"] = max(entry["max"], duration)
+        for entry in stages.values():
+            entry["mean"] = entry["total"] / entry["count"]
+        return stages
+
+    def write(self, f) -> float:
+        """Streams the profile as JSON: stage summary, run-level spans and per-chunk spans
+
+        Spans are written one per line in start order, grouped by chunk.
+
+        Returns:
+            Wall time of the run in seconds
+        """
+        wall = time.perf_counter() - self.start
+
+        def span_json(i):
+            return json.dumps({"stage": self.stages[self.span_stages[i]], "start": round(self.span_starts[i], 6),
+                               "duration": round(self.span_durations[i], 6)})
+
+        f.write("{\n")
+        f.write(f'  "started_at": {json.dumps(self.started_at)},\n')
+        f.write(f'  "wall_seconds": {round(wall, 6)},\n')
+        f.write('  "stages": ' + json.dumps(self.summary(), indent=2).replace("\n", "\n  ") + ",\n")
+        if self.events:
+            f.write('  "events": [\n    ' + ",\n    ".join(json.dumps(e) for e in self.events) + "\n  ],\n")
+        f.write('  "run_spans": [')
+        groups = self.spans_by_chunk()
+        group = next(groups, None)
+        if group is not None and group[0] < 0:
+            f.write("\n    " + ",\n    ".join(span_json(i) for i in group[1]) + "\n  ")
+            group = next(groups, None)
+        f.write('],\n  "chunks": {')
+        first = True
+        while group is not None:
+            chunk, indices = group
+            f.write(("\n" if first else ",\n") + f'    "{chunk}": [\n      '
+                    + ",\n      ".join(span_json(i) for i in indices) + "\n    ]")
+            first = False
+            group = next(groups, None)
+        f.write("\n  }\n}\n" if not first else "}\n}\n")
+        return wall
+
+    def save(self, profile_file: str) -> None:
+        """Writes the profile as JSON and prints the stage table"""
+        try:
+            with open(profile_file, "w", encoding="utf-8") as f:
+                wall = self.write(f)
+        except OSError as e:
+            print(f"⚠️ Could not write run profile {profile_file}: {e}")
+            profile_file = None
+            wall = time.perf_counter() - self.start
+
+        print(f"\n⏱️ Run profile ({wall:.2f}s wall)" + (f" saved to {profile_file}" if profile_file else ""))
+        print(f"   {'Stage':<16}{'Count':>7}{'Total s':>10}{'Mean ms':>10}{'Max ms':>10}{'Share':>8}")
+        for stage, entry in self.summary().items():
+            print(f"   {stage:<16}{entry['count']:>7}{entry['total']:>10.2f}{entry['mean'] * 1000:>10.1f}"
+                  f"{entry['max'] * 1000:>10.1f}{entry['total'] / (wall or 1e-9):>8.0%}")
+
+
+class AnalysisContext:
+    """Shared state of one analysis run, handed to every chunk worker
+
+    Args:
+        client: Initialized LlamaAPIClient
+        rate_limiter: Optional RateLimiter every request has to pass through
+        cache: Optional FrameAnalysisCache; cached frames skip the API
+        preprocessor: Optional FramePreprocessor applied before upload
+        analysis_model: Model used for the frame analysis requests
+        critique_model: Model used for the summaries and the final critique
+        output_dir: Directory the results and the critique are written to
+        profiler: RunProfiler the stages of this run are timed with
+        packed: Send each chunk as one message with a single instruction and
+            parse the per-frame JSON answer (see packed_prompt)
+        max_retries: Retries of transient errors per request; frames that
+            still fail are sent once more at the end of the run (0 disables both)
+
+    The per-image instruction is `prompt` (frame_prompt unless contact
+    sheets are sent instead of frames). `concurrency` holds the
+    AdaptiveConcurrency controller when the number of requests in flight adapts.
+    `store` is the ResultStore the finished chunks are written to.
+    """
+
+    def __init__(self, client, rate_limiter: RateLimiter = None, cache: FrameAnalysisCache = None,
+                 preprocessor: FramePreprocessor = None, analysis_model: str = ANALYSIS_MODEL,
+                 critique_model: str = CRITIQUE_MODEL, output_dir: str = ".", profiler: RunProfiler = None,
+                 packed: bool = False, max_retries: int = DEFAULT_MAX_RETRIES):
+        self.client = client
+        self.rate_limiter = rate_limiter
+        self.cache = cache
+        self.preprocessor = preprocessor if preprocessor is not None and preprocessor.enabled else None
+        self.analysis_model = analysis_model
+        self.critique_model = critique_model
+        self.output_dir = output_dir
+        self.profiler = profiler if profiler is not None else RunProfiler()
+        self.packed = packed
+        self.prompt = frame_prompt
+        self.concurrency = None
+        self.frame_data = None  # Frame bytes held in memory (video streaming) instead of files
+        self.video_path = None  # Video the frames are streamed from, whose transcript is named after it
+        self.max_retries = max_retries
+        self.fps = DEFAULT_FPS  # Frame rate of the frame numbering, for the transcript alignment
+        self.budget = TokenBudget()  # Per-request token budget and usage log
+        self.retry_items = {}  # Encoded images of failed frames, kept for the end-of-run retry
+        self.failed_chunks = {}  # chunk_number -> (chunk, hashes) of chunks with deferred frames
+        self.store = None  # ResultStore the run is recorded in, opened by open_result_store
+        self.export_json = False  # Also export the run's results to RESULTS_FILE
+        self.lock = threading.Lock()
+
+    def defer_failed(self, results: list, images: list, image_items: list) -> None:
+        """Keeps the encoded images of frames whose result is an error for the end-of-run retry"""
+        items = dict(zip(images, image_items))
+        with self.lock:
+            for result in results:
+                if "error" in result:
+                    for image_file in result_images(result):
+                        if image_file in items:
+                            self.retry_items[image_file] = items[image_file]
+
+    def release_frames(self, chunk: list) -> None:
+        """Drops in-memory frame bytes that are no longer needed"""
+        if self.frame_data is not None:
+            for image_file in chunk:
+                self.frame_data.pop(image_file, None)
+
+
+def read_image_bytes(image_path: str) -> bytes:
+    """Reads an image file, returning None (with a message) on failure"""
+    try:
+        with open(image_path, "rb") as img:
+            return img.read()
+    except Exception as e:
+        print(f"❌ Error reading {image_path}: {e}")
+        return None
+
+
+def bytes_to_base64(data: bytes, image_file: str, preprocessor: FramePreprocessor = None) -> tuple:
+    """Base64 encodes in-memory image bytes, preprocessing them first if requested
+
+    Returns:
+        Tuple of (base64 string, MIME type), ("", "") on failure
+    """
+    try:
+        if preprocessor is not None:
+            data, mime_type = preprocessor.encode_bytes(data, image_file)
+        else:
+            mime_type = image_mime_type(image_file)
+        return base64.b64encode(data).decode('utf-8'), mime_type
+    except Exception as e:
+        print(f"❌ Error encoding frame {image_file}: {e}")
+        return "", ""
+
+
+def assemble_messages(image_items: list, image_files: list, packed: bool = False, prompt=frame_prompt) -> list:
+    """Builds the chat messages for images that are already encoded
+
+    Args:
+        image_items: "image_url" content items, one per image file
+        image_files: Image file names, in the same order
+        packed: One user message with a single packed_prompt instruction and a
+            file name label before each image, instead of one message per image
+        prompt: Function returning the instruction for one image name
+    """
+    if not packed:
+        return [
+            {"role": "user", "content": [{"type": "text", "text": prompt(image_file)}, item]}
+            for image_file, item in zip(image_files, image_items)
+        ]
+    if not image_files:
+        return []
+    content = [{"type": "text", "text": packed_prompt(image_files)}]
+    for image_file, item in zip(image_files, image_items):
+        content.append({"type": "text", "text": image_file})
+        content.append(item)
+    return [{"role": "user", "content": content}]
+
+
+def build_chunk_messages(folder_path: str, chunk: list, preprocessor: FramePreprocessor = None,
+                         frame_data: dict = None, profiler: RunProfiler = None, chunk_number: int = None,
+                         packed: bool = False, prompt=frame_prompt) -> tuple:
+    """Builds the Llama API messages for one chunk of images
+
+    Args:
+        folder_path: Path to folder containing images
+        chunk: Image file names in this chunk
+        preprocessor: Optional FramePreprocessor to shrink frames before encoding
+        frame_data: Optional in-memory frame bytes by name (video streaming);
+            entries are removed once encoded
+        profiler: Optional RunProfiler timing the read, encode and build steps
+        chunk_number: Chunk the spans are recorded for
+        packed: Put every image into one user message behind a single
+            packed_prompt instruction instead of one message per image
+        prompt: Function returning the instruction for one image name
+
+    Returns:
+        Tuple of (messages, valid_images) where valid_images lists the files
+        that were successfully encoded, in message order
+    """
+    image_items = []
+    valid_images = []
+    if profiler is None:
+        profiler = RunProfiler()
+
+    for image_file in chunk:
+        if frame_data is not None and image_file in frame_data:
+            data = frame_data.pop(image_file)
+        else:
+            with profiler.span("read", chunk_number):
+                data = read_image_bytes(os.path.join(folder_path, image_file))
+            if data is None:
+                continue
+        with profiler.span("encode", chunk_number):
+            base64_image, mime_type = bytes_to_base64(data, image_file, preprocessor)
+        del data
+
+        if not base64_image:  # Only process if base64 conversion was successful
+            continue
+        with profiler.span("build", chunk_number):
+            valid_images.append(image_file)
+            image_items.append({
+                "type": "image_url",
+                "image_url": {
+                    "url": f"data:{mime_type};base64,{base64_image}"
+                },
+            })
+
+    with profiler.span("build", chunk_number):
+        messages = assemble_messages(image_items, valid_images, packed, prompt)
+    return messages, valid_images
+
+
+def parse_chunk_response(response, valid_images: list, chunk_number: int) -> list:
+    """Turns a chat completion response into analysis result entries
+
+    Args:
+        response: Response returned by client.chat.completions.create
+        valid_images: Image file names that were sent, in message order
+        chunk_number: 1-based number of the chunk
+
+    Returns:
+        List of analysis result dictionaries
+    """
+    results = []
+
+    if hasattr(response, 'completion_message') and response.completion_message:
+        content = response.completion_message.content
+
+        # Handle different response formats
+        if isinstance(content, list):
+            for j, message in enumerate(content):
+                if j < len(valid_images):
+                    result_text = message.text if hasattr(message, 'text') else str(message)
+                    print(f"   📝 {valid_images[j]}: {result_text[:100]}...")
+                    results.append({
+                        "image": valid_images[j],
+                        "analysis": result_text,
+                        "chunk": chunk_number,
+                        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
+                    })
+        elif isinstance(content, str):
+            print(f"   📝 Batch analysis: {content[:100]}...")
+            results.append({
+                "images": valid_images,
+                "analysis": content,
+                "chunk": chunk_number,
+                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
+            })
+        elif hasattr(content, 'text'):
+            result_text = content.text
+            print(f"   📝 Batch analysis: {result_text[:100]}...")
+            results.append({
+                "images": valid_images,
+                "analysis": result_text,
+                "chunk": chunk_number,
+                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
+            })
+        else:
+            print(f"   ⚠️ Unexpected response format: {type(content)}")
+            results.append({
+                "images": valid_images,
+                "analysis": str(content),
+                "chunk": chunk_number,
+                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
+            })
+    else:
+        print("   ⚠️ No completion message in response")
+
+    return results
+
+
+def parse_json_array(text: str) -> list:
+    """Extracts the first JSON array of objects from a model answer, tolerating code fences and surrounding prose
+
+    Raises:
+        ValueError: If the text holds no parseable JSON array
+    """
+    decoder = json.JSONDecoder()
+    start = text.find("[")
+    while start >= 0:
+        # Decode from each bracket in turn, so brackets in the prose around the array don't matter
+        try:
+            items, _ = decoder.raw_decode(text, start)
+        except ValueError:
+            items = None
+        if isinstance(items, list) and items and all(isinstance(item, dict) for item in items):
+            return items
+        start = text.find("[", start + 1)
+    raise ValueError("no JSON array of objects in the response")
+
+
+def parse_packed_response(response, valid_images: list, chunk_number: int) -> list:
+    """Turns the JSON array answer to a packed request into one result entry per frame
+
+    Entries are matched to the frames by file name. Frames the answer leaves
+    out get an error entry, so --resume submits their chunk again. If the
+    answer is not a JSON array at all it is kept as one batch entry, like
+    parse_chunk_response does.
+
+    Args:
+        response: Response returned by client.chat.completions.create
+        valid_images: Image file names that were sent, in message order
+        chunk_number: 1-based number of the chunk
+
+    Returns:
+        List of analysis result dictionaries
+    """
+    text = extract_response_text(response)
+    timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
+    try:
+        items = parse_json_array(text)
+    except ValueError as e:
+        print(f"   ⚠️ Could not parse the per-frame answer of chunk {chunk_number} ({e}), keeping it as one entry")
+        return [{"images": valid_images, "analysis": text, "chunk": chunk_number, "timestamp": timestamp}]
+
+    by_name = {image_file: image_file for image_file in valid_images}
+    by_name.update({os.path.basename(image_file): image_file for image_file in valid_images})
+    analyses = {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        if "image" in item:
+            pairs = [(item.get("image"), item.get("analysis"))]
+        else:
+            pairs = item.items()  # {"0001.jpg": "..."} style answers
+        for name, analysis in pairs:
+            image_file = by_name.get(str(name).strip())
+            if image_file is not None and analysis and image_file not in analyses:
+                analyses[image_file] = analysis if isinstance(analysis, str) else json.dumps(analysis)
+
+    results = []
+    for image_file in valid_images:
+        if image_file in analyses:
+            print(f"   📝 {image_file}: {analyses[image_file][:100]}...")
+            results.append({
+                "image": image_file,
+                "analysis": analyses[image_file],
+                "chunk": chunk_number,
+                "timestamp": timestamp
+            })
+        else:
+            print(f"   ⚠️ {image_file}: missing from the answer")
+            results.append({
+                "image": image_file,
+                "error": "missing from the packed response",
+                "chunk": chunk_number,
+                "timestamp": timestamp
+            })
+    return results
+
+
+def analysis_cache_key(image_hashes: list, image_files: list, preprocessor: FramePreprocessor = None,
+                       model: str = ANALYSIS_MODEL, packed: bool = False, prompt=frame_prompt) -> str:
+    """Cache key for analyzing the given images together in one request"""
+    params = {"max_completion_tokens": ANALYSIS_MAX_TOKENS, "temperature": ANALYSIS_TEMPERATURE}
+    if preprocessor is not None:
+        params["preprocess"] = preprocessor.cache_params()
+    if packed:
+        params["packed"] = True
+    return FrameAnalysisCache.make_key(
+        image_hashes,
+        model,
+        [prompt(image_file) for image_file in image_files],
+        params,
+    )
+
+
+def lookup_cached_frames(context: AnalysisContext, folder_path: str, chunk: list, chunk_number: int) -> tuple:
+    """Looks up a chunk's frames in the analysis cache
+
+    Args:
+        context: AnalysisContext holding the cache to consult
+        folder_path: Path to folder containing images
+        chunk: Image file names in this chunk
+        chunk_number: 1-based number of the chunk
+
+    Hits and misses are counted per frame: a frame found by the per-frame or
+    the batch lookup is one hit, a frame that still needs the API one miss.
+
+    Returns:
+        Tuple of (cached_results, pending, hashes) where pending lists the
+        files that still need the API and hashes maps file name to content hash
+    """
+    cache = context.cache
+    hashes = {}
+    for image_file in chunk:
+        if context.frame_data is not None and image_file in context.frame_data:
+            hashes[image_file] = hashlib.sha256(context.frame_data[image_file]).hexdigest()
+        else:
+            hashes[image_file] = file_sha256(os.path.join(folder_path, image_file))
+    cached_results = []
+    pending = []
+    bytes_saved = 0
+
+    for image_file in chunk:
+        key = analysis_cache_key([hashes[image_file]], [image_file], context.preprocessor, context.analysis_model,
+                                 context.packed, context.prompt)
+        entry = cache.get(key, count=False) if hashes[image_file] else None
+        if entry:
+            bytes_saved += entry.get("payload_bytes", 0)
+            cached_results.append({
+                "image": image_file,
+                "analysis": entry["analysis"],
+                "chunk": chunk_number,
+                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "cached": True,
+            })
+        else:
+            pending.append(image_file)
+
+    # Frames that were analyzed together last time are cached as one batch entry
+    if len(pending) > 1 and all(hashes[f] for f in pending):
+        entry = cache.get(analysis_cache_key([hashes[f] for f in pending], pending, context.preprocessor,
+                                             context.analysis_model, context.packed, context.prompt), count=False)
+        if entry:
+            bytes_saved += entry.get("payload_bytes", 0)
+            cached_results.append({
+                "images": pending,
+                "analysis": entry["analysis"],
+                "chunk": chunk_number,
+                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "cached": True,
+            })
+            pending = []
+
+    cache.record(hits=len(chunk) - len(pending), misses=len(pending), bytes_saved=bytes_saved)
+    return cached_results, pending, hashes
+
+
+def store_cached_results(context: AnalysisContext, results: list, hashes: dict, payload_bytes: dict) -> None:
+    """Stores fresh analysis results in the cache, per frame where possible"""
+    for result in results:
+        if "error" in result:
+            continue
+        images = [result["image"]] if "image" in result else result["images"]
+        if not all(hashes.get(f) for f in images):
+            continue
+        key = analysis_cache_key([hashes[f] for f in images], images, context.preprocessor, context.analysis_model,
+                                 context.packed, context.prompt)
+        context.cache.put(key, {
+            "images": images,
+            "analysis": result["analysis"],
+            "model": context.analysis_model,
+            "payload_bytes": sum(payload_bytes.get(f, 0) for f in images),
+        })
+
+
+def frame_order(chunk: list):
+    """Sort key that orders result entries by their first frame in the chunk"""
+    positions = {image_file: i for i, image_file in enumerate(chunk)}
+
+    def key(result: dict) -> int:
+        images = [result["image"]] if "image" in result else result.get("images", [])
+        return min((positions.get(f, len(chunk)) for f in images), default=len(chunk))
+
+    return key
+
+
+def prepare_chunk(context: AnalysisContext, folder_path: str, chunk: list, chunk_number: int) -> tuple:
+    """Does everything for one chunk that comes before the API call
+
+    Looks the frames up in the cache, then reads and base64 encodes the
+    ones that still need the API. Safe to run in a worker thread ahead of time.
+
+    Returns:
+        Tuple of (cached_results, pending, hashes, messages, valid_images)
+    """
+    profiler = context.profiler
+    cached_results, pending, hashes = [], chunk, {}
+    if context.cache is not None:
+        with profiler.span("cache_lookup", chunk_number):
+            cached_results, pending, hashes = lookup_cached_frames(context, folder_path, chunk, chunk_number)
+        if cached_results:
+            print(f"   🗄️ Chunk {chunk_number}: {len(chunk) - len(pending)} of {len(chunk)} frames served from cache")
+        if not pending:
+            context.release_frames(chunk)
+            return cached_results, pending, hashes, [], []
+
+    messages, valid_images = build_chunk_messages(folder_path, pending, context.preprocessor, context.frame_data,
+                                                  profiler, chunk_number, context.packed, context.prompt)
+    context.release_frames(chunk)
+    return cached_results, pending, hashes, messages, valid_images
+
+
+def estimate_analysis_request(context: AnalysisContext, image_items: list, images: list) -> tuple:
+    """Builds the messages for encoded frames and estimates them
+
+    Returns:
+        Tuple of (messages, estimated prompt tokens, prompt plus completion tokens)
+    """
+    messages = assemble_messages(image_items, images, context.packed, context.prompt)
+    estimated_prompt = estimate_prompt_tokens(messages)
+    return messages, estimated_prompt, estimated_prompt + ANALYSIS_MAX_TOKENS
+
+
+def send_analysis_request(context: AnalysisContext, image_items: list, images: list, chunk_number: int,
+                          defer: bool = True) -> list:
+    """Sends already encoded frames as one analysis request and returns their result entries
+
+    Transient errors are retried with backoff (call_with_retries). A payload
+    that is estimated over the context's token budget, rejected as too large,
+    or timing out splits the frames in half and sends each half on its own,
+    down to single frames. Frames that still fail get an
+    error entry; with `defer` their encoded images are kept on the context so
+    retry_failed_frames can send them again once the rest of the run is done.
+
+    Args:
+        context: AnalysisContext with the client, rate limiter and settings
+        image_items: "image_url" content items, one per frame
+        images: Frame names, in the same order
+        chunk_number: 1-based number of the chunk the frames belong to
+        defer: Keep failed frames for the end-of-run retry
+
     Returns:
-        Base64 encoded string of the image
+        List of analysis result dictionaries
     """
+    profiler = context.profiler
+    messages, estimated_prompt, tokens = estimate_analysis_request(context, image_items, images)
+    if len(images) > 1 and not context.budget.fits(tokens):
+        messages.clear()
+        half = len(images) // 2
+        print(f"   ✂️ Chunk {chunk_number}: ~{tokens:,} tokens is over the {context.budget.max_tokens:,} token "
+              f"budget, splitting {len(images)} frames into {half} + {len(images) - half}")
+        return (send_analysis_request(context, image_items[:half], images[:half], chunk_number, defer)
+                + send_analysis_request(context, image_items[half:], images[half:], chunk_number, defer))
+    request_bytes = estimate_request_bytes(messages)
+
+    def request():
+        with profiler.span("rate_limit", chunk_number):
+            wait_for_rate_limit(context.rate_limiter, messages, ANALYSIS_MAX_TOKENS, tokens)
+        observe = context.concurrency.observe() if context.concurrency is not None else nullcontext()
+        with profiler.span("api", chunk_number), observe:
+            return context.client.chat.completions.create(
+                model=context.analysis_model,
+                messages=messages,
+                max_completion_tokens=ANALYSIS_MAX_TOKENS,
+                temperature=ANALYSIS_TEMPERATURE,
+            )
+
     try:
-        with open(image_path, "rb") as img:
-            return base64.b64encode(img.read()).decode('utf-8')
+        # Timeouts of multi-frame requests are handled by splitting, not by resending the same payload
+        response = call_with_retries(request, f"Chunk {chunk_number}", context.max_retries,
+                                     retry_timeouts=len(images) == 1)
+        messages.clear()
+        context.budget.record("analysis", estimated_prompt, response, chunk=chunk_number,
+                              images=len(images), bytes=request_bytes)
+        with profiler.span("parse", chunk_number):
+            if context.packed:
+                results = parse_packed_response(response, images, chunk_number)
+            else:
+                results = parse_chunk_response(response, images, chunk_number)
     except Exception as e:
-        print(f"❌ Error converting {image_path} to base64: {e}")
-        return ""
+        messages.clear()
+        if len(images) > 1 and (is_payload_error(e) or is_timeout_error(e)):
+            half = len(images) // 2
+            print(f"   ✂️ Chunk {chunk_number}: {describe_error(e)}, splitting {len(images)} frames "
+                  f"into {half} + {len(images) - half}")
+            return (send_analysis_request(context, image_items[:half], images[:half], chunk_number, defer)
+                    + send_analysis_request(context, image_items[half:], images[half:], chunk_number, defer))
+        print(f"   ❌ Error processing chunk {chunk_number}: {e}")
+        results = [{
+            "images": images,
+            "error": str(e),
+            "chunk": chunk_number,
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
+        }]
 
+    if defer:
+        context.defer_failed(results, images, image_items)
+    return results
+
+
+def process_chunk(context: AnalysisContext, folder_path: str, chunk: list, chunk_number: int,
+                  prepared=None) -> tuple:
+    """Sends one chunk of images to the Llama API and collects the results
 
-def process_folder(folder_path: str, chunk_size: int = 5, skip_frames: int = 100) -> None:
-    """Processes an entire folder of images using Llama API
-    
     Args:
+        context: AnalysisContext with the client, rate limiter, cache and preprocessor
         folder_path: Path to folder containing images
-        chunk_size: Number of images to process in each API call
-        skip_frames: Skip every N frames (for video frame analysis)
+        chunk: Image file names in this chunk
+        chunk_number: 1-based number of the chunk
+        prepared: Optional Future (from prefetch_chunks) resolving to the
+            prepare_chunk result; the chunk is prepared inline if omitted
+
+    Returns:
+        Tuple of (results, processed) where processed is the number of images
+        that were analyzed successfully
     """
-    
-    # Validate folder path
-    if not os.path.exists(folder_path):
-        print(f"❌ Folder path does not exist: {folder_path}")
+    profiler = context.profiler
+    if prepared is None:
+        prepared = prepare_chunk(context, folder_path, chunk, chunk_number)
+    else:
+        with profiler.span("prefetch_wait", chunk_number):
+            prepared = prepared.result()
+    cached_results, pending, hashes, messages, valid_images = prepared
+    prepared = None
+
+    cached_count = len(chunk) - len(pending)
+    if not pending:
+        return cached_results, len(chunk)
+
+    if not valid_images:
+        print(f"   ⚠️ No valid images in chunk {chunk_number}, skipping...")
+        return cached_results, cached_count
+
+    image_items = [item for message in messages for item in message["content"] if item["type"] == "image_url"]
+    # From here on the payloads live in image_items only (the prefetch future also references messages)
+    messages.clear()
+    payload_bytes = {
+        image_file: len(item["image_url"]["url"])
+        for image_file, item in zip(valid_images, image_items)
+    }
+
+    results = send_analysis_request(context, image_items, valid_images, chunk_number, context.max_retries > 0)
+    image_items.clear()
+
+    if context.cache is not None:
+        with profiler.span("cache_store", chunk_number):
+            store_cached_results(context, results, hashes, payload_bytes)
+
+    if any(image_file in context.retry_items for result in results if "error" in result
+           for image_file in result_images(result)):
+        with context.lock:
+            context.failed_chunks[chunk_number] = (chunk, hashes)
+
+    analyzed = sum(len(result_images(result)) for result in results if "error" not in result)
+    results = sorted(cached_results + results, key=frame_order(chunk))
+    return results, cached_count + analyzed
+
+
+def retry_failed_frames(context: AnalysisContext, finished: set, concurrency: int = 1) -> None:
+    """Sends the frames that failed during the run once more, after every other chunk is done
+
+    Retrying at the end keeps failing frames from holding up the queue. Each
+    affected chunk's results in the store are replaced by its earlier
+    results merged with the retried ones, so the critique and --resume see the merge.
+
+    Args:
+        context: AnalysisContext holding the deferred frames and the store
+        finished: Numbers of the chunks stored in this run, updated in place
+        concurrency: Number of retry requests in flight at once
+    """
+    failed = sorted(context.failed_chunks.items())
+    context.failed_chunks = {}
+    print(f"\n🔁 Retrying {len(context.retry_items)} failed frames from {len(failed)} chunks...")
+    previous = [context.store.chunk_results(chunk_number) for chunk_number, _ in failed]
+    jobs = [(chunk_number, chunk, hashes, results) for (chunk_number, (chunk, hashes)), results in zip(failed, previous)]
+
+    def retry(job: tuple) -> tuple:
+        chunk_number, chunk, hashes, results = job
+        images = [image_file for result in results if "error" in result
+                  for image_file in result_images(result) if image_file in context.retry_items]
+        with context.lock:
+            image_items = [context.retry_items.pop(image_file) for image_file in images]
+        payload_bytes = {image_file: len(item["image_url"]["url"]) for image_file, item in zip(images, image_items)}
+        retried = send_analysis_request(context, image_items, images, chunk_number, defer=False)
+        if context.cache is not None:
+            store_cached_results(context, retried, hashes, payload_bytes)
+        # Frames of error entries without a kept payload (nothing to resend) keep their error
+        kept = []
+        for result in results:
+            remaining = [image_file for image_file in result_images(result) if image_file not in images]
+            if "error" not in result or len(remaining) == len(result_images(result)):
+                kept.append(result)
+            elif remaining:
+                kept.append({**result, "images": remaining})
+        return chunk_number, chunk, sorted(kept + retried, key=frame_order(chunk)), len(images), retried
+
+    recovered = attempted = 0
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="retry") as executor:
+        for chunk_number, chunk, merged, count, retried in executor.map(retry, jobs):
+            with context.profiler.span("checkpoint", chunk_number):
+                context.store.add_chunk(chunk_number, chunk, merged)
+            finished.add(chunk_number)
+            attempted += count
+            recovered += sum(len(result_images(result)) for result in retried if "error" not in result)
+    print(f"🔁 Recovered {recovered} of {attempted} failed frames")
+
+
+def prefetch_chunks(context: AnalysisContext, folder_path: str, chunks, depth: int = DEFAULT_PREFETCH):
+    """Prepares upcoming chunks in a thread pool while earlier ones are in flight
+
+    Keeps up to `depth` chunks submitted to prepare_chunk beyond the ones
+    already handed out, so file reads and base64 encoding overlap with API
+    round trips and only the first chunk waits for its encoding. At most
+    `depth` prepared chunks are held in memory on top of those in flight.
+
+    Args:
+        context: AnalysisContext shared by all workers
+        folder_path: Path to folder containing images
+        chunks: Iterable of (chunk_number, image file names) pairs
+        depth: Number of chunks to prepare ahead; 0 prepares each chunk inline
+
+    Yields:
+        Tuples of (chunk_number, chunk, prepared) where prepared is a Future
+        for process_chunk, or None when prefetching is off
+    """
+    if depth <= 0:
+        for chunk_number, chunk in chunks:
+            yield chunk_number, chunk, None
         return
-    
-    # Initialize the Llama API client
+
+    executor = ThreadPoolExecutor(max_workers=max(1, min(depth, os.cpu_count() or 1)),
+                                  thread_name_prefix="prefetch")
+    queue = deque()
+    source = iter(chunks)
+    try:
+        while True:
+            while len(queue) <= depth:
+                item = next(source, None)
+                if item is None:
+                    break
+                chunk_number, chunk = item
+                queue.append((chunk_number, chunk, executor.submit(
+                    prepare_chunk, context, folder_path, chunk, chunk_number
+                )))
+            if not queue:
+                break
+            yield queue.popleft()
+    except BaseException:
+        # Interrupted or closed early: drop the chunks nobody will send
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    # Chunks handed out last may still be encoding; let them finish
+    executor.shutdown(wait=False)
+
+
+def process_alive(pid: int) -> bool:
+    """Whether a process with this id is running (on Windows, where it can't be probed, assume not)"""
+    if os.name == "nt":
+        return False
+    try:
+        os.kill(pid, 0)
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+
+class ResultStore:
+    """SQLite store of the runs in an output directory and their results
+
+    Tables hold the runs, their chunks and frames, one row per analysis
+    result entry, the errors and the critiques. "Every errored frame of run
+    N" is then one indexed query instead of a pass over the results file.
+    The database runs in WAL mode, so the critique stage or a sqlite3 shell
+    can read while chunks are written. Runs record their process id; a run
+    is refused while another live process has one going in the same store,
+    so two runs never write the same output directory at once. It is also the run's checkpoint: each
+    finished chunk is committed as it comes in (a WAL commit with
+    synchronous=NORMAL is cheap and survives the process dying), so a crash
+    or Ctrl-C loses at most the chunks in flight. --resume continues the
+    source's latest run id and skips its chunks that finished without errors.
+
+    Args:
+        db_file: Path of the SQLite database
+        batch_chunks: Finished chunks per transaction; above 1 fewer commits,
+            but up to that many chunks are lost if the process dies
+    """
+
+    def __init__(self, db_file: str = DEFAULT_CHECKPOINT_FILE, batch_chunks: int = STORE_BATCH_CHUNKS):
+        self.db_file = db_file
+        self.batch_chunks = max(1, batch_chunks)
+        self.lock = threading.RLock()
+        self.pending = []  # Rows of finished chunks waiting for the next transaction
+        self.run_id = None
+        self.db = sqlite3.connect(db_file, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(RESULT_STORE_SCHEMA)
+
+    @contextmanager
+    def transaction(self, immediate: bool = False):
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+            try:
+                yield self.db
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+            self.db.execute("COMMIT")
+
+    def start_run(self, source: str, analysis_model: str = ANALYSIS_MODEL, critique_model: str = CRITIQUE_MODEL,
+                  resume: bool = False) -> int:
+        """Starts a run of `source`, or with resume continues its latest one, and returns the run id
+
+        Raises:
+            RuntimeError: Another live process has a run going in this store
+        """
+        source = os.path.abspath(source)
+        with self.transaction(immediate=True) as db:
+            live = self.live_runs()
+            if live:
+                run_id, live_source, pid = live[0]
+                raise RuntimeError(f"run {run_id} of {live_source} (pid {pid}) is still writing to "
+                                   f"{os.path.dirname(os.path.abspath(self.db_file))}")
+            row = None
+            if resume:
+                row = db.execute("SELECT id FROM runs WHERE source = ? ORDER BY id DESC LIMIT 1", (source,)).fetchone()
+            if row is not None:
+                self.run_id = row[0]
+                db.execute("UPDATE runs SET status = 'running', finished = NULL, pid = ? WHERE id = ?",
+                           (os.getpid(), self.run_id))
+            else:
+                self.run_id = db.execute(
+                    "INSERT INTO runs (source, analysis_model, critique_model, status, started, pid) "
+                    "VALUES (?, ?, ?, 'running', ?, ?)",
+                    (source, analysis_model, critique_model, time.time(), os.getpid())
+                ).lastrowid
+        return self.run_id
+
+    def live_runs(self) -> list:
+        """Returns (run id, source, pid) of the running runs whose process (other than this one) is alive"""
+        rows = self.db.execute("SELECT id, source, pid FROM runs WHERE status = 'running' AND pid IS NOT NULL")
+        return [row for row in rows if row[2] != os.getpid() and process_alive(row[2])]
+
+    def add_chunk(self, chunk_number: int, chunk: list, results: list) -> None:
+        """Queues a finished chunk (replacing any earlier results of it) for the next transaction"""
+        analyses = []
+        errors = []
+        for seq, result in enumerate(results):
+            analyses.append((self.run_id, chunk_number, seq, result.get("image"),
+                             json.dumps(result, ensure_ascii=False)))
+            if "error" in result:
+                errors.extend((self.run_id, chunk_number, image_file, str(result["error"]))
+                              for image_file in result_images(result))
+        frames = [(self.run_id, image_file, chunk_number) for image_file in chunk]
+        with self.lock:
+            self.pending.append((chunk_number, json.dumps(list(chunk), ensure_ascii=False), frames, analyses, errors))
+            if len(self.pending) >= self.batch_chunks:
+                self.flush()
+
+    def flush(self) -> None:
+        """Writes the queued chunks in one transaction"""
+        with self.lock:
+            batch, self.pending = self.pending, []
+            if not batch:
+                return
+            with self.transaction() as db:
+                for chunk_number, images, frames, analyses, errors in batch:
+                    key = (self.run_id, chunk_number)
+                    db.execute("DELETE FROM analyses WHERE run_id = ? AND chunk = ?", key)
+                    db.execute("DELETE FROM errors WHERE run_id = ? AND chunk = ?", key)
+                    db.execute("INSERT OR REPLACE INTO chunks VALUES (?, ?, ?, ?)", key + (images, time.time()))
+                    db.executemany("INSERT OR REPLACE INTO frames (run_id, image, chunk) VALUES (?, ?, ?)", frames)
+                    db.executemany("INSERT INTO analyses VALUES (?, ?, ?, ?, ?)", analyses)
+                    db.executemany("INSERT INTO errors VALUES (?, ?, ?, ?)", errors)
+
+    def completed_chunks(self) -> dict:
+        """Returns {tuple(images): chunk number} of the current run's chunks that finished without errors"""
+        self.flush()
+        rows = self.db.execute(
+            "SELECT chunk, images FROM chunks WHERE run_id = ? AND NOT EXISTS "
+            "(SELECT 1 FROM errors WHERE errors.run_id = chunks.run_id AND errors.chunk = chunks.chunk)",
+            (self.run_id,))
+        return {tuple(json.loads(images)): chunk_number for chunk_number, images in rows}
+
+    def chunk_results(self, chunk_number: int) -> list:
+        """Returns the stored result entries of one chunk of the current run"""
+        self.flush()
+        rows = self.db.execute("SELECT result FROM analyses WHERE run_id = ? AND chunk = ? ORDER BY seq",
+                               (self.run_id, chunk_number))
+        return [json.loads(row[0]) for row in rows]
+
+    def chunk_images(self) -> dict:
+        """Returns {chunk number: tuple(images)} of the chunks stored for the current run"""
+        self.flush()
+        rows = self.db.execute("SELECT chunk, images FROM chunks WHERE run_id = ?", (self.run_id,))
+        return {chunk_number: tuple(json.loads(images)) for chunk_number, images in rows}
+
+    def prune_chunks(self, chunk_numbers) -> int:
+        """Drops chunks of the current run that are not in `chunk_numbers` (left over from other chunking)"""
+        stale = [(self.run_id, n) for n in set(self.chunk_images()) - set(chunk_numbers)]
+        if stale:
+            with self.transaction() as db:
+                for table in ("chunks", "frames", "analyses", "errors"):
+                    db.executemany(f"DELETE FROM {table} WHERE run_id = ? AND chunk = ?", stale)
+        return len(stale)
+
+    def set_frame_runs(self, frame_runs: dict) -> None:
+        """Records the collapsed frame runs (dedupe/keyframes) of the current run's frames"""
+        self.flush()
+        with self.transaction() as db:
+            db.executemany("UPDATE frames SET run = ? WHERE run_id = ? AND image = ?",
+                           ((json.dumps(run), self.run_id, image_file) for image_file, run in frame_runs.items()))
+
+    def iter_results(self, run_id: int = None, batch_size: int = 500):
+        """Yields the result entries of a run (the current one by default) in frame order, with their frame runs"""
+        run_id = self.run_id if run_id is None else run_id
+        self.flush()
+        runs = {image_file: json.loads(run) for image_file, run in self.db.execute(
+            "SELECT image, run FROM frames WHERE run_id = ? AND run IS NOT NULL", (run_id,))}
+        cursor = self.db.execute("SELECT result FROM analyses WHERE run_id = ? ORDER BY chunk, seq", (run_id,))
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            results = [json.loads(row[0]) for row in rows]
+            if runs:
+                annotate_runs(results, runs)
+            yield from results
+
+    def errored_frames(self, run_id: int = None) -> list:
+        """Returns (image, error) pairs of the frames whose latest result in a run is an error"""
+        run_id = self.run_id if run_id is None else run_id
+        self.flush()
+        return self.db.execute("SELECT image, error FROM errors WHERE run_id = ? ORDER BY chunk, image",
+                               (run_id,)).fetchall()
+
+    def add_critique(self, model: str, content: str, output_file: str = None) -> None:
+        with self.transaction() as db:
+            db.execute("INSERT INTO critiques (run_id, model, created, output_file, content) VALUES (?, ?, ?, ?, ?)",
+                       (self.run_id, model, time.time(), output_file, content))
+
+    def end_run(self, status: str = "finished") -> None:
+        """Writes the queued chunks and marks the current run as ended"""
+        self.flush()
+        with self.transaction() as db:
+            db.execute("UPDATE runs SET status = ?, finished = ? WHERE id = ?", (status, time.time(), self.run_id))
+
+    def close(self, status: str = None) -> None:
+        """Closes the database, ending the current run with `status` first if given"""
+        if status is not None and self.run_id is not None:
+            self.end_run(status)
+        self.flush()
+        self.db.close()
+
+
+def print_progress(processed_count: int, total: int = None) -> None:
+    """Prints a progress bar for the processed images (a plain count when the total is unknown)"""
+    if not total:
+        print(f"   📊 Progress: {processed_count} frames analyzed")
+        return
+    progress = processed_count / total
+    bar_length = 20
+    filled_length = int(bar_length * progress)
+    bar = '█' * filled_length + '░' * (bar_length - filled_length)
+    print(f"   📊 Progress: [{bar}] {int(progress*100)}% ({processed_count}/{total})")
+
+
+async def process_chunks_async(context: AnalysisContext, folder_path: str, chunks, concurrency: int,
+                               total_images: int = None) -> set:
+    """Processes chunks concurrently, keeping up to `concurrency` requests in flight
+
+    The Llama API client is synchronous, so each chunk runs in a worker thread.
+    Chunks are pulled from `chunks` only when a slot frees up, so a streaming
+    source (e.g. frames piped from ffmpeg) is never read far ahead of the API.
+    Results are written to the context's ResultStore as requests complete and
+    only their chunk numbers are kept.
+
+    Args:
+        context: AnalysisContext shared by all workers
+        folder_path: Path to folder containing images
+        chunks: List or iterator of (chunk_number, image file names) pairs, or
+            (chunk_number, image file names, prepared) triples from prefetch_chunks
+        concurrency: Maximum number of chunk requests in flight at once; when
+            context.concurrency is set its current limit is used instead
+        total_images: Number of images for the progress bar, if known
+
+    Returns:
+        Set of the numbers of the chunks that were stored
+    """
+    import asyncio
+
+    # One worker thread per request in flight plus one for the chunk source; the
+    # default executor (cpu count + 4 threads) would silently cap the concurrency
+    max_in_flight = context.concurrency.maximum if context.concurrency is not None else concurrency
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=max_in_flight + 1, thread_name_prefix="chunk")
+    )
+    chunk_iter = iter(chunks)
+    in_flight = set()
+    exhausted = False
+    finished = set()
+    processed_count = 0
+
+    async def run_chunk(chunk_number: int, chunk: list, prepared=None) -> tuple:
+        print(f"\n🔄 Sending chunk {chunk_number}: {', '.join(chunk)}")
+        results, processed = await asyncio.to_thread(
+            process_chunk, context, folder_path, chunk, chunk_number, prepared
+        )
+        return chunk_number, chunk, results, processed
+
+    while True:
+        # Top up the in-flight requests from the (possibly blocking) chunk source
+        limit = context.concurrency.limit if context.concurrency is not None else concurrency
+        while not exhausted and len(in_flight) < limit:
+            item = await asyncio.to_thread(next, chunk_iter, None)
+            if item is None:
+                exhausted = True
+            else:
+                in_flight.add(asyncio.create_task(run_chunk(*item)))
+        if not in_flight:
+            break
+
+        done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            chunk_number, chunk, results, processed = task.result()
+            with context.profiler.span("checkpoint", chunk_number):
+                context.store.add_chunk(chunk_number, chunk, results)
+            finished.add(chunk_number)
+            processed_count += processed
+            print(f"   ✅ Chunk {chunk_number} finished ({len(finished)} chunks done)")
+            print_progress(processed_count, total_images)
+
+    return finished
+
+
+class ApiSession:
+    """The Llama API client shared by every stage, job and worker of the process
+
+    Wraps one pooled httpx client that keeps up to `pool_size` keep-alive
+    connections open, so requests reuse connections (and their TLS session)
+    instead of opening new ones. Requests, new connections and TLS handshakes
+    are counted through httpcore trace events to measure the reuse rate.
+
+    Use ApiSession.shared() (or create_client) rather than the constructor so
+    there is one pool per process.
+    """
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, pool_size: int, keepalive_expiry: float = KEEPALIVE_EXPIRY):
+        try:
+            import httpx
+            from llama_api_client import DefaultHttpxClient, LlamaAPIClient
+        except ImportError:
+            print("❌ llama-api-client not found. Please install it first:")
+            print("   pip install llama-api-client")
+            sys.exit(1)
+
+        self.pool_size = max(1, pool_size)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+        self.tls_handshakes = 0
+        self.http_client = DefaultHttpxClient(
+            limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size,
+                                keepalive_expiry=keepalive_expiry),
+            event_hooks={"request": [self._on_request]},
+        )
+        # Retries are done by call_with_retries, with jitter and chunk splitting
+        self.client = LlamaAPIClient(max_retries=0, http_client=self.http_client)
+
+    @classmethod
+    def shared(cls, pool_size: int = DEFAULT_POOL_SIZE) -> "ApiSession":
+        """Returns the process-wide session, creating it with `pool_size` on first use"""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls(pool_size)
+            return cls._shared
+
+    def _on_request(self, request) -> None:
+        request.extensions["trace"] = self._trace
+        with self.lock:
+            self.requests += 1
+
+    def _trace(self, event: str, info: dict) -> None:
+        if event == "connection.connect_tcp.complete":
+            with self.lock:
+                self.connections += 1
+        elif event == "connection.start_tls.complete":
+            with self.lock:
+                self.tls_handshakes += 1
+
+    def reuse_rate(self) -> float:
+        """Fraction of requests that went over an already open connection"""
+        with self.lock:
+            if not self.requests:
+                return 0.0
+            return max(0, self.requests - self.connections) / self.requests
+
+    def describe(self) -> str:
+        return (f"{self.requests} requests over {self.connections} connections ({self.reuse_rate():.0%} reused, "
+                f"{self.tls_handshakes} TLS handshakes, pool of {self.pool_size})")
+
+    def close(self) -> None:
+        self.http_client.close()
+
+
+def create_client(pool_size: int = DEFAULT_POOL_SIZE):
+    """Returns the shared Llama API client, returning None (with a message) on failure
+
+    The first call creates the process-wide ApiSession with room for
+    `pool_size` connections; later calls return the same client.
+    """
     try:
         api_key = os.environ.get("LLAMA_API_KEY")
         if not api_key:
             print("⚠️ No LLAMA_API_KEY found in environment variables.")
             print("🔧 Attempting to use client without explicit API key...")
         
-        client = LlamaAPIClient()
+        client = ApiSession.shared(pool_size).client
         print("✅ Llama API client initialized successfully")
+        return client
     except Exception as e:
         print(f"❌ Failed to initialize Llama API client: {e}")
-        return
+        return None
+
+
+def run_chunks(context: AnalysisContext, folder_path: str, chunks, concurrency: int,
+               resume: bool, total_images: int = None, prefetch: int = DEFAULT_PREFETCH,
+               max_concurrency: int = 0):
+    """Runs chunks through the API sequentially or concurrently, storing each finished chunk
+
+    Args:
+        context: AnalysisContext shared by all workers, with the ResultStore
+            (open_result_store) the chunks are committed to
+        folder_path: Path to folder containing images
+        chunks: List or iterator of (chunk_number, image file names) pairs
+        concurrency: Number of chunk requests to keep in flight at once
+        resume: Skip chunks the store's run already finished without errors
+        total_images: Number of images for the progress bar, if known
+        prefetch: Number of chunks to read and encode ahead of the ones in flight
+        max_concurrency: If above `concurrency`, the number of requests in
+            flight adapts between 1 and this (AdaptiveConcurrency), starting at
+            `concurrency`
+
+    Returns:
+        Set of the numbers of the chunks stored for this run, or None if the
+        run was interrupted
+    """
+    import asyncio
+
+    # Chunks that already finished in a previous attempt of the run are taken from the store
+    store = context.store
+    completed = store.completed_chunks() if resume else {}
+    if resume:
+        print(f"♻️ Resuming run {store.run_id} from {store.db_file}: {len(completed)} chunks already done")
+    else:
+        print(f"📝 Committing finished chunks to {store.db_file} (run {store.run_id})")
+
+    finished = set()
+
+    def pending_chunks():
+        for chunk_number, chunk in chunks:
+            stored_number = completed.get(tuple(chunk))
+            if stored_number is None:
+                yield chunk_number, chunk
+                continue
+            if stored_number != chunk_number:
+                # Same frames under another number (the chunking changed): store them under this one
+                store.add_chunk(chunk_number, chunk, store.chunk_results(stored_number))
+            finished.add(chunk_number)
+            context.release_frames(chunk)
+
+    pending_images = None
+    if total_images is not None:
+        pending_images = total_images - sum(len(chunk) for chunk in completed)
+
+    # Read and encode upcoming chunks in the background while requests are in flight
+    prepared_chunks = prefetch_chunks(context, folder_path, pending_chunks(), prefetch)
+    try:
+        if max_concurrency > concurrency:
+            context.concurrency = AdaptiveConcurrency(concurrency, max_concurrency, profiler=context.profiler)
+            print(f"⚡ Async mode: chunk requests in flight {context.concurrency.describe()}")
+        if context.concurrency is not None:
+            finished.update(asyncio.run(
+                process_chunks_async(context, folder_path, prepared_chunks, concurrency, pending_images)
+            ))
+            controller = context.concurrency
+            print(f"🎚️ Concurrency ended at {controller.limit} (ranged {controller.low}-{controller.high}, "
+                  f"{controller.changes} changes)")
+            concurrency = controller.limit
+        elif concurrency > 1:
+            # Keep several chunk requests in flight at once
+            print(f"⚡ Async mode: up to {concurrency} chunk requests in flight")
+            finished.update(asyncio.run(
+                process_chunks_async(context, folder_path, prepared_chunks, concurrency, pending_images)
+            ))
+        else:
+            processed_count = 0
+
+            # Process the filtered images in chunks
+            for chunk_number, chunk, prepared in prepared_chunks:
+                print(f"\n🔄 Processing chunk {chunk_number}...")
+                print(f"   Images: {', '.join(chunk)}")
+
+                results, processed = process_chunk(context, folder_path, chunk, chunk_number, prepared)
+                with context.profiler.span("checkpoint", chunk_number):
+                    store.add_chunk(chunk_number, chunk, results)
+                finished.add(chunk_number)
+                processed_count += processed
+
+                print_progress(processed_count, pending_images)
+
+        if context.retry_items:
+            retry_failed_frames(context, finished, concurrency)
+    except KeyboardInterrupt:
+        print(f"\n🛑 Interrupted. Finished chunks are saved in {store.db_file}; rerun with --resume to continue.")
+        return None
+    finally:
+        prepared_chunks.close()
+        store.flush()
+
+    return finished
+
+
+def write_results_json(results_file: str, analysis_results) -> int:
+    """Streams result entries into a JSON array file, one entry at a time
+
+    The output is laid out exactly like json.dump(..., indent=2), but the
+    entries never have to be in memory together.
+
+    Returns:
+        Number of entries written
+    """
+    count = 0
+    with open(results_file, 'w', encoding='utf-8') as f:
+        f.write("[")
+        for result in analysis_results:
+            f.write(",\n  " if count else "\n  ")
+            f.write(json.dumps(result, indent=2, ensure_ascii=False).replace("\n", "\n  "))
+            count += 1
+        f.write("\n]" if count else "]")
+    return count
+
+
+def iter_analysis_results(results_file: str, block_size: int = 1 << 16):
+    """Yields the entries of a JSON array file one by one without loading the whole file
+
+    Raises:
+        ValueError: If the file is not a JSON array
+    """
+    decoder = json.JSONDecoder()
+    with open(results_file, 'r', encoding='utf-8') as f:
+        buffer = f.read(block_size).lstrip()
+        if not buffer.startswith("["):
+            raise ValueError(f"{results_file} does not contain a JSON array")
+        buffer = buffer[1:]
+        eof = False
+        while True:
+            buffer = buffer.lstrip().lstrip(",").lstrip()
+            if buffer.startswith("]"):
+                return
+            try:
+                entry, end = decoder.raw_decode(buffer)
+            except ValueError:
+                if eof:
+                    raise
+                chunk = f.read(block_size)
+                eof = not chunk
+                buffer += chunk
+                continue
+            yield entry
+            buffer = buffer[end:]
+
+
+def format_duration(seconds: float) -> str:
+    """Short human readable duration like 2h 05m, 3m 20s or 12s"""
+    seconds = int(round(seconds))
+    if seconds >= 3600:
+        return f"{seconds // 3600}h {seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m {seconds % 60:02d}s"
+    return f"{seconds}s"
+
+
+def plan_run(context: AnalysisContext, folder_path: str, chunks, concurrency: int = 1,
+             prefetch: int = DEFAULT_PREFETCH, critique_window: int = 0,
+             request_seconds: float = PLAN_REQUEST_SECONDS) -> dict:
+    """Builds every analysis request of a run without sending it and prints the plan
+
+    The chunks go through the same cache lookup, reading, preprocessing,
+    encoding and prompt building as a real run. Chunks over the token
+    budget are split the same way. Only the API calls and the checkpoint
+    and results writes are skipped. The projected wall time is the slower
+    of two limits: the rate limiter's request and token quotas, and
+    `concurrency` requests in flight taking `request_seconds` each.
+
+    Args:
+        context: AnalysisContext with the rate limiter, budget and settings
+        folder_path: Path to folder containing images
+        chunks: List or iterator of (chunk_number, image file names) pairs
+        concurrency: Number of chunk requests a real run keeps in flight
+        prefetch: Number of chunks to prepare ahead in the background
+        critique_window: Map-reduce window of the critique (0 = single prompt)
+        request_seconds: Assumed round trip of one analysis request
+
+    Returns:
+        The plan as a dictionary (also written to PLAN_FILE)
+    """
+    budget = context.budget
+    plan = {"images": 0, "cached_images": 0, "requests": 0, "upload_bytes": 0,
+            "prompt_tokens": 0, "completion_tokens": 0, "largest_request_tokens": 0}
+
+    def add_requests(image_items: list, images: list) -> None:
+        messages, estimated_prompt, tokens = estimate_analysis_request(context, image_items, images)
+        if len(images) > 1 and not budget.fits(tokens):
+            half = len(images) // 2
+            add_requests(image_items[:half], images[:half])
+            add_requests(image_items[half:], images[half:])
+            return
+        plan["requests"] += 1
+        plan["upload_bytes"] += estimate_request_bytes(messages)
+        plan["prompt_tokens"] += estimated_prompt
+        plan["completion_tokens"] += ANALYSIS_MAX_TOKENS
+        plan["largest_request_tokens"] = max(plan["largest_request_tokens"], tokens)
+
+    print("🧪 Dry run: building every request without calling the API...")
+    for chunk_number, chunk, prepared in prefetch_chunks(context, folder_path, chunks, prefetch):
+        if prepared is None:
+            prepared = prepare_chunk(context, folder_path, chunk, chunk_number)
+        else:
+            prepared = prepared.result()
+        cached_results, pending, hashes, messages, valid_images = prepared
+        plan["images"] += len(chunk)
+        plan["cached_images"] += len(chunk) - len(pending)
+        image_items = [item for message in messages for item in message["content"] if item["type"] == "image_url"]
+        messages.clear()
+        if valid_images:
+            add_requests(image_items, valid_images)
+
+    # One result entry per request, or per image when packed; the critique reads them all
+    entries = plan["images"] - plan["cached_images"] if context.packed else plan["requests"]
+    summaries = -(-entries // critique_window) if critique_window else 0
+    plan["critique_requests"] = 1 + summaries
+    api_requests = plan["requests"] + plan["critique_requests"]
+    request_tokens = plan["prompt_tokens"] + plan["completion_tokens"]
+
+    limiter = context.rate_limiter
+    rate_seconds = 0.0
+    if limiter is not None and limiter.request_bucket:
+        rate_seconds = max(0, api_requests - limiter.request_bucket.capacity) * 60 / limiter.requests_per_minute
+    if limiter is not None and limiter.token_bucket:
+        rate_seconds = max(rate_seconds, request_tokens * 60 / limiter.tokens_per_minute)
+    flight_seconds = -(-plan["requests"] // max(1, concurrency)) * request_seconds
+    plan["projected_seconds"] = max(rate_seconds, flight_seconds) + plan["critique_requests"] * request_seconds
+    plan["bound_by"] = "rate limit" if rate_seconds > flight_seconds else "concurrency"
+
+    analyzed = plan["images"] - plan["cached_images"]
+    print("\n📋 Dry run plan (no API calls made)")
+    print(f"   Images: {plan['images']:,} selected, {plan['cached_images']:,} from cache, {analyzed:,} to analyze")
+    if plan["requests"]:
+        print(f"   Analysis requests: {plan['requests']:,} ({analyzed / plan['requests']:.1f} images each, "
+              f"largest ~{plan['largest_request_tokens']:,} tokens of a {budget.max_tokens:,} budget)"
+              if budget.max_tokens > 0 else
+              f"   Analysis requests: {plan['requests']:,} ({analyzed / plan['requests']:.1f} images each)")
+        print(f"   Upload: {plan['upload_bytes'] / 1024 / 1024:,.1f} MB "
+              f"({plan['upload_bytes'] / plan['requests'] / 1024:,.0f} KB per request)")
+        print(f"   Tokens: ~{plan['prompt_tokens']:,} prompt + up to {plan['completion_tokens']:,} completion "
+              f"(~{plan['prompt_tokens'] / max(1, analyzed):,.0f} prompt tokens per image)")
+    print(f"   Critique: {plan['critique_requests']} request{'s' if plan['critique_requests'] > 1 else ''}"
+          + (f" ({summaries} window summaries + the critique)" if summaries else
+             " (more if the analyses are long enough for map-reduce)"))
+    print(f"   Duration: ~{format_duration(plan['projected_seconds'])}, bound by the {plan['bound_by']} "
+          f"({limiter.describe() if limiter is not None else 'no rate limit'}; {concurrency} in flight "
+          f"at ~{request_seconds:g}s per request)")
+
+    plan_file = os.path.join(context.output_dir, PLAN_FILE)
+    try:
+        with open(plan_file, "w", encoding="utf-8") as f:
+            json.dump(plan, f, indent=2)
+        print(f"💾 Plan saved to {plan_file}")
+    except OSError as e:
+        print(f"⚠️ Could not save the plan to {plan_file}: {e}")
+    return plan
+
+
+def open_result_store(context: AnalysisContext, db_file: str, source: str, resume: bool = False) -> bool:
+    """Opens the ResultStore in `db_file` on the context and starts (or resumes) a run of `source`
+
+    Returns:
+        True if the store is ready
+    """
+    try:
+        context.store = ResultStore(db_file)
+        run_id = context.store.start_run(source, context.analysis_model, context.critique_model, resume)
+    except RuntimeError as e:
+        print(f"❌ Not starting: {e}; wait for it to finish or use another --output-dir")
+        context.store.close()
+        return False
+    except (sqlite3.Error, OSError) as e:
+        print(f"❌ Could not open result store {db_file}: {e}")
+        return False
+    print(f"🗃️ Storing results in {db_file} (run {run_id})")
+    return True
+
+
+def finish_run(context: AnalysisContext, folder_path: str, finished: set,
+               frame_runs: dict, critique_window: int = 0, concurrency: int = 1) -> bool:
+    """Completes the run in the ResultStore and hands its results to the critique stage
+
+    The run's results are read back from the store in frame order, and
+    exported to RESULTS_FILE one entry at a time if context.export_json is
+    set. The entries are handed to the critique in memory while their
+    analyses fit in one critique prompt (the critique holds that text
+    anyway); beyond that the critique streams them from the store, so memory
+    use does not grow with the number of frames.
+
+    Returns:
+        True if the results were saved
+    """
+    store = context.store
+    if context.cache is not None:
+        context.cache.print_stats()
+
+    kept = []  # Exported entries, until they outgrow a single critique prompt
+    kept_chars = 0
+
+    def run_results():
+        nonlocal kept, kept_chars
+        for result in store.iter_results():
+            if kept is not None:
+                kept.append(result)
+                kept_chars += len(result.get("analysis", "")) + len(result.get("error", ""))
+                if kept_chars > MAX_CRITIQUE_INPUT_CHARS:
+                    kept = None
+            yield result
+
+    # Complete the run's results in the store and optionally export them to a JSON file
+    results_file = os.path.join(context.output_dir, RESULTS_FILE)
+    try:
+        with context.profiler.span("write_json"):
+            store.prune_chunks(finished)
+            if frame_runs:
+                store.set_frame_runs(frame_runs)
+            if context.export_json:
+                result_count = write_results_json(results_file, run_results())
+            else:
+                result_count = sum(1 for _ in run_results())
+        print(f"\n💾 Analysis results saved to {store.db_file} (run {store.run_id})"
+              + (f" and {results_file}" if context.export_json else ""))
+    except Exception as e:
+        print(f"\n❌ Error saving results: {e}")
+        store.close("failed")
+        context.profiler.save(os.path.join(context.output_dir, PROFILE_FILE))
+        return False
+
+    errored = store.errored_frames()
+    if errored:
+        print(f"⚠️ {len(errored)} frames have no analysis, e.g. {errored[0][0]}: {errored[0][1][:100]}")
+
+    # Critique the results of this run and write its critique file
+    if result_count:
+        print("\n🎬 Generating Steven Spielberg's REALITY-CHECK critique...")
+        analyze_json_and_transcript(
+            folder_path, rate_limiter=context.rate_limiter, summary_window=critique_window,
+            concurrency=concurrency, client=context.client, model=context.critique_model,
+            output_dir=context.output_dir, profiler=context.profiler, fps=context.fps, budget=context.budget,
+            store=store, results=kept if kept is not None else store.iter_results,
+            critique_file=os.path.join(context.output_dir, CRITIQUE_FILE), max_retries=context.max_retries,
+            video_path=context.video_path,
+        )
+        kept = None
+    else:
+        print("\n⚠️ No analysis results to process")
+    store.close("finished")
+
+    usage = context.budget.describe()
+    if usage:
+        print(f"\n🧮 Token usage (per call in {TOKEN_USAGE_FILE}):")
+        for line in usage.splitlines():
+            print(f"   {line}")
+    context.budget.close()
+    context.profiler.save(os.path.join(context.output_dir, PROFILE_FILE))
+    return True
+
+
+def process_folder(folder_path: str, chunk_size: int = 5, skip_frames: int = 100, concurrency: int = 1,
+                   rate_limiter=None, cache: FrameAnalysisCache = None,
+                   checkpoint_file: str = DEFAULT_CHECKPOINT_FILE, resume: bool = False,
+                   preprocessor: FramePreprocessor = None, deduplicator: FrameDeduplicator = None,
+                   keyframe_selector: KeyframeSelector = None, critique_window: int = 0,
+                   client=None, output_dir: str = ".", analysis_model: str = ANALYSIS_MODEL,
+                   critique_model: str = CRITIQUE_MODEL, prefetch: int = DEFAULT_PREFETCH,
+                   packed: bool = False, contact_sheet: ContactSheetBuilder = None,
+                   max_concurrency: int = 0, max_retries: int = DEFAULT_MAX_RETRIES,
+                   fps: float = DEFAULT_FPS, max_request_tokens: int = DEFAULT_REQUEST_TOKEN_BUDGET,
+                   dry_run: bool = False, plan_latency: float = PLAN_REQUEST_SECONDS,
+                   export_json: bool = False) -> bool:
+    """Processes an entire folder of images using Llama API
+    
+    Args:
+        folder_path: Path to folder containing images
+        chunk_size: Number of images to process in each API call
+        skip_frames: Skip every N frames (for video frame analysis)
+        concurrency: Number of chunk requests to keep in flight at once.
+            Values above 1 switch to the asyncio execution mode.
+        rate_limiter: RateLimiter shared by every API call of the run. Defaults
+            to DEFAULT_REQUESTS_PER_MINUTE with no token limit.
+        cache: Optional FrameAnalysisCache; frames already analyzed with the
+            same model, prompt and parameters skip the API
+        checkpoint_file: SQLite ResultStore each finished chunk is committed to
+        resume: Continue the source's last run in checkpoint_file and only
+            submit chunks that have no result yet (chunks that errored are retried)
+        preprocessor: Optional FramePreprocessor that downscales/re-encodes
+            frames before upload
+        deduplicator: Optional FrameDeduplicator that collapses runs of
+            near-identical frames and sends one representative per run
+        keyframe_selector: Optional KeyframeSelector that replaces the
+            skip_frames filter with scene-change based keyframe picking
+        critique_window: If > 0, the critique summarizes windows of this many
+            results first (map-reduce) instead of reading every analysis
+        client: Existing LlamaAPIClient to reuse; the process-wide one
+            (create_client) if omitted
+        output_dir: Directory the critique (and analysis_results.json) are written to
+        analysis_model: Model used for the frame analysis
+        critique_model: Model used for the summaries and the critique
+        prefetch: Number of chunks to read and encode in the background ahead
+            of the requests in flight (0 = encode each chunk right before sending)
+        packed: Send each chunk as one message asking for a per-frame JSON
+            array instead of one message (and instruction) per image
+        contact_sheet: Optional ContactSheetBuilder; the selected frames are
+            tiled into labelled sheets which are sent instead (chunk_size then
+            counts sheets), and each sheet's analysis is mapped back to the
+            range of frames it covers
+        max_concurrency: If above `concurrency`, adapt the requests in flight
+            between 1 and this number based on latency and 429/5xx responses
+        max_retries: Retries of 429/5xx/connection errors per request, with
+            backoff; frames that still fail are retried once at the end of the
+            run (0 disables both)
+        fps: Frame rate the frames were extracted at; lines up the cues of an
+            .srt/.vtt transcript with the frame numbers for the critique
+        max_request_tokens: Estimated token budget per request (0 = none);
+            chunks over it are split, critique inputs summarized or trimmed.
+            Estimated and actual usage of every call go to TOKEN_USAGE_FILE.
+        dry_run: Select, chunk and encode the frames and print the plan
+            (plan_run) without creating a client or calling the API
+        plan_latency: Assumed seconds per analysis request for the dry run's
+            wall time projection
+        export_json: Also export the results to RESULTS_FILE in output_dir
+
+    Returns:
+        True if the run finished and its results were saved (or was planned)
+    """
+    
+    # Validate folder path
+    if not os.path.isdir(folder_path):
+        print(f"❌ Not a folder of images: {folder_path}")
+        return False
+    
+    # Initialize the Llama API client
+    if client is None and not dry_run:
+        client = create_client()
+        if client is None:
+            return False
+    profiler = RunProfiler()
 
     # Get a list of all image files in the folder
-    image_extensions = ('.jpg', '.jpeg', '.png', '.bmp', '.gif', '.tiff', '.webp')
-    image_files = [f for f in os.listdir(folder_path) if f.lower().endswith(image_extensions)]
-    image_files.sort()
+    with profiler.span("list"):
+        image_extensions = ('.jpg', '.jpeg', '.png', '.bmp', '.gif', '.tiff', '.webp')
+        image_files = [f for f in os.listdir(folder_path) if f.lower().endswith(image_extensions)]
+        image_files.sort()
     
     if not image_files:
         print(f"❌ No image files found in {folder_path}")
-        return
+        return False
     
     print(f"📸 Found {len(image_files)} image files")
     print(f"⚙️ Processing in chunks of {chunk_size}, skipping every {skip_frames} frames")
 
-    # Initialize a list to store the analysis results
-    analysis_results = []
-    processed_count = 0
-    total_chunks = (len(image_files) + chunk_size - 1) // chunk_size
+    if rate_limiter is None:
+        rate_limiter = RateLimiter()
+    print(f"🚦 Rate limit: {rate_limiter.describe()}")
+
+    context = AnalysisContext(client, rate_limiter, cache, preprocessor, analysis_model, critique_model, output_dir,
+                              profiler, packed, max_retries)
+    context.fps = fps
+    context.export_json = export_json
+    if not dry_run and not open_result_store(context, checkpoint_file, folder_path, resume):
+        return False
+    context.budget = TokenBudget(max_request_tokens,
+                                 None if dry_run else os.path.join(output_dir, TOKEN_USAGE_FILE))
+    if context.preprocessor is not None:
+        print(f"🖼️ Preprocessing frames: {context.preprocessor.describe()}")
+
+    filter_start = time.perf_counter()
+    frame_runs = {}
+    if keyframe_selector is not None:
+        # Pick keyframes per detected shot instead of every Nth file
+        print(f"🎞️ Scoring {len(image_files)} frames for scene changes ({keyframe_selector.method})...")
+        filtered_images, frame_runs = keyframe_selector.select(folder_path, image_files)
+        print(f"🎯 Detected {keyframe_selector.shot_count} shots, selected {len(filtered_images)} keyframes "
+              f"(budget {keyframe_selector.budget})")
+    elif skip_frames > 1:
+        # Filter images based on skip_frames parameter first
+        filtered_images = [image_files[i] for i in range(0, len(image_files), skip_frames)]
+        print(f"🎯 Filtered to {len(filtered_images)} images (every {skip_frames} frames)")
+    else:
+        filtered_images = image_files
+
+    # Collapse runs of near-identical frames (static shots) to one representative each
+    if deduplicator is not None and keyframe_selector is not None:
+        print("ℹ️ Keyframe selection already collapses static shots, skipping dedupe")
+    elif deduplicator is not None:
+        print(f"🔍 Hashing {len(filtered_images)} frames for near-duplicate detection...")
+        filtered_images, frame_runs = deduplicator.group(folder_path, filtered_images, image_files)
+        print(f"🧹 Collapsed to {len(filtered_images)} distinct shots "
+              f"({deduplicator.method}, threshold {deduplicator.threshold})")
+    profiler.add("filter", filter_start, time.perf_counter())
+
+    if contact_sheet is not None:
+        # Send labelled grids of frames; sheets are composited in the background as chunks are pulled
+        sheets, frame_runs = contact_sheet.group(filtered_images, frame_runs, image_files)
+        print(f"🗂️ Tiling {len(filtered_images)} frames into {len(sheets)} contact sheets "
+              f"({contact_sheet.describe()})")
+        print(f"📦 {(len(sheets) + chunk_size - 1) // chunk_size} chunks to process")
+        context.frame_data = {}
+        context.prompt = contact_sheet.prompt
+        chunks = iter_frame_chunks(contact_sheet.iter_sheets(folder_path, sheets), chunk_size,
+                                   context.frame_data, profiler, "tile")
+        total_images = len(sheets)
+    else:
+        chunks = [filtered_images[i:i+chunk_size] for i in range(0, len(filtered_images), chunk_size)]
+        print(f"📦 {len(chunks)} chunks to process")
+        chunks = list(enumerate(chunks, 1))
+        total_images = len(filtered_images)
+
+    if dry_run:
+        plan_run(context, folder_path, chunks, concurrency, prefetch, critique_window, plan_latency)
+        return True
+    finished = run_chunks(context, folder_path, chunks, concurrency, resume, total_images, prefetch,
+                          max_concurrency)
+    if finished is None:
+        context.store.close("interrupted")
+        return False
+    return finish_run(context, folder_path, finished, frame_runs, critique_window, concurrency)
+
+
+def iter_video_frames(video_path: str, skip_frames: int = 1, ffmpeg_path: str = "ffmpeg"):
+    """Streams frames of a video from an ffmpeg MJPEG pipe without writing them to disk
+
+    ffmpeg decodes the video, keeps every `skip_frames`-th frame with its
+    select filter and writes JPEGs back to back to stdout. Frames are split
+    on the JPEG end-of-image marker (ffmpeg's MJPEG encoder byte-stuffs
+    entropy-coded data, so the marker can't appear inside a frame).
+
+    Args:
+        video_path: Path to the video file
+        skip_frames: Keep every Nth source frame
+        ffmpeg_path: ffmpeg executable to launch
+
+    Yields:
+        Tuples of (frame_name, source_frame_index, jpeg_bytes). Frame names
+        follow the `ffmpeg -i input.mp4 %04d.jpg` numbering from the README.
+    """
+    command = [ffmpeg_path, "-v", "error", "-nostdin", "-i", video_path]
+    if skip_frames > 1:
+        command += ["-vf", f"select=not(mod(n\\,{skip_frames}))", "-vsync", "vfr"]
+    command += ["-f", "image2pipe", "-c:v", "mjpeg", "-q:v", "2", "pipe:1"]
+
+    try:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except FileNotFoundError:
+        print(f"❌ ffmpeg not found ({ffmpeg_path}). Install it or pass --ffmpeg with its path.")
+        return
+
+    buffer = bytearray()
+    frame_count = 0
+    try:
+        while True:
+            block = process.stdout.read1(1024 * 1024)
+            if not block:
+                break
+            search_from = max(0, len(buffer) - 1)
+            buffer += block
+            while True:
+                end = buffer.find(b"\xff\xd9", search_from)
+                if end < 0:
+                    break
+                frame = bytes(buffer[:end + 2])
+                del buffer[:end + 2]
+                search_from = 0
+                source_index = frame_count * skip_frames
+                frame_count += 1
+                yield f"{source_index + 1:04d}.jpg", source_index, frame
+    finally:
+        if process.poll() is None:
+            process.kill()
+        _, stderr = process.communicate()
+        if process.returncode not in (0, -9) and stderr:
+            print(f"❌ ffmpeg failed: {stderr.decode('utf-8', 'replace').strip()}")
+
+
+def iter_frame_chunks(frames, chunk_size: int, frame_data: dict, profiler: RunProfiler = None,
+                      stage: str = "decode"):
+    """Groups streamed frames into numbered chunks, parking their bytes in frame_data
+
+    Args:
+        frames: Iterator of (frame_name, source_frame_index, data) tuples
+        chunk_size: Number of frames per chunk
+        frame_data: Dictionary the frame bytes are stored in until they are sent
+        profiler: Optional RunProfiler; time spent waiting for each chunk's
+            frames is recorded as its `stage` span
+        stage: Profile stage name for that wait ("decode" for video frames)
+
+    Yields:
+        Tuples of (chunk_number, frame names)
+    """
+    chunk = []
+    chunk_number = 0
+    start = time.perf_counter()
+    for name, _, data in frames:
+        frame_data[name] = data
+        chunk.append(name)
+        if len(chunk) == chunk_size:
+            chunk_number += 1
+            if profiler is not None:
+                profiler.add(stage, start, time.perf_counter(), chunk_number)
+            yield chunk_number, chunk
+            chunk = []
+            start = time.perf_counter()
+    if chunk:
+        if profiler is not None:
+            profiler.add(stage, start, time.perf_counter(), chunk_number + 1)
+        yield chunk_number + 1, chunk
 
-    # Filter images based on skip_frames parameter first
-    if skip_frames > 1:
-        filtered_images = [image_files[i] for i in range(0, len(image_files), skip_frames)]
-        print(f"🎯 Filtered to {len(filtered_images)} images (every {skip_frames} frames)")
-    else:
-        filtered_images = image_files
-    
-    total_chunks = (len(filtered_images) + chunk_size - 1) // chunk_size
 
-    # Process the filtered images in chunks
-    for i in range(0, len(filtered_images), chunk_size):
-        chunk = filtered_images[i:i+chunk_size]
-        chunk_number = i // chunk_size + 1
+def process_video(video_path: str, chunk_size: int = 5, skip_frames: int = 100, concurrency: int = 1,
+                  rate_limiter=None, cache: FrameAnalysisCache = None,
+                  checkpoint_file: str = DEFAULT_CHECKPOINT_FILE, resume: bool = False,
+                  preprocessor: FramePreprocessor = None, deduplicator: FrameDeduplicator = None,
+                  ffmpeg_path: str = "ffmpeg", critique_window: int = 0, client=None, output_dir: str = ".",
+                  analysis_model: str = ANALYSIS_MODEL, critique_model: str = CRITIQUE_MODEL,
+                  prefetch: int = DEFAULT_PREFETCH, packed: bool = False, max_concurrency: int = 0,
+                  max_retries: int = DEFAULT_MAX_RETRIES, fps: float = DEFAULT_FPS,
+                  max_request_tokens: int = DEFAULT_REQUEST_TOKEN_BUDGET, dry_run: bool = False,
+                  plan_latency: float = PLAN_REQUEST_SECONDS, export_json: bool = False) -> bool:
+    """Processes a video file directly, streaming frames from ffmpeg into the analysis
 
-        print(f"\n🔄 Processing chunk {chunk_number} of {total_chunks}...")
-        print(f"   Images: {', '.join(chunk)}")
+    Replaces the `ffmpeg -i input.mp4 %04d.jpg` extraction step: selected
+    frames go from the ffmpeg pipe straight into API requests and are
+    dropped from memory once sent. The transcript is the file named after
+    the video (clip.srt for clip.mp4) next to it.
 
-        # Create messages for the Llama API
-        messages = []
-        valid_images = []
-        
-        for image_file in chunk:
-            image_path = os.path.join(folder_path, image_file)
-            base64_image = image_to_base64(image_path)
-            
-            if base64_image:  # Only process if base64 conversion was successful
-                valid_images.append(image_file)
-                messages.append({
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": f"Analyze this image '{image_file}' and describe what you see. Include details about objects, people, scenes, colors, composition, and any notable features.",
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{base64_image}"
-                            },
-                        },
-                    ],
-                })
-        
-        if not valid_images:
-            print("   ⚠️ No valid images in this chunk, skipping...")
-            continue
+    Args:
+        video_path: Path to the video file
+        chunk_size: Number of frames to process in each API call
+        skip_frames: Keep every Nth frame of the video
+        concurrency: Number of chunk requests to keep in flight at once
+        rate_limiter: RateLimiter shared by every API call of the run
+        cache: Optional FrameAnalysisCache; frames already analyzed skip the API
+        checkpoint_file: SQLite ResultStore each finished chunk is committed to
+        resume: Continue the source's last run in checkpoint_file, skipping chunks already done
+        preprocessor: Optional FramePreprocessor applied before upload
+        deduplicator: Optional FrameDeduplicator; runs of near-identical
+            frames are collapsed on the fly
+        ffmpeg_path: ffmpeg executable to launch
+        critique_window: If > 0, map-reduce the critique over windows of this many results
+        client: Existing LlamaAPIClient to reuse; the shared one (create_client) if omitted
+        output_dir: Directory the critique (and analysis_results.json) are written to
+        analysis_model: Model used for the frame analysis
+        critique_model: Model used for the summaries and the critique
+        prefetch: Number of chunks to encode in the background ahead of the
+            requests in flight; each one holds its frames in memory
+        packed: Send each chunk as one message asking for a per-frame JSON array
+        max_concurrency: If above `concurrency`, adapt the requests in flight up to this number
+        max_retries: Retries of transient errors per request; frames that still
+            fail are retried once at the end of the run (0 disables both)
+        fps: Frame rate of the video, for lining up .srt/.vtt transcript cues
+        max_request_tokens: Estimated token budget per request (0 = none)
+        dry_run: Stream and encode the frames and print the plan without calling the API
+        plan_latency: Assumed seconds per analysis request for the dry run's projection
+        export_json: Also export the results to RESULTS_FILE in output_dir
 
-        try:
-            # Create a completion request for the Llama API
-            response = client.chat.completions.create(
-                model="Llama-4-Maverick-17B-128E-Instruct-FP8",
-                messages=messages,
-                max_completion_tokens=2048,
-                temperature=0.7,
-            )
+    Returns:
+        True if the run finished and its results were saved (or was planned)
+    """
+    if not os.path.isfile(video_path):
+        print(f"❌ Video file does not exist: {video_path}")
+        return False
 
-            # Process the response
-            if hasattr(response, 'completion_message') and response.completion_message:
-                content = response.completion_message.content
-                
-                # Handle different response formats
-                if isinstance(content, list):
-                    for j, message in enumerate(content):
-                        if j < len(valid_images):
-                            result_text = message.text if hasattr(message, 'text') else str(message)
-                            print(f"   📝 {valid_images[j]}: {result_text[:100]}...")
-                            analysis_results.append({
-                                "image": valid_images[j],
-                                "analysis": result_text,
-                                "chunk": chunk_number,
-                                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
-                            })
-                elif isinstance(content, str):
-                    print(f"   📝 Batch analysis: {content[:100]}...")
-                    analysis_results.append({
-                        "images": valid_images,
-                        "analysis": content,
-                        "chunk": chunk_number,
-                        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
-                    })
-                elif hasattr(content, 'text'):
-                    result_text = content.text
-                    print(f"   📝 Batch analysis: {result_text[:100]}...")
-                    analysis_results.append({
-                        "images": valid_images,
-                        "analysis": result_text,
-                        "chunk": chunk_number,
-                        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
-                    })
-                else:
-                    print(f"   ⚠️ Unexpected response format: {type(content)}")
-                    analysis_results.append({
-                        "images": valid_images,
-                        "analysis": str(content),
-                        "chunk": chunk_number,
-                        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
-                    })
-            else:
-                print("   ⚠️ No completion message in response")
+    if client is None and not dry_run:
+        client = create_client()
+        if client is None:
+            return False
 
-            processed_count += len(valid_images)
+    print(f"🎥 Streaming frames from {video_path} (every {skip_frames} frames, chunks of {chunk_size})")
 
-        except Exception as e:
-            print(f"   ❌ Error processing chunk {chunk_number}: {e}")
-            # Add error entry to results
-            analysis_results.append({
-                "images": valid_images,
-                "error": str(e),
-                "chunk": chunk_number,
-                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
-            })
+    if rate_limiter is None:
+        rate_limiter = RateLimiter()
+    print(f"🚦 Rate limit: {rate_limiter.describe()}")
 
-        # Print progress bar
-        progress = processed_count / len(filtered_images)
-        bar_length = 20
-        filled_length = int(bar_length * progress)
-        bar = '█' * filled_length + '░' * (bar_length - filled_length)
-        print(f"   📊 Progress: [{bar}] {int(progress*100)}% ({processed_count}/{len(filtered_images)})")
+    context = AnalysisContext(client, rate_limiter, cache, preprocessor, analysis_model, critique_model, output_dir,
+                              packed=packed, max_retries=max_retries)
+    context.fps = fps
+    context.frame_data = {}
+    context.video_path = video_path
+    context.export_json = export_json
+    if not dry_run and not open_result_store(context, checkpoint_file, video_path, resume):
+        return False
+    context.budget = TokenBudget(max_request_tokens,
+                                 None if dry_run else os.path.join(output_dir, TOKEN_USAGE_FILE))
+    if context.preprocessor is not None:
+        print(f"🖼️ Preprocessing frames: {context.preprocessor.describe()}")
 
-        # Wait to avoid overwhelming the API
-        print("   ⏳ Waiting 2 seconds...")
-        time.sleep(2)
+    frames = iter_video_frames(video_path, max(1, skip_frames), ffmpeg_path)
+    frame_runs = {}
+    if deduplicator is not None:
+        print(f"🧹 Collapsing near-identical frames on the fly ({deduplicator.method}, threshold {deduplicator.threshold})")
+        frames = deduplicator.group_stream(frames, frame_runs)
 
-    # Save the analysis results to a JSON file
-    results_file = 'analysis_results.json'
-    try:
-        with open(results_file, 'w', encoding='utf-8') as f:
-            json.dump(analysis_results, f, indent=2, ensure_ascii=False)
-        print(f"\n💾 Analysis results saved to {results_file}")
-    except Exception as e:
-        print(f"\n❌ Error saving results: {e}")
-        return
+    chunks = iter_frame_chunks(frames, chunk_size, context.frame_data, context.profiler)
+    folder_path = os.path.dirname(os.path.abspath(video_path))
+    if dry_run:
+        plan_run(context, folder_path, chunks, concurrency, prefetch, critique_window, plan_latency)
+        return True
+    finished = run_chunks(context, folder_path, chunks, concurrency, resume,
+                          prefetch=prefetch, max_concurrency=max_concurrency)
+    if finished is None:
+        context.store.close("interrupted")
+        return False
+    return finish_run(context, folder_path, finished, frame_runs, critique_window, concurrency)
 
-    # Analyze the JSON file and produce an output.md file
-    if analysis_results:
-        print("\n🎬 Generating Steven Spielberg's REALITY-CHECK critique...")
-        analyze_json_and_transcript(folder_path)
-    else:
-        print("\n⚠️ No analysis results to process")
 
+def find_transcript_file(folder_path: str, video_path: str = None) -> str:
+    """Find transcript file in the same folder as images, or the one named after a video
 
-def find_transcript_file(folder_path: str) -> str:
-    """Find transcript file in the same folder as images"""
+    A video's folder can hold other videos and their transcripts, so for a
+    video only <video name>.srt/.vtt/.txt/.transcript next to it is used.
+    """
     transcript_extensions = ('.txt', '.srt', '.vtt', '.transcript')
-    
-    for file in os.listdir(folder_path):
+
+    if video_path is not None:
+        stem = os.path.splitext(video_path)[0]
+        for extension in TIMED_TRANSCRIPT_EXTENSIONS + transcript_extensions:
+            if os.path.isfile(stem + extension):
+                print(f"📄 Found transcript file: {os.path.basename(stem + extension)}")
+                return stem + extension
+        print(f"⚠️ No transcript file named after {os.path.basename(video_path)} found")
+        return ""
+
+    for file in sorted(os.listdir(folder_path)):
         if file.lower().endswith(transcript_extensions):
             transcript_path = os.path.join(folder_path, file)
             print(f"📄 Found transcript file: {file}")
@@ -243,78 +3204,357 @@ def find_transcript_file(folder_path: str) -> str:
     return ""
 
 
-def analyze_json_and_transcript(folder_path: str) -> None:
-    """Analyzes the JSON file and transcript with Spielberg-style critique"""
-    
-    # Load the analysis results from the JSON file
-    results_file = 'analysis_results.json'
-    try:
-        with open(results_file, 'r', encoding='utf-8') as f:
-            analysis_results = json.load(f)
-    except Exception as e:
-        print(f"❌ Error loading {results_file}: {e}")
-        return
+def parse_cue_time(value: str) -> float:
+    """Parses an SRT or WebVTT timestamp ("00:01:02,500", "01:02.500") into seconds"""
+    seconds = 0.0
+    for part in value.strip().replace(",", ".").split(":"):
+        seconds = seconds * 60 + float(part)
+    return seconds
 
-    if not analysis_results:
-        print("⚠️ No analysis results found in JSON file")
-        return
-    
-    # Load transcript if available
-    transcript_content = ""
-    transcript_file = find_transcript_file(folder_path)
-    if transcript_file:
-        try:
-            with open(transcript_file, 'r', encoding='utf-8') as f:
-                transcript_content = f.read()
-            print("✅ Transcript loaded successfully")
-        except Exception as e:
-            print(f"⚠️ Error loading transcript: {e}")
-            transcript_content = ""
 
-    # Initialize the Llama API client
-    try:
-        client = LlamaAPIClient()
-    except Exception as e:
-        print(f"❌ Failed to initialize Llama API client for analysis: {e}")
-        return
+def iter_transcript_cues(lines):
+    """Parses SRT or WebVTT subtitles into timed cues, one cue at a time
 
-    # Prepare the analysis data for the AI as a video sequence
-    analysis_text = "VIDEO SEQUENCE ANALYSIS:\n"
-    analysis_text += "========================\n\n"
-    
-    for i, result in enumerate(analysis_results, 1):
+    Works on any iterable of lines, so an open file is streamed rather than
+    read whole. Cue numbers and identifiers, the WEBVTT header, NOTE/STYLE
+    blocks, cue settings and markup such as <i> or <v Speaker> are dropped;
+    blocks with an unreadable timing line are skipped.
+
+    Yields:
+        (start_seconds, end_seconds, text) tuples in file order
+    """
+    import html
+    import re
+
+    tags = re.compile(r"<[^>]*>")
+    timing = None
+    text = []
+    for line in chain(lines, [""]):
+        line = line.strip().lstrip("\ufeff")
+        if not line:
+            if timing is not None and text:
+                yield timing[0], timing[1], " ".join(text)
+            timing, text = None, []
+        elif timing is None:
+            # Before the timing line: cue number, identifier, header or NOTE text
+            if "-->" in line:
+                start, end = line.split("-->", 1)
+                try:
+                    timing = (parse_cue_time(start), parse_cue_time(end.split()[0]))
+                except (ValueError, IndexError):
+                    timing = None
+        else:
+            cleaned = html.unescape(tags.sub("", line)).strip()
+            if cleaned:
+                text.append(cleaned)
+
+
+class TranscriptIndex:
+    """Interval index over the timed cues of an SRT/VTT transcript
+
+    Cues are sorted by start time next to a running maximum of their end
+    times, so finding every cue that overlaps a time range takes two binary
+    searches plus a scan of the matches, even when cues overlap each other.
+
+    Args:
+        cues: Iterable of (start_seconds, end_seconds, text), in any order
+    """
+
+    def __init__(self, cues):
+        cues = sorted(cues, key=lambda cue: (cue[0], cue[1]))
+        self.starts = array("d", (cue[0] for cue in cues))
+        self.ends = array("d", (cue[1] for cue in cues))
+        self.texts = [cue[2] for cue in cues]
+        self.max_ends = array("d")
+        latest = 0.0
+        for end in self.ends:
+            latest = max(latest, end)
+            self.max_ends.append(latest)
+
+    @classmethod
+    def load(cls, path: str) -> "TranscriptIndex":
+        with open(path, "r", encoding="utf-8-sig", errors="replace") as f:
+            return cls(iter_transcript_cues(f))
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    @property
+    def end(self) -> float:
+        """End time of the last cue in seconds"""
+        return self.max_ends[-1] if self.max_ends else 0.0
+
+    def cues_between(self, start: float, end: float) -> list:
+        """Returns the (start, end, text) cues overlapping [start, end), by start time"""
+        stop = bisect_left(self.starts, end)
+        first = bisect_right(self.max_ends, start, 0, stop)
+        return [(self.starts[i], self.ends[i], self.texts[i]) for i in range(first, stop) if self.ends[i] > start]
+
+
+def frame_number(image_file: str):
+    """Source frame number from a frame file name (the last digit group), or None"""
+    import re
+
+    digits = re.findall(r"\d+", Path(image_file).stem)
+    return int(digits[-1]) if digits else None
+
+
+def result_frame_span(result: dict):
+    """(first, last) source frame numbers a result entry covers, including collapsed runs, or None"""
+    names = []
+    runs = result.get("runs", {})
+    for image_file in result_images(result):
+        run = result.get("run") if "image" in result else runs.get(image_file)
+        names.extend([run["first"], run["last"]] if run else [image_file])
+    numbers = [number for number in map(frame_number, names) if number is not None]
+    return (min(numbers), max(numbers)) if numbers else None
+
+
+def attach_dialogue(analysis_results, index: TranscriptIndex, fps: float = DEFAULT_FPS):
+    """Yields result entries with the transcript cues spoken during each one as a "dialogue" field
+
+    An entry covers the time from its first frame to the first frame of the
+    next entry (the first entry from 0, the last to the end of the
+    transcript), so lines spoken between sampled frames are kept. Entries
+    without a frame number get no dialogue. Works on a stream of entries.
+
+    Args:
+        analysis_results: Result entries in frame order (any iterable)
+        index: TranscriptIndex of the transcript cues
+        fps: Frame rate the frame numbers count at
+    """
+    def with_dialogue(waiting: list, until: float):
+        for result, start in waiting:
+            cues = index.cues_between(start, until) if start is not None and until > start else []
+            yield {**result, "dialogue": " / ".join(cue[2] for cue in cues)} if cues else result
+
+    waiting = []
+    last_start = None
+    for result in analysis_results:
+        span = result_frame_span(result)
+        if span is None:
+            waiting.append((result, None))
+            continue
+        start = 0.0 if last_start is None else (span[0] - 1) / fps
+        yield from with_dialogue(waiting, start)
+        waiting = [(result, start)]
+        last_start = start
+    yield from with_dialogue(waiting, max(index.end, (last_start or 0.0) + 1 / fps))
+
+
+def iter_analysis_entry_texts(analysis_results, start: int = 1):
+    """Yields the frame/sequence text the critique reads, one piece per result entry
+
+    Args:
+        analysis_results: Result entries in frame order (any iterable); a
+            "dialogue" field (see attach_dialogue) is printed under the entry
+        start: Number of the first entry (keeps numbering stable across windows)
+    """
+    import re
+
+    for i, result in enumerate(analysis_results, start):
+        dialogue = f"DIALOGUE: {result['dialogue']}\n" if result.get("dialogue") else ""
         if "error" in result:
-            analysis_text += f"FRAME {i}: ERROR - {result['error']}\n\n"
+            yield f"FRAME {i}: ERROR - {result['error']}\n{dialogue}\n"
         elif "images" in result:
             # Extract frame numbers from filenames for better context
             frame_info = []
+            runs = result.get("runs", {})
             for img in result["images"]:
                 # Try to extract frame number from filename
-                import re
                 frame_match = re.search(r'(\d{4})', img)
                 frame_num = frame_match.group(1) if frame_match else str(i)
-                frame_info.append(f"Frame {frame_num}")
+                frame_info.append(f"Frame {frame_num}" + (describe_run(runs[img]) if img in runs else ""))
             
             frames_desc = ", ".join(frame_info)
-            analysis_text += f"SEQUENCE {i} ({frames_desc}):\n"
-            analysis_text += f"{result.get('analysis', 'No analysis')}\n\n"
+            yield f"SEQUENCE {i} ({frames_desc}):\n{result.get('analysis', 'No analysis')}\n{dialogue}\n"
         elif "image" in result:
             # Extract frame number from filename
-            import re
             frame_match = re.search(r'(\d{4})', result['image'])
             frame_num = frame_match.group(1) if frame_match else str(i)
-            analysis_text += f"FRAME {frame_num} ({result['image']}):\n"
-            analysis_text += f"{result.get('analysis', 'No analysis')}\n\n"
+            run_desc = describe_run(result["run"]) if "run" in result else ""
+            yield f"FRAME {frame_num} ({result['image']}){run_desc}:\n{result.get('analysis', 'No analysis')}\n{dialogue}\n"
+
+
+def format_analysis_entries(analysis_results, start: int = 1) -> str:
+    """Formats analysis result entries as the frame/sequence text the critique reads
+
+    Args:
+        analysis_results: Result entries in frame order
+        start: Number of the first entry (keeps numbering stable across windows)
+    """
+    return "".join(iter_analysis_entry_texts(analysis_results, start))
+
+
+def extract_response_text(response) -> str:
+    """Extracts the text content of a chat completion response"""
+    if hasattr(response, 'completion_message') and response.completion_message:
+        if hasattr(response.completion_message, 'content'):
+            if isinstance(response.completion_message.content, list):
+                return response.completion_message.content[0].text if response.completion_message.content else ""
+            elif hasattr(response.completion_message.content, 'text'):
+                return response.completion_message.content.text
+            else:
+                return str(response.completion_message.content)
+        else:
+            return str(response.completion_message)
+    return str(response)
+
+
+def result_images(result: dict) -> list:
+    """Returns the image files a result entry covers"""
+    return [result["image"]] if "image" in result else result.get("images", [])
+
+
+def split_transcript(transcript_content: str, parts: int) -> list:
+    """Splits a transcript into `parts` contiguous spans of roughly equal line count
+
+    Used to pair each window of frame analyses with the dialogue from the
+    same stretch of the reel.
+    """
+    lines = transcript_content.splitlines()
+    return ["\n".join(lines[len(lines) * k // parts:len(lines) * (k + 1) // parts]) for k in range(parts)]
+
+
+def request_summary(client, rate_limiter, prompt: str, fallback: str, model: str = CRITIQUE_MODEL,
+                    budget: TokenBudget = None, max_retries: int = DEFAULT_MAX_RETRIES) -> str:
+    """Sends one summary request, falling back to truncated notes if it fails
+
+    A prompt over the budget is trimmed to fit; the call is recorded in the
+    budget's usage log. Transient errors are retried up to max_retries times.
+    """
+    if budget is None:
+        budget = TokenBudget()
+    estimated_prompt = len(prompt) // 4
+    if not budget.fits(estimated_prompt + SUMMARY_MAX_TOKENS):
+        prompt = budget.trim_text(prompt, estimated_prompt + SUMMARY_MAX_TOKENS)
+        estimated_prompt = len(prompt) // 4
+        print(f"   ✂️ Summary prompt trimmed to {len(prompt):,} characters to fit the token budget")
+    messages = [{"role": "user", "content": prompt}]
+
+    def request():
+        wait_for_rate_limit(rate_limiter, messages, SUMMARY_MAX_TOKENS, estimated_prompt + SUMMARY_MAX_TOKENS)
+        return client.chat.completions.create(
+            model=model,
+            messages=messages,
+            max_completion_tokens=SUMMARY_MAX_TOKENS,
+            temperature=SUMMARY_TEMPERATURE,
+        )
+
+    try:
+        response = call_with_retries(request, "Summary", max_retries)
+        budget.record("summary", estimated_prompt, response)
+        return extract_response_text(response)
+    except Exception as e:
+        print(f"   ⚠️ Summary request failed ({e}), using truncated notes instead")
+        return fallback[:SUMMARY_MAX_TOKENS * 4]
+
+
+def request_summaries(client, rate_limiter, jobs, concurrency: int, model: str = CRITIQUE_MODEL,
+                      budget: TokenBudget = None, max_retries: int = DEFAULT_MAX_RETRIES) -> list:
+    """Runs summary requests in parallel and returns the summaries in order
+
+    Args:
+        jobs: Iterable of (prompt, fallback) pairs; consumed lazily, so only
+            about two prompts per worker are held in memory at once
+        max_retries: Retries of transient errors per summary request
+    """
+    concurrency = max(1, concurrency)
+    summaries = []
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for prompt, fallback in jobs:
+            if len(pending) >= 2 * concurrency:
+                summaries.append(pending.popleft().result())
+            pending.append(executor.submit(request_summary, client, rate_limiter, prompt, fallback, model, budget,
+                                           max_retries))
+        summaries.extend(future.result() for future in pending)
+    return summaries
+
+
+def summarize_reel(client, rate_limiter, analysis_results, transcript_content: str,
+                   window: int, concurrency: int = 1, max_chars: int = MAX_CRITIQUE_INPUT_CHARS,
+                   model: str = CRITIQUE_MODEL, total: int = None, budget: TokenBudget = None,
+                   max_retries: int = DEFAULT_MAX_RETRIES) -> str:
+    """Map-reduce summary of a long reel for the critique prompt
+
+    The map step summarizes fixed windows of frame analyses, each paired
+    with the matching stretch of the transcript, in parallel. If the joined
+    summaries are still longer than max_chars they are merged again in
+    groups of SUMMARY_FAN_IN until they fit, so the final critique prompt
+    stays bounded no matter how long the reel is. Windows are built lazily,
+    so analysis_results can be a stream that is never held in memory.
+
+    Args:
+        client: Initialized LlamaAPIClient
+        rate_limiter: Optional RateLimiter shared by all summary requests
+        analysis_results: Result entries in frame order (list or iterator)
+        transcript_content: Untimed transcript text, split evenly across the
+            windows ("" if none, or if the entries carry their own dialogue)
+        window: Number of result entries per window
+        concurrency: Number of summary requests in flight at once
+        max_chars: Size limit for the combined summaries
+        model: Model used for the summary requests
+        total: Number of entries in analysis_results; required for iterators
+        budget: Optional TokenBudget the summary requests are trimmed to and logged in
+        max_retries: Retries of transient errors per summary request
+
+    Returns:
+        Summary text that replaces the frame-by-frame analysis in the critique prompt
+    """
+    if total is None:
+        analysis_results = list(analysis_results)
+        total = len(analysis_results)
+    window_count = max(1, -(-total // window))
+    transcript_spans = split_transcript(transcript_content, window_count) if transcript_content else [""] * window_count
+    labels = []
+
+    def window_jobs():
+        entries_iter = iter(analysis_results)
+        for k, dialogue in enumerate(transcript_spans):
+            entries = list(islice(entries_iter, window))
+            if not entries:
+                return
+            images = [image for result in entries for image in result_images(result)]
+            label = f"{images[0]} - {images[-1]}" if images else f"entries {k * window + 1}-{k * window + len(entries)}"
+            notes = format_analysis_entries(entries, k * window + 1)
+            dialogue_section = f"\n\nDIALOGUE DURING THIS PART:\n{dialogue}" if dialogue.strip() else ""
+            labels.append(label)
+            yield (
+                f"You are assisting a film director. Below are frame-by-frame notes for part {k + 1} of "
+                f"{window_count} of a video ({label}).{' The dialogue spoken during this part follows.' if dialogue_section else ''}\n\n"
+                f"Write a compact summary (under 200 words) of this part: what happens on screen, shot types and "
+                f"pacing, text overlays, visual or technical problems, and how the dialogue fits the visuals. "
+                f"Mention frame numbers for notable moments.\n\nFRAME NOTES:\n{notes}{dialogue_section}",
+                notes,
+            )
+
+    print(f"🗂️ Summarizing {window_count} windows of up to {window} entries...")
+    summaries = request_summaries(client, rate_limiter, window_jobs(), concurrency, model, budget, max_retries)
+    parts = [f"PART {k + 1} ({label}):\n{summary.strip()}" for k, (label, summary) in enumerate(zip(labels, summaries))]
+
+    # Merge summaries hierarchically until the combined text fits the budget
+    level = 1
+    while len(parts) > 1 and sum(len(part) for part in parts) > max_chars:
+        level += 1
+        groups = [parts[i:i + SUMMARY_FAN_IN] for i in range(0, len(parts), SUMMARY_FAN_IN)]
+        print(f"🗂️ Level {level}: merging {len(parts)} summaries into {len(groups)}...")
+        jobs = [
+            ("Merge these consecutive part summaries of a video into one compact summary (under 250 words) "
+             "that keeps the story flow, pacing, notable moments with frame numbers, and recurring problems.\n\n"
+             + "\n\n".join(group), "\n\n".join(group))
+            for group in groups
+        ]
+        summaries = request_summaries(client, rate_limiter, jobs, concurrency, model, budget, max_retries)
+        parts = [f"PART {k + 1}:\n{summary.strip()}" for k, summary in enumerate(summaries)]
+
+    title = "VIDEO SEQUENCE SUMMARY (condensed from the frame-by-frame analysis):"
+    return "".join([title, "\n", "=" * len(title), "\n\n", "\n\n".join(parts), "\n"])
 
-    # Add transcript to the analysis if available
-    transcript_section = ""
-    if transcript_content:
-        transcript_section = f"\n\nAUDIO TRANSCRIPT:\n================\n{transcript_content}\n\n"
-    
-    # Create a brutally honest but contextual Spielberg prompt
-    message = {
-        "role": "user",
-        "content": f"""You are Steven Spielberg reviewing a FINISHED video project. Here's the FULL CONTEXT you need to understand:
+
+def spielberg_prompt(analysis_text: str, transcript_section: str) -> str:
+    """Builds the critique prompt around the frame analyses and the (optional) transcript section"""
+    return f"""You are Steven Spielberg reviewing a FINISHED video project. Here's the FULL CONTEXT you need to understand:
 
 THE CREATOR'S SITUATION:
 - 100% SELF-TAUGHT (no film school, no training, learning by trial and error)
@@ -372,38 +3612,193 @@ Here's what they managed to create in 2 hours with garbage footage:
 {transcript_section}
 
 Final question: Given the impossible constraints, did they actually pull this off? Be honest - is this good enough to not be embarrassing, or should they have just given up?"""
-    }
+
+
+def analyze_json_and_transcript(folder_path: str, rate_limiter=None, summary_window: int = 0,
+                                concurrency: int = 1, client=None, model: str = CRITIQUE_MODEL,
+                                output_dir: str = ".", profiler: RunProfiler = None,
+                                fps: float = DEFAULT_FPS, budget: TokenBudget = None,
+                                store: ResultStore = None, results=None, critique_file: str = None,
+                                max_retries: int = DEFAULT_MAX_RETRIES, video_path: str = None) -> None:
+    """Analyzes the JSON file and transcript with Spielberg-style critique
+
+    An .srt/.vtt transcript is parsed into timed cues and each frame or
+    sequence gets the dialogue spoken while it is on screen; other
+    transcripts are appended to the prompt as they are.
+
+    Args:
+        folder_path: Path to folder containing images and transcript
+        rate_limiter: Optional RateLimiter the critique request has to pass through
+        summary_window: If > 0, summarize windows of this many result entries
+            (with their transcript span) first and critique only the summaries.
+            Switches on automatically when the input exceeds MAX_CRITIQUE_INPUT_CHARS.
+        concurrency: Number of window summary requests in flight at once
+        client: Existing LlamaAPIClient to reuse; the shared one (create_client) if omitted
+        model: Model used for the summaries and the critique
+        output_dir: Directory the critique is written to (and RESULTS_FILE is read
+            from when neither results nor a store is given)
+        profiler: Optional RunProfiler timing the critique stages
+        fps: Frame rate of the frame numbering, for lining up .srt/.vtt cues
+        budget: TokenBudget each request has to fit and that logs their usage;
+            inputs over it are summarized (map-reduce) or trimmed
+        store: ResultStore the critique is recorded in; the current run's
+            results are read from it if `results` is omitted
+        results: The result entries, as a list or a function returning a fresh
+            iterator of them (read twice for map-reduce). Without results or a
+            store, RESULTS_FILE in output_dir is read.
+        critique_file: Path the critique is written to (CRITIQUE_FILE in output_dir by default)
+        max_retries: Retries of transient errors per summary and critique request (0 = none)
+        video_path: Video the frames were streamed from; its transcript is the
+            file named after it rather than any transcript in folder_path
+    """
+    if profiler is None:
+        profiler = RunProfiler()
+    if budget is None:
+        budget = TokenBudget()
+    
+    # Load transcript if available; timed cues are indexed rather than read as text
+    transcript_content = ""
+    transcript_index = None
+    transcript_file = find_transcript_file(folder_path, video_path)
+    if transcript_file:
+        try:
+            with profiler.span("transcript_load"):
+                if transcript_file.lower().endswith(TIMED_TRANSCRIPT_EXTENSIONS):
+                    transcript_index = TranscriptIndex.load(transcript_file) or None
+                if transcript_index is None:
+                    with open(transcript_file, 'r', encoding='utf-8') as f:
+                        transcript_content = f.read()
+            if transcript_index is not None:
+                print(f"✅ Transcript loaded: {len(transcript_index)} timed cues, aligned to the frames at {fps:g} fps")
+            else:
+                print("✅ Transcript loaded successfully")
+        except Exception as e:
+            print(f"⚠️ Error loading transcript: {e}")
+            transcript_content = ""
+            transcript_index = None
+
+    if results is not None:
+        results_source = "the run's results"
+    elif store is not None:
+        results = store.iter_results
+        results_source = f"{store.db_file} (run {store.run_id})"
+    else:
+        results_source = os.path.join(output_dir, RESULTS_FILE)
+        results = partial(iter_analysis_results, results_source)
+
+    def load_results():
+        entries = results() if callable(results) else iter(results)
+        return attach_dialogue(entries, transcript_index, fps) if transcript_index is not None else entries
+
+    # Stream the analysis results, keeping the formatted text only while it
+    # still fits in a single critique prompt
+    entry_texts = []
+    entry_count = 0
+    entry_chars = 0
+    dialogue_chars = 0
+    try:
+        with profiler.span("load_results"):
+            for result in load_results():
+                text = "".join(iter_analysis_entry_texts([result], entry_count + 1))
+                entry_count += 1
+                entry_chars += len(text)
+                dialogue_chars += len(result.get("dialogue", ""))
+                if entry_texts is not None:
+                    entry_texts.append(text)
+                    if entry_chars > MAX_CRITIQUE_INPUT_CHARS:
+                        entry_texts = None
+    except Exception as e:
+        print(f"❌ Error loading {results_source}: {e}")
+        return
+
+    if not entry_count:
+        print(f"⚠️ No analysis results found in {results_source}")
+        return
+    if transcript_index is not None:
+        print(f"🗣️ Dialogue lined up with the frames: {dialogue_chars:,} characters "
+              f"(transcript file is {os.path.getsize(transcript_file):,} bytes)")
+
+    # Initialize the Llama API client
+    if client is None:
+        client = create_client()
+        if client is None:
+            return
+
+    # Add transcript to the analysis if available
+    transcript_section = ""
+    if transcript_content:
+        transcript_section = f"\n\nAUDIO TRANSCRIPT:\n================\n{transcript_content}\n\n"
+
+    # Long reels: summarize windows first and only send the summaries to the critique.
+    # The prompt template and the completion count against the request token budget too.
+    header = "VIDEO SEQUENCE ANALYSIS:\n========================\n\n"
+    input_chars = len(header) + entry_chars + len(transcript_section)
+    fixed_tokens = len(spielberg_prompt("", "")) // 4 + CRITIQUE_MAX_TOKENS
+    entry_tokens = fixed_tokens + (len(header) + entry_chars) // 4
+    if not summary_window and (input_chars > MAX_CRITIQUE_INPUT_CHARS or not budget.fits(entry_tokens)):
+        print(f"📏 Critique input is {input_chars:,} characters (~{entry_tokens + len(transcript_section) // 4:,} "
+              f"tokens), switching to map-reduce with windows of {DEFAULT_SUMMARY_WINDOW}")
+        summary_window = DEFAULT_SUMMARY_WINDOW
+    elif not summary_window and not budget.fits(entry_tokens + len(transcript_section) // 4):
+        transcript_section = budget.trim_text(transcript_section, entry_tokens + len(transcript_section) // 4)
+        print(f"✂️ Transcript trimmed to {len(transcript_section):,} characters to fit the "
+              f"{budget.max_tokens:,} token budget")
+    if summary_window:
+        entry_texts = None
+        max_chars = MAX_CRITIQUE_INPUT_CHARS
+        if budget.max_tokens > 0:
+            max_chars = min(max_chars, max(0, budget.max_tokens - fixed_tokens) * 4)
+        with profiler.span("summaries"):
+            analysis_text = summarize_reel(client, rate_limiter, load_results(),
+                                           transcript_content, summary_window, concurrency, max_chars, model,
+                                           entry_count, budget, max_retries)
+        transcript_section = ""
+
+    # Create a brutally honest but contextual Spielberg prompt, within the request token budget
+    prompt_start = time.perf_counter()
+    if not summary_window:
+        # Prepare the analysis data for the AI as a video sequence
+        analysis_text = header + "".join(entry_texts)
+        entry_texts = None
+    message = {"role": "user", "content": spielberg_prompt(analysis_text, transcript_section)}
+    estimated_prompt = estimate_prompt_tokens([message])
+    if not budget.fits(estimated_prompt + CRITIQUE_MAX_TOKENS):
+        analysis_text = budget.trim_text(analysis_text, estimated_prompt + CRITIQUE_MAX_TOKENS)
+        print(f"✂️ Critique input trimmed to {len(analysis_text):,} characters to fit the "
+              f"{budget.max_tokens:,} token budget")
+        message = {"role": "user", "content": spielberg_prompt(analysis_text, transcript_section)}
+        estimated_prompt = estimate_prompt_tokens([message])
+    profiler.add("prompt_build", prompt_start, time.perf_counter())
 
     try:
         # Create a completion request for the Llama API
+        def request():
+            with profiler.span("rate_limit"):
+                wait_for_rate_limit(rate_limiter, [message], CRITIQUE_MAX_TOKENS,
+                                    estimated_prompt + CRITIQUE_MAX_TOKENS)
+            with profiler.span("critique"):
+                return client.chat.completions.create(
+                    model=model,  # Scout by default
+                    messages=[message],
+                    max_completion_tokens=CRITIQUE_MAX_TOKENS,
+                    temperature=CRITIQUE_TEMPERATURE,  # Higher temperature for more personality
+                )
+
         print("🎭 Consulting with Steven Spielberg (reality-check mode)...")
-        response = client.chat.completions.create(
-            model="Llama-4-Scout-17B-16E-Instruct-FP8",  # Using Scout model as requested
-            messages=[message],
-            max_completion_tokens=4000,
-            temperature=0.9,  # Higher temperature for more personality
-        )
+        response = call_with_retries(request, "Critique", max_retries)
+        budget.record("critique", estimated_prompt, response)
 
         # Extract the response content
-        content = ""
-        if hasattr(response, 'completion_message') and response.completion_message:
-            if hasattr(response.completion_message, 'content'):
-                if isinstance(response.completion_message.content, list):
-                    content = response.completion_message.content[0].text if response.completion_message.content else ""
-                elif hasattr(response.completion_message.content, 'text'):
-                    content = response.completion_message.content.text
-                else:
-                    content = str(response.completion_message.content)
-            else:
-                content = str(response.completion_message)
-        else:
-            content = str(response)
+        content = extract_response_text(response)
 
         # Save the response to an output.md file
-        output_file = 'spielberg_postproduction_critique.md'
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(content)
+        output_file = critique_file or os.path.join(output_dir, CRITIQUE_FILE)
+        with profiler.span("write_critique"):
+            with open(output_file, 'w', encoding='utf-8') as f:
+                f.write(content)
 
+        if store is not None:
+            store.add_critique(model, content, output_file)
         print(f"🎬 Steven Spielberg's REALITY-CHECK critique saved to {output_file}")
         
         # Print a brief summary
@@ -420,46 +3815,393 @@ Final question: Given the impossible constraints, did they actually pull this of
         print(f"❌ Error generating Spielberg analysis: {e}")
 
 
-def main():
-    """Main function to run the image batch processor"""
-    
-    print("🎬 Image Batch Processor with Llama API")
-    print("=" * 50)
-    
+def parse_grid(value: str) -> tuple:
+    """Parses a COLSxROWS grid option like "3x3" into (cols, rows)"""
+    try:
+        cols, rows = (int(part) for part in value.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected COLSxROWS like 3x3, got {value!r}")
+    if cols < 1 or rows < 1:
+        raise argparse.ArgumentTypeError(f"grid dimensions must be positive, got {value!r}")
+    return cols, rows
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """Parses command line options"""
+    parser = argparse.ArgumentParser(description="Analyze a folder of video frames with the Llama API")
+    parser.add_argument("path", nargs="?",
+                        help="Folder of frames or a video file; without it (and without --batch) you are prompted")
+    parser.add_argument("--batch", metavar="MANIFEST",
+                        help="Process every job in MANIFEST (one path per line, or a JSON list) with one shared "
+                             "client and cache")
+    parser.add_argument("--chunk-size", type=int, default=3, help="Images per API call (default 3)")
+    parser.add_argument("--skip-frames", type=int, default=1, help="Process every Nth image (default 1)")
+    parser.add_argument("--concurrency", type=int, default=1, help="Chunk requests in flight at once (default 1)")
+    parser.add_argument("--max-concurrency", type=int, default=0,
+                        help="Adapt the requests in flight between 1 and N, starting at --concurrency: one more "
+                             "after each window of steady requests, halved on 429/5xx or latency spikes "
+                             "(default 0, fixed --concurrency)")
+    parser.add_argument("--max-retries", type=int, default=DEFAULT_MAX_RETRIES,
+                        help="Retries of 429/5xx/connection errors per request, with jittered exponential backoff; "
+                             "oversized or timed out chunks are split, and frames that still fail are retried once "
+                             f"at the end of the run (default {DEFAULT_MAX_RETRIES}, 0 disables retries)")
+    parser.add_argument("--fps", type=float, default=DEFAULT_FPS,
+                        help="Frame rate the frames were extracted at (or of the video), used to line up .srt/.vtt "
+                             f"transcript cues with the analyzed frames (default {DEFAULT_FPS:g})")
+    parser.add_argument("--max-request-tokens", type=int, default=DEFAULT_REQUEST_TOKEN_BUDGET,
+                        help="Estimated token budget per request, prompt plus completion: bigger chunks are split, "
+                             "critique inputs summarized or trimmed (default "
+                             f"{DEFAULT_REQUEST_TOKEN_BUDGET}, 0 for no limit). Estimated and actual usage of every "
+                             f"call is logged to {TOKEN_USAGE_FILE}")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Select, chunk and encode the frames and build every request, then print the request "
+                             "count, upload size, estimated tokens and projected duration without calling the API "
+                             f"(also written to {PLAN_FILE})")
+    parser.add_argument("--plan-latency", type=float, default=PLAN_REQUEST_SECONDS,
+                        help="Assumed seconds per analysis request for the --dry-run duration projection "
+                             f"(default {PLAN_REQUEST_SECONDS:g})")
+    parser.add_argument("--pool-size", type=int, default=0,
+                        help="Keep-alive HTTP connections shared by all requests of the run "
+                             "(default 0, one per request in flight plus one)")
+    parser.add_argument("--analysis-model", default=ANALYSIS_MODEL,
+                        help=f"Model for the frame analysis (default {ANALYSIS_MODEL})")
+    parser.add_argument("--critique-model", default=CRITIQUE_MODEL,
+                        help=f"Model for the summaries and the critique (default {CRITIQUE_MODEL})")
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR,
+                        help="Directory whose subdirectory named after the input (e.g. reviews/clip for clip.mp4) "
+                             f"gets the result store, the critique and the run's logs (default {DEFAULT_OUTPUT_DIR})")
+    parser.add_argument("--rpm", type=float, default=DEFAULT_REQUESTS_PER_MINUTE,
+                        help=f"API requests per minute, 0 for unlimited (default {DEFAULT_REQUESTS_PER_MINUTE})")
+    parser.add_argument("--tpm", type=float, default=0,
+                        help="API tokens per minute, 0 for unlimited (default 0)")
+    parser.add_argument("--burst", type=int, default=1,
+                        help="Requests that may be sent back to back before pacing applies (default 1)")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR,
+                        help=f"Directory for cached frame analyses (default {DEFAULT_CACHE_DIR})")
+    parser.add_argument("--cache-max-mb", type=float, default=DEFAULT_CACHE_MAX_MB,
+                        help=f"Cache size limit in MB, least recently used entries are evicted (default {DEFAULT_CACHE_MAX_MB})")
+    parser.add_argument("--no-cache", action="store_true", help="Always send every frame to the API")
+    parser.add_argument("--max-edge", type=int, default=DEFAULT_MAX_EDGE,
+                        help="Downscale frames so their longest edge is at most this many pixels (default 0, off)")
+    parser.add_argument("--image-format", choices=["original", "jpeg", "webp"], default=DEFAULT_IMAGE_FORMAT,
+                        help="Re-encode frames before upload (default original)")
+    parser.add_argument("--quality", type=int, default=DEFAULT_IMAGE_QUALITY,
+                        help=f"JPEG/WebP quality when re-encoding (default {DEFAULT_IMAGE_QUALITY})")
+    parser.add_argument("--dedupe", action="store_true",
+                        help="Collapse runs of near-identical frames and analyze one frame per run (needs numpy, Pillow)")
+    parser.add_argument("--dedupe-threshold", type=int, default=DEFAULT_DEDUPE_THRESHOLD,
+                        help=f"Max Hamming distance (of 64 bits) for frames to count as the same (default {DEFAULT_DEDUPE_THRESHOLD})")
+    parser.add_argument("--hash-method", choices=["dhash", "ahash"], default="dhash",
+                        help="Perceptual hash used by --dedupe (default dhash)")
+    parser.add_argument("--keyframes", action="store_true",
+                        help="Pick keyframes per detected shot instead of every Nth frame (needs numpy, Pillow)")
+    parser.add_argument("--keyframe-budget", type=int, default=DEFAULT_KEYFRAME_BUDGET,
+                        help=f"Total frames to analyze in --keyframes mode (default {DEFAULT_KEYFRAME_BUDGET})")
+    parser.add_argument("--keyframe-method", choices=["histogram", "pixel"], default="histogram",
+                        help="Scene-change score used by --keyframes (default histogram)")
+    parser.add_argument("--scene-threshold", type=float, default=None,
+                        help="Scene-change score (0-1) that counts as a cut: the fraction of the color histogram that "
+                             "changes, or the mean pixel difference (default 0.2 histogram, 0.1 pixel)")
+    parser.add_argument("--contact-sheet", action="store_true",
+                        help="Tile consecutive frames into labelled contact sheets and analyze the sheets instead "
+                             "of single frames; --chunk-size then counts sheets (needs Pillow)")
+    parser.add_argument("--sheet-grid", type=parse_grid, default=DEFAULT_SHEET_GRID,
+                        help=f"Contact sheet layout as COLSxROWS (default {DEFAULT_SHEET_GRID})")
+    parser.add_argument("--sheet-tile-width", type=int, default=DEFAULT_SHEET_TILE_WIDTH,
+                        help=f"Width of each contact sheet tile in pixels (default {DEFAULT_SHEET_TILE_WIDTH})")
+    parser.add_argument("--prefetch", type=int, default=DEFAULT_PREFETCH,
+                        help="Chunks to read and base64 encode in the background ahead of the requests in flight, "
+                             f"0 to encode inline (default {DEFAULT_PREFETCH})")
+    parser.add_argument("--packed", action="store_true",
+                        help="Send each chunk as one message with a single instruction and parse the per-frame "
+                             "JSON answer (fewer prompt tokens per frame)")
+    parser.add_argument("--ffmpeg", default="ffmpeg",
+                        help="ffmpeg executable used to stream frames when a video file is given (default ffmpeg)")
+    parser.add_argument("--critique-window", type=int, default=0,
+                        help="Summarize windows of N analyses (with their transcript span) before the critique; "
+                             f"0 = only when the input exceeds {MAX_CRITIQUE_INPUT_CHARS:,} characters (default 0)")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT_FILE,
+                        help=f"SQLite result store finished chunks are committed to, relative to --output-dir "
+                             f"(default {DEFAULT_CHECKPOINT_FILE})")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue the input's last run in the result store, only submitting chunks "
+                             "it has no result for")
+    parser.add_argument("--export-json", action="store_true",
+                        help=f"Also export the results of the run to {RESULTS_FILE} in --output-dir")
+    return parser.parse_args(argv)
+
+
+def load_manifest(manifest_path: str) -> list:
+    """Reads a batch manifest
+
+    Either a text file with one folder or video path per line (blank lines
+    and lines starting with # are ignored), or a .json file holding a list
+    of paths or of objects like {"path": ..., "chunk_size": 5} whose keys
+    override the command line options for that job. Relative paths are
+    resolved against the manifest's directory.
+
+    Returns:
+        List of job dicts, each with at least a "path" key
+    """
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        if manifest_path.lower().endswith(".json"):
+            entries = json.load(f)
+        else:
+            entries = [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+    if not isinstance(entries, list):
+        raise ValueError("the manifest must be a list of jobs")
+
+    jobs = []
+    for entry in entries:
+        job = {"path": entry} if isinstance(entry, str) else dict(entry)
+        if not job.get("path"):
+            raise ValueError(f"job without a path: {entry!r}")
+        unknown = set(job) - set(BATCH_JOB_OPTIONS) - {"path"}
+        if unknown:
+            raise ValueError(f"unknown option(s) {', '.join(sorted(unknown))} for {job['path']}")
+        job["path"] = os.path.join(base_dir, os.path.expanduser(job["path"]))
+        jobs.append(job)
+    return jobs
+
+
+def stored_sources(db_file: str) -> set:
+    """Returns the sources of the runs recorded in a result store ({None} if it can't be read)"""
+    if not os.path.exists(db_file):
+        return set()
+    try:
+        db = sqlite3.connect(Path(os.path.abspath(db_file)).as_uri() + "?mode=ro", uri=True)
+        try:
+            return {row[0] for row in db.execute("SELECT DISTINCT source FROM runs")}
+        finally:
+            db.close()
+    except sqlite3.Error:
+        return {None}
+
+
+def job_output_dir(output_dir: str, path: str, checkpoint: str = DEFAULT_CHECKPOINT_FILE, taken=()) -> str:
+    """Returns the output directory of a job: a subdirectory of `output_dir` named after its input
+
+    Folders keep their full name (shot.v1), files lose their extension
+    (clip.mp4 -> clip). A name whose directory is the input itself, is in
+    `taken`, or holds a result store of other inputs gets a _2, _3... suffix,
+    so the same input always maps to the same directory (and --resume finds
+    its store) while different inputs never share one.
+    """
+    source = os.path.abspath(path)
+    name = (Path(source).name if os.path.isdir(source) else Path(source).stem) or "job"
+    candidate = os.path.join(output_dir, name)
+    number = 1
+    while (os.path.abspath(candidate) == source or candidate in taken
+           or not stored_sources(os.path.join(candidate, checkpoint)) <= {source}):
+        number += 1
+        candidate = os.path.join(output_dir, f"{name}_{number}")
+    return candidate
+
+
+def run_job(path: str, args: argparse.Namespace, client=None, rate_limiter: RateLimiter = None,
+            cache: FrameAnalysisCache = None) -> bool:
+    """Runs the whole pipeline for one folder or video file with the given options
+
+    Args:
+        path: Folder of frames or video file
+        args: Parsed command line options (possibly with per-job overrides)
+        client: Shared LlamaAPIClient; the process-wide one (create_client) if omitted
+        rate_limiter: Shared RateLimiter
+        cache: Shared FrameAnalysisCache
+
+    Returns:
+        True if the run finished and its results were saved
+    """
+    is_video = os.path.isfile(path)
+
+    print("\n🚀 Starting processing...")
+    print(f"   {'Video' if is_video else 'Folder'}: {path}")
+    print(f"   Chunk size: {args.chunk_size}")
+    print(f"   Skip frames: {args.skip_frames}")
+    print(f"   Concurrency: {args.concurrency}"
+          + (f" (adaptive up to {args.max_concurrency})" if args.max_concurrency > args.concurrency else ""))
+    print(f"   Output: {args.output_dir}")
+    if args.dry_run:
+        print("   Dry run: no API calls")
+
+    if not os.path.exists(path):
+        print(f"❌ Path does not exist: {path}")
+        return False
+    try:
+        os.makedirs(args.output_dir, exist_ok=True)
+    except OSError as e:
+        print(f"❌ Could not create output directory {args.output_dir}: {e}")
+        return False
+    checkpoint_file = os.path.join(args.output_dir, args.checkpoint)
+
+    preprocessor = None
+    if args.max_edge > 0 or args.image_format != "original":
+        preprocessor = FramePreprocessor(args.max_edge, args.image_format, args.quality)
+    deduplicator = FrameDeduplicator(args.dedupe_threshold, args.hash_method) if args.dedupe else None
+    keyframe_selector = None
+    if args.keyframes:
+        keyframe_selector = KeyframeSelector(args.keyframe_budget, args.keyframe_method, args.scene_threshold)
+    contact_sheet = None
+    if args.contact_sheet:
+        contact_sheet = ContactSheetBuilder(*args.sheet_grid, args.sheet_tile_width)
+
+    # Options shared by process_video and process_folder, passed by name since their parameter orders differ
+    options = dict(
+        chunk_size=args.chunk_size, skip_frames=args.skip_frames, concurrency=args.concurrency,
+        rate_limiter=rate_limiter, cache=cache, checkpoint_file=checkpoint_file, resume=args.resume,
+        preprocessor=preprocessor, deduplicator=deduplicator, critique_window=args.critique_window,
+        client=client, output_dir=args.output_dir, analysis_model=args.analysis_model,
+        critique_model=args.critique_model, prefetch=args.prefetch, packed=args.packed,
+        max_concurrency=args.max_concurrency, max_retries=args.max_retries, fps=args.fps,
+        max_request_tokens=args.max_request_tokens, dry_run=args.dry_run, plan_latency=args.plan_latency,
+        export_json=args.export_json,
+    )
+    if is_video:
+        if not path.lower().endswith(VIDEO_EXTENSIONS):
+            print(f"ℹ️ {os.path.basename(path)} is not a common video extension, letting ffmpeg try to decode it")
+        if contact_sheet is not None:
+            print("ℹ️ --contact-sheet works on frame folders and is ignored for video streaming")
+        if keyframe_selector is not None:
+            print("ℹ️ --keyframes needs the whole frame set and is ignored for video streaming; use --dedupe instead")
+        return process_video(path, ffmpeg_path=args.ffmpeg, **options)
+    return process_folder(path, keyframe_selector=keyframe_selector, contact_sheet=contact_sheet, **options)
+
+
+def pool_size_for(args: argparse.Namespace) -> int:
+    """Connections for the shared pool: --pool-size, or one per request in flight plus one"""
+    return args.pool_size or max(args.concurrency, args.max_concurrency) + 1
+
+
+def run_batch(manifest_path: str, args: argparse.Namespace, rate_limiter: RateLimiter = None,
+              cache: FrameAnalysisCache = None, client=None) -> bool:
+    """Processes every job of a batch manifest one after another
+
+    All jobs share one API client, rate limiter and frame cache. A failing
+    job is reported and the batch moves on to the next one.
+
+    Returns:
+        True if every job finished
+    """
+    try:
+        jobs = load_manifest(manifest_path)
+    except Exception as e:
+        print(f"❌ Could not read batch manifest {manifest_path}: {e}")
+        return False
+    if not jobs:
+        print(f"⚠️ No jobs in {manifest_path}")
+        return True
+
+    if client is None and not args.dry_run:
+        client = create_client(pool_size_for(args))
+        if client is None:
+            return False
+
+    # Jobs without their own output_dir get a subdirectory named after the input
+    used = set()
+    outcomes = []
+    print(f"📋 Batch of {len(jobs)} jobs from {manifest_path}")
+    for number, job in enumerate(jobs, 1):
+        overrides = {key: value for key, value in job.items() if key != "path"}
+        if "output_dir" not in overrides:
+            overrides["output_dir"] = job_output_dir(args.output_dir, job["path"], args.checkpoint, used)
+            used.add(overrides["output_dir"])
+        job_args = argparse.Namespace(**{**vars(args), **overrides})
+
+        print(f"\n{'=' * 50}\n📋 Job {number}/{len(jobs)}: {job['path']}")
+        start_time = time.time()
+        try:
+            ok = run_job(job["path"], job_args, client, rate_limiter, cache)
+        except Exception as e:
+            print(f"❌ Job failed: {e}")
+            ok = False
+        outcomes.append((job["path"], job_args.output_dir, ok, time.time() - start_time))
+
+    print(f"\n{'=' * 50}\n📋 Batch summary")
+    for path, output_dir, ok, seconds in outcomes:
+        print(f"   {'✅' if ok else '❌'} {path} -> {output_dir} ({seconds:.1f}s)")
+    failed = sum(1 for _, _, ok, _ in outcomes if not ok)
+    print(f"   {len(outcomes) - failed} of {len(outcomes)} jobs finished")
+    return failed == 0
+
+
+def prompt_for_job(args: argparse.Namespace) -> bool:
+    """Asks for the input path and chunking options interactively
+
+    Returns:
+        False if the user quit
+    """
     # Get folder path from user
     while True:
-        folder_path = input("📁 Enter the folder path containing images: ").strip()
+        folder_path = input("📁 Enter the folder path containing images (or a video file): ").strip()
         if folder_path.lower() in ['quit', 'exit', 'q']:
             print("👋 Goodbye!")
-            return
+            return False
         
         if os.path.exists(folder_path):
             break
         else:
             print(f"❌ Folder not found: {folder_path}")
             print("   Please enter a valid folder path or 'quit' to exit.")
+    args.path = folder_path
     
     # Get processing parameters
     try:
-        chunk_size = int(input("📦 Chunk size (images per API call, default 3): ") or "3")
-        skip_frames = int(input("⏭️  Skip frames (process every Nth image, default 1): ") or "1")
+        args.chunk_size = int(input("📦 Chunk size (images per API call, default 3): ") or "3")
+        args.skip_frames = int(input("⏭️  Skip frames (process every Nth image, default 1): ") or "1")
+        args.concurrency = int(input("⚡ Concurrent requests (chunks in flight, default 1): ") or "1")
     except ValueError:
-        print("⚠️ Invalid input, using defaults: chunk_size=3, skip_frames=1")
-        chunk_size = 3
-        skip_frames = 1
+        print("⚠️ Invalid input, using defaults: chunk_size=3, skip_frames=1, concurrency=1")
+        args.chunk_size = 3
+        args.skip_frames = 1
+        args.concurrency = 1
+    return True
+
+
+def main(argv=None) -> int:
+    """Main function to run the image batch processor
+
+    Runs non-interactively when a path or --batch manifest is given and
+    falls back to prompting otherwise. Returns the process exit code.
+    """
+
+    args = parse_args(argv)
     
-    print("\n🚀 Starting processing...")
-    print(f"   Folder: {folder_path}")
-    print(f"   Chunk size: {chunk_size}")
-    print(f"   Skip frames: {skip_frames}")
+    print("🎬 Image Batch Processor with Llama API")
+    print("=" * 50)
+
+    if args.path is None and args.batch is None:
+        if not prompt_for_job(args):
+            return 0
+    elif args.path is not None and not os.path.exists(args.path):
+        print(f"❌ Folder not found: {args.path}")
+        return 1
+
+    rate_limiter = RateLimiter(args.rpm, args.tpm, args.burst)
+    cache = None if args.no_cache else FrameAnalysisCache(args.cache_dir, int(args.cache_max_mb * 1024 * 1024))
     
-    # Process the folder
+    # One client (and connection pool) for every stage and job of the run; a dry run needs none
+    client = None
+    if not args.dry_run:
+        client = create_client(pool_size_for(args))
+        if client is None:
+            return 1
+
+    # Process the folder (or stream the video), or every job of the manifest
     start_time = time.time()
-    process_folder(folder_path, chunk_size, skip_frames)
+    if args.batch is not None:
+        ok = run_batch(args.batch, args, rate_limiter, cache, client)
+    else:
+        args.output_dir = job_output_dir(args.output_dir, args.path, args.checkpoint)
+        ok = run_job(args.path, args, client, rate_limiter, cache)
     end_time = time.time()
     
-    print(f"\n✅ Processing completed in {end_time - start_time:.2f} seconds")
+    if client is not None:
+        print(f"\n🔌 HTTP: {ApiSession.shared().describe()}")
+    print(f"\n{'✅' if ok else '⚠️'} Processing completed in {end_time - start_time:.2f} seconds")
+    return 0 if ok else 1
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
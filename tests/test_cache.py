@@ -0,0 +1,37 @@
+"""FrameAnalysisCache evicts least recently used entries down to its low-water mark"""
+
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import image_batch_processor as ibp  # noqa: E402
+
+
+def test_eviction_keeps_recently_used_entries(tmp_path):
+    entry = {"analysis": "x" * 80}
+    size = len(json.dumps(entry).encode("utf-8"))
+    cache = ibp.FrameAnalysisCache(str(tmp_path), max_bytes=size * 10)
+    for n in range(10):
+        cache.put(f"key{n}", entry)
+    assert cache.get("key0") is not None  # key0 is now the most recently used
+
+    cache.put("key10", entry)
+    assert cache.total_bytes <= cache.max_bytes * ibp.CACHE_EVICT_TARGET
+    assert cache.evictions == 2
+    assert cache.get("key0") is not None
+    assert cache.get("key1") is None and cache.get("key2") is None
+    assert cache.get("key3") is not None
+
+    # Back under the low-water mark, the next put does not evict again
+    cache.put("key11", entry)
+    assert cache.evictions == 2
+
+
+def test_reopened_cache_keeps_its_entries(tmp_path):
+    cache = ibp.FrameAnalysisCache(str(tmp_path))
+    cache.put("key", {"analysis": "x"})
+    reopened = ibp.FrameAnalysisCache(str(tmp_path))
+    assert reopened.get("key") == {"analysis": "x"}
+    assert reopened.total_bytes == cache.total_bytes
@@ -0,0 +1,44 @@
+"""Scene-change scores of KeyframeSelector stay on the documented [0, 1] scale"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import image_batch_processor as ibp  # noqa: E402
+
+Image = pytest.importorskip("PIL.Image")
+pytest.importorskip("numpy")
+
+
+def write_frames(folder, colors):
+    names = []
+    for i, color in enumerate(colors):
+        name = f"{i + 1:04d}.png"
+        Image.new("RGB", (64, 36), color).save(os.path.join(folder, name))
+        names.append(name)
+    return names
+
+
+@pytest.mark.parametrize("method", ["histogram", "pixel"])
+def test_black_to_white_cut_scores_one(tmp_path, method):
+    names = write_frames(str(tmp_path), [(0, 0, 0), (255, 255, 255)])
+    scores = ibp.KeyframeSelector(method=method).scores(str(tmp_path), names)
+    assert scores[0] == pytest.approx(1.0)
+
+
+def test_identical_frames_score_zero(tmp_path):
+    names = write_frames(str(tmp_path), [(40, 90, 200)] * 3)
+    scores = ibp.KeyframeSelector().scores(str(tmp_path), names)
+    assert scores.tolist() == pytest.approx([0.0, 0.0])
+
+
+def test_cut_between_similar_palettes_passes_default_threshold(tmp_path):
+    # Only the red channel moves to other bins: a third of the histogram mass
+    names = write_frames(str(tmp_path), [(40, 90, 200), (200, 90, 200)])
+    selector = ibp.KeyframeSelector()
+    score = selector.scores(str(tmp_path), names)[0]
+    assert score == pytest.approx(1 / 3)
+    assert score > selector.threshold
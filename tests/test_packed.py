@@ -0,0 +1,31 @@
+"""Packed answers are found in the model's text whatever surrounds the JSON array"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import image_batch_processor as ibp  # noqa: E402
+
+ARRAY = '[{"image": "0001.jpg", "analysis": "a [bracketed] note"}, {"image": "0002.jpg", "analysis": "y"}]'
+
+
+@pytest.mark.parametrize("text", [
+    ARRAY,
+    f"```json\n{ARRAY}\n```",
+    f"Here are the frames [as requested]:\n{ARRAY}",
+    f"Here: {ARRAY} note [sic]",
+    f"[1] See below.\n```\n{ARRAY}\n```\nThat's all [end].",
+])
+def test_array_is_found_around_prose_and_fences(text):
+    items = ibp.parse_json_array(text)
+    assert [item["image"] for item in items] == ["0001.jpg", "0002.jpg"]
+    assert items[0]["analysis"] == "a [bracketed] note"
+
+
+@pytest.mark.parametrize("text", ["No frames here.", "Only [sic] brackets [1, 2]", "[]"])
+def test_text_without_an_array_of_objects_is_rejected(text):
+    with pytest.raises(ValueError):
+        ibp.parse_json_array(text)
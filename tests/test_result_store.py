@@ -0,0 +1,157 @@
+"""ResultStore runs, resume and the per-run output directories"""
+
+import json
+import os
+import subprocess
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import image_batch_processor as ibp  # noqa: E402
+from image_batch_processor import result_images  # noqa: E402
+
+
+def open_store(folder, source, resume=False):
+    store = ibp.ResultStore(os.path.join(folder, ibp.DEFAULT_CHECKPOINT_FILE))
+    store.start_run(source, resume=resume)
+    return store
+
+
+def test_output_dir_is_named_after_the_input(tmp_path):
+    output_dir = str(tmp_path / "out")
+    for name in ("shot.v1", "shot.v2"):
+        (tmp_path / name).mkdir()
+    (tmp_path / "clip.mp4").write_bytes(b"")
+    assert ibp.job_output_dir(output_dir, str(tmp_path / "shot.v1")) == os.path.join(output_dir, "shot.v1")
+    assert ibp.job_output_dir(output_dir, str(tmp_path / "shot.v2")) == os.path.join(output_dir, "shot.v2")
+    assert ibp.job_output_dir(output_dir, str(tmp_path / "clip.mp4")) == os.path.join(output_dir, "clip")
+
+
+def test_output_dir_is_never_the_input_or_another_inputs(tmp_path):
+    first, second = tmp_path / "a" / "frames", tmp_path / "b" / "frames"
+    first.mkdir(parents=True)
+    second.mkdir(parents=True)
+    # The input's own folder is not used as its output directory
+    assert ibp.job_output_dir(str(tmp_path / "a"), str(first)) == str(tmp_path / "a" / "frames_2")
+
+    output_dir = str(tmp_path / "out")
+    taken = ibp.job_output_dir(output_dir, str(first))
+    os.makedirs(taken)
+    open_store(taken, str(first)).close("finished")
+    assert ibp.job_output_dir(output_dir, str(first)) == taken
+    assert ibp.job_output_dir(output_dir, str(second)) == os.path.join(output_dir, "frames_2")
+
+
+def analysis(image_file, text="ok"):
+    return {"image": image_file, "analysis": text}
+
+
+def failure(*images):
+    return {"images": list(images), "error": "Error code: 500"}
+
+
+def test_resume_continues_the_latest_run_of_the_source(tmp_path):
+    store = open_store(str(tmp_path), "reel")
+    first = store.run_id
+    store.add_chunk(1, ["0001.jpg"], [analysis("0001.jpg")])
+    store.close("interrupted")
+
+    resumed = open_store(str(tmp_path), "reel", resume=True)
+    assert resumed.run_id == first
+    assert resumed.completed_chunks() == {("0001.jpg",): 1}
+    resumed.close("finished")
+
+    fresh = open_store(str(tmp_path), "reel")
+    assert fresh.run_id != first
+    assert fresh.completed_chunks() == {}
+    fresh.close("finished")
+
+
+def test_a_live_run_refuses_a_second_one(tmp_path):
+    store = open_store(str(tmp_path), "reel")
+    # Hand the run to another live process (the test runner's parent)
+    with store.transaction() as db:
+        db.execute("UPDATE runs SET pid = ? WHERE id = ?", (os.getppid(), store.run_id))
+    with pytest.raises(RuntimeError):
+        open_store(str(tmp_path), "other")
+
+    # Once that process is gone the run no longer blocks, e.g. to resume it
+    finished = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"],
+                              capture_output=True, text=True, check=True)
+    with store.transaction() as db:
+        db.execute("UPDATE runs SET pid = ? WHERE id = ?", (int(finished.stdout), store.run_id))
+    resumed = open_store(str(tmp_path), "reel", resume=True)
+    assert resumed.run_id == store.run_id
+    resumed.close("finished")
+    store.close()
+
+
+def test_chunks_with_errors_are_not_completed(tmp_path):
+    store = open_store(str(tmp_path), "reel")
+    store.add_chunk(1, ["0001.jpg", "0002.jpg"], [analysis("0001.jpg"), analysis("0002.jpg")])
+    store.add_chunk(2, ["0003.jpg", "0004.jpg"], [analysis("0003.jpg"), failure("0004.jpg")])
+    assert store.completed_chunks() == {("0001.jpg", "0002.jpg"): 1}
+    assert store.errored_frames() == [("0004.jpg", "Error code: 500")]
+
+    # Resending the chunk replaces its earlier results
+    store.add_chunk(2, ["0003.jpg", "0004.jpg"], [analysis("0003.jpg"), analysis("0004.jpg")])
+    assert set(store.completed_chunks().values()) == {1, 2}
+    assert store.errored_frames() == []
+    assert len(list(store.iter_results())) == 4
+    store.close("finished")
+
+
+def test_prune_drops_chunks_of_an_earlier_chunking(tmp_path):
+    store = open_store(str(tmp_path), "reel")
+    for number, images in enumerate([["0001.jpg"], ["0002.jpg"], ["0003.jpg"]], 1):
+        store.add_chunk(number, images, [analysis(image_file) for image_file in images])
+    store.close("interrupted")
+
+    # Resumed with two frames per chunk: chunks 1 and 2 are replaced, chunk 3 is left over
+    store = open_store(str(tmp_path), "reel", resume=True)
+    assert store.completed_chunks() == {("0001.jpg",): 1, ("0002.jpg",): 2, ("0003.jpg",): 3}
+    store.add_chunk(1, ["0001.jpg", "0002.jpg"], [analysis("0001.jpg"), analysis("0002.jpg")])
+    store.add_chunk(2, ["0003.jpg"], [analysis("0003.jpg")])
+    assert store.prune_chunks({1, 2}) == 1
+    assert store.chunk_images() == {1: ("0001.jpg", "0002.jpg"), 2: ("0003.jpg",)}
+    assert [result["image"] for result in store.iter_results()] == ["0001.jpg", "0002.jpg", "0003.jpg"]
+    store.close("finished")
+
+
+class FakeCompletions:
+    """Answers every packed analysis request with an analysis of each frame named in it"""
+
+    def __init__(self, images):
+        self.images = images
+        self.calls = 0
+
+    def create(self, **kwargs):
+        self.calls += 1
+        answer = json.dumps([analysis(image_file, "retried") for image_file in self.images])
+        return SimpleNamespace(completion_message=SimpleNamespace(content=SimpleNamespace(text=answer)))
+
+
+def test_retry_merges_the_retried_frames_into_their_chunk(tmp_path):
+    completions = FakeCompletions(["0002.jpg"])
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    context = ibp.AnalysisContext(client, output_dir=str(tmp_path), packed=True, max_retries=0)
+    context.store = open_store(str(tmp_path), "reel")
+    chunk = ["0001.jpg", "0002.jpg", "0003.jpg"]
+    context.store.add_chunk(1, chunk, [analysis("0001.jpg"), failure("0002.jpg", "0003.jpg")])
+    # Only 0002.jpg kept its payload, so 0003.jpg has nothing to resend
+    context.retry_items = {"0002.jpg": {"type": "image_url", "image_url": {"url": "data:image/jpeg;base64,AAAA"}}}
+    context.failed_chunks = {1: (chunk, None)}
+
+    finished = set()
+    ibp.retry_failed_frames(context, finished)
+
+    assert finished == {1} and completions.calls == 1
+    merged = context.store.chunk_results(1)
+    assert [(result_images(result), result.get("analysis")) for result in merged] == [
+        (["0001.jpg"], "ok"), (["0002.jpg"], "retried"), (["0003.jpg"], None),
+    ]
+    assert context.store.errored_frames() == [("0003.jpg", "Error code: 500")]
+    context.store.close("finished")
@@ -0,0 +1,64 @@
+"""Transcript lookup and parsing"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import image_batch_processor as ibp  # noqa: E402
+
+
+def test_video_uses_the_transcript_named_after_it(tmp_path):
+    for name in ("monday.mp4", "monday.srt", "tuesday.mp4", "tuesday.srt", "wednesday.mp4"):
+        (tmp_path / name).write_text("")
+    folder = str(tmp_path)
+    assert ibp.find_transcript_file(folder, str(tmp_path / "tuesday.mp4")) == str(tmp_path / "tuesday.srt")
+    assert ibp.find_transcript_file(folder, str(tmp_path / "wednesday.mp4")) == ""
+
+
+SRT = (
+    "\ufeff1\r\n00:00:01,000 --> 00:00:02,500\r\n<i>Hello</i> &amp; welcome\r\nsecond line\r\n\r\n"
+    "2\r\nnot a timing line\r\nlost text\r\n\r\n"
+    "3\r\n00:00:03,000 --> 00:00:04,000\r\n\r\n"
+    "4\r\n01:02:03,250 --> 01:02:04,000\r\nLate\r\n"
+)
+
+VTT = """WEBVTT - a title
+
+NOTE a comment
+that spans lines
+
+intro
+00:05.000 --> 00:06.500 align:start position:10%
+<v Roger>Is it <b>here</b>?
+
+00:00:07.000 --> 00:00:08.000
+Yes
+"""
+
+
+def test_srt_cues_drop_numbers_markup_and_broken_blocks():
+    cues = list(ibp.iter_transcript_cues(SRT.splitlines(keepends=True)))
+    assert cues == [
+        (1.0, 2.5, "Hello & welcome second line"),
+        (3723.25, 3724.0, "Late"),
+    ]
+
+
+def test_vtt_cues_drop_header_notes_identifiers_and_settings():
+    cues = list(ibp.iter_transcript_cues(VTT.splitlines()))
+    assert cues == [(5.0, 6.5, "Is it here?"), (7.0, 8.0, "Yes")]
+
+
+def test_cues_between_finds_overlapping_cues_only():
+    index = ibp.TranscriptIndex([
+        (10.0, 12.0, "c"),
+        (0.0, 100.0, "long"),
+        (2.0, 4.0, "a"),
+        (4.0, 6.0, "b"),
+    ])
+    assert len(index) == 4 and index.end == 100.0
+    assert [cue[2] for cue in index.cues_between(4.0, 10.0)] == ["long", "b"]
+    assert [cue[2] for cue in index.cues_between(3.0, 4.5)] == ["long", "a", "b"]
+    assert [cue[2] for cue in index.cues_between(100.0, 200.0)] == []
+    assert ibp.TranscriptIndex([]).cues_between(0.0, 1.0) == []